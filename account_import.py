@@ -1,24 +1,102 @@
-import subprocess
 import sys
 import os
 import glob
 import json
 import time
 import itertools
+import re
 import threading
 import yaml
-import csv
-import pandas as pd
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-from file_handlers import get_file_handler
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import argparse
+import multiprocessing
+import shutil
+import signal
+import contextlib
+import csv
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from file_handlers import FileReadError, get_file_handler, ResultSink
+from checkpoint import CheckpointJournal, JOURNAL_FILE
+from state_store import DEFAULT_SYNCHRONOUS, STATE_DB, SYNCHRONOUS_MODES, StateStore, configure_state_store, get_state_store
+from vault_index import VaultIndex, INDEX_FILE_TEMPLATE
+from sync_store import SyncStore, content_hash, record_key, sync_store_path
+from schema import AccountSchema, Record, compile_account_types
+from preflight import Preflight
+from metrics import ProgressLine, echo, get_metrics, reset_metrics
+from op_session import DEFAULT_CACHE_TTL, configure_op_session, get_op_session
+from op_cli import OP_NO_RESPONSE, OP_TIMEOUT, is_missing_item_error, run_op_command
+from backends import BACKENDS, ConnectBackend, ExportBackend, configure_backend, get_backend
+from manifest import ManifestError, build_file_configs, load_manifest
+from sharding import (
+    SHARD_DIR, has_shard_plan, is_shardable, load_shard_plan, merge_shard_results, run_shard, shard_dir, shard_line_offsets,
+    shard_paths, shard_seen_keys
+)
+from import_engine import (
+    run_pool, run_inline, run_in_thread_loop, iter_async_pool, iter_prefetch, FairLimiter, LimiterClosed, RetryScheduler, RETRYABLE, THROTTLED, FATAL,
+    DEFAULT_WORKERS, DEFAULT_MAX_ATTEMPTS, DEFAULT_RETRY_BUDGET, DEFAULT_READ_AHEAD
+)
 
 # Thêm các hằng số cho file tạm
-TEMP_FILE = "temp_import_state.json"
+TEMP_FILE = "temp_import_state.json"  # trạng thái dạng cũ, chỉ còn đọc để chuyển sang STATE_DB
 TEMP_DIR = "temp"
 
-def load_account_types() -> Dict:
-    """Load account types from config file"""
+# Khi nhiều file chạy song song: khóa việc tạo/lưu chỉ mục vault và bản ghi đồng bộ dùng chung
+_VAULT_INDEX_LOCK = threading.RLock()
+_SYNC_STORE_LOCK = threading.Lock()
+
+# Lý do bỏ qua khi item đã có sẵn trong vault
+ITEM_EXISTS = "Item đã tồn tại trong vault"
+
+# Lý do bỏ qua khi dòng không đổi kể từ lần đồng bộ trước (--sync)
+ITEM_UNCHANGED = "Không thay đổi kể từ lần đồng bộ trước"
+
+# Mã HTTP trong lỗi chỉ được tính khi đứng trong ngữ cảnh: "(503) ..." (op, Connect) hoặc "HTTP 503"/"status 503"
+HTTP_STATUS_PATTERN = r"(?:\({code}\)|\b(?:http|status|code)[ :/]*{code}\b)"
+
+# Các mẫu lỗi trong stderr của op (và lỗi Connect), dùng để quyết định có thử lại hay không. So khớp
+# nguyên từ để giá trị của trường hay chữ như "thereof" trong thông điệp không bị nhầm là lỗi mạng
+THROTTLE_ERROR_PATTERN = re.compile("|".join([
+    r"\brate[ -]?limit", r"\btoo many requests\b", r"\bthrottl", HTTP_STATUS_PATTERN.format(code="429"),
+]), re.IGNORECASE)
+RETRYABLE_ERROR_PATTERN = re.compile("|".join([
+    re.escape(OP_NO_RESPONSE), r"\btimeout\b", r"\btimed out\b", r"\bconnection (?:reset|refused|aborted)\b",
+    r"\btemporarily unavailable\b", r"\bservice unavailable\b", r"\bbad gateway\b", r"\bgateway timeout\b",
+    r"\binternal server error\b", HTTP_STATUS_PATTERN.format(code="50[0234]"), r"\b(?:unexpected )?eof\b",
+    r"\bnetwork (?:error|is unreachable|unreachable)\b", r"\btry again\b",
+]), re.IGNORECASE)
+
+# Tùy chọn mặc định cho quá trình import
+DEFAULT_OPTIONS = {
+    'workers': DEFAULT_WORKERS,
+    'engine': 'thread',
+    'timeout': OP_TIMEOUT,
+    'item_mode': 'argv',
+    'max_attempts': DEFAULT_MAX_ATTEMPTS,
+    'retry_budget': DEFAULT_RETRY_BUDGET,
+    'duplicates': 'skip',
+    'vault_index_cache': False,
+    'read_ahead': DEFAULT_READ_AHEAD,
+    'parse_workers': 1,
+    'preflight': True,
+    'sheet': None,
+    'skip_rows': 0,
+    'report': os.path.join("output", "run_report.json"),
+    'metrics_textfile': None,
+    'parallel_files': 1,
+    'max_in_flight': None,
+    'fair_share': 'file',
+    'shards': 1,
+    'op_cache_ttl': DEFAULT_CACHE_TTL,
+    'state_sync': DEFAULT_SYNCHRONOUS,
+    'sync': False,
+    'backend': 'op',
+    'connect_host': None,
+    'export': None,
+}
+
+def load_account_types() -> Dict[str, AccountSchema]:
+    """Load account types from config file and compile each one into an AccountSchema"""
     config_file = "account_types.yaml"
     if not os.path.exists(config_file):
         print(f"❌ Không tìm thấy file cấu hình {config_file}")
@@ -48,41 +126,50 @@ hotmail:
             if not account_types:
                 print("❌ File cấu hình trống")
                 sys.exit(1)
-            return account_types
+            return compile_account_types(account_types)
     except Exception as e:
         print(f"❌ Lỗi khi đọc file cấu hình: {str(e)}")
         sys.exit(1)
 
-def run_op_command(cmd, timeout=30):
-    """Run 1Password CLI command with timeout"""
-    try:
-        return subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
-    except subprocess.TimeoutExpired:
-        print(f"❌ Lệnh bị timeout sau {timeout} giây")
-        return None
-    except Exception as e:
-        print(f"❌ Lỗi khi thực thi lệnh: {str(e)}")
-        return None
-
-def check_1password_cli():
-    """Check if 1Password CLI is installed and logged in"""
+def check_1password_cli(interactive: bool = True):
+    """Check if 1Password CLI is installed and logged in
+    
+    Khi không tương tác (chạy theo manifest), không tự mở `op signin` mà báo lỗi và thoát.
+    Kết quả kiểm tra được cache (--op-cache-ttl), lần chạy sau trong thời hạn cache bỏ qua bước này.
+    """
+    session = get_op_session()
     try:
+        preflight = session.cached('preflight')
+        if preflight:
+            age = session.cache_age('preflight') or 0
+            print(f"✅ Đã đăng nhập 1Password CLI (op {preflight.get('version', '?')}, "
+                  f"kiểm tra {int(age // 60)} phút trước)")
+            return True
+            
         version_result = run_op_command(["op", "--version"])
         if not version_result or version_result.returncode != 0:
             print("❌ 1Password CLI chưa được cài đặt")
             print("Vui lòng cài đặt theo hướng dẫn tại: https://1password.com/downloads/command-line/")
             sys.exit(1)
+        version = version_result.stdout.strip()
         
-        whoami_result = run_op_command(["op", "whoami"])
+        whoami_result = run_op_command(["op", "whoami"], reauth=False)
         if whoami_result and whoami_result.returncode == 0:
             print("✅ Đã đăng nhập 1Password CLI")
+            session.store('preflight', {'version': version})
             return True
             
+        if not interactive:
+            print("❌ Chưa đăng nhập 1Password CLI")
+            print("Vui lòng đăng nhập trước (op signin) hoặc đặt OP_SERVICE_ACCOUNT_TOKEN rồi chạy lại")
+            sys.exit(1)
+            
         print("🔑 Chưa đăng nhập 1Password CLI. Đang thực hiện đăng nhập...")
-        login_result = subprocess.run(["op", "signin"], capture_output=False, text=True)
         
-        if login_result.returncode == 0:
+        # Token phiên được giữ lại và dùng cho mọi lệnh op sau đó
+        if session.signin():
             print("✅ Đăng nhập thành công")
+            session.store('preflight', {'version': version})
             return True
         else:
             print("❌ Đăng nhập thất bại")
@@ -93,17 +180,73 @@ def check_1password_cli():
         print(f"❌ Lỗi khi kiểm tra 1Password CLI: {str(e)}")
         sys.exit(1)
 
-def get_vault_list() -> List[Dict]:
-    """Lấy danh sách vault từ 1Password"""
+def get_vault_list(refresh: bool = False) -> List[Dict]:
+    """Lấy danh sách vault từ 1Password (dùng cache trên đĩa nếu còn hạn, trừ khi `refresh`)"""
+    session = get_op_session()
+    backend = get_backend()
     try:
-        result = run_op_command(["op", "vault", "list", "--format", "json"])
-        if result and result.returncode == 0:
-            return json.loads(result.stdout)
-        return []
+        if not refresh and backend.cache_vaults:
+            vaults = session.cached('vaults')
+            if vaults:
+                return vaults
+        vaults = backend.list_vaults()
+        if vaults is None:
+            return []
+        if backend.cache_vaults:
+            session.store('vaults', [{'id': vault['id'], 'name': vault.get('name', '')} for vault in vaults])
+        return vaults
     except Exception as e:
         print(f"❌ Lỗi khi lấy danh sách vault: {str(e)}")
         return []
 
+def get_vault_index(vault_id: str, options: Dict) -> Optional[VaultIndex]:
+    """Lấy chỉ mục các item có sẵn trong vault, mỗi vault chỉ gọi op item list một lần"""
+    with _VAULT_INDEX_LOCK:
+        return _get_vault_index(vault_id, options)
+
+def _get_vault_index(vault_id: str, options: Dict) -> Optional[VaultIndex]:
+    indexes = options.setdefault('vault_indexes', {})
+    if vault_id in indexes:
+        return indexes[vault_id]
+        
+    # Chỉ mục đã lưu chỉ được dùng lại trong thời hạn --op-cache-ttl, tính từ lần lấy danh sách item
+    # gần nhất: item được thêm/xóa ngoài chương trình này không có trong chỉ mục cũ
+    cache_path = os.path.join(TEMP_DIR, INDEX_FILE_TEMPLATE.format(vault_id=vault_id))
+    index = VaultIndex.load(cache_path) if options.get('vault_index_cache') else None
+    if index is not None and index.age() > options.get('op_cache_ttl', DEFAULT_CACHE_TTL):
+        index = None
+    if index is not None:
+        print(f"📚 Dùng chỉ mục vault đã lưu: {len(index)} item (lấy {int(index.age() // 60)} phút trước)")
+    else:
+        print("🔎 Đang lấy danh sách item có sẵn trong vault để kiểm tra trùng lặp...")
+        items, error = get_backend().list_items(vault_id, timeout=max(options.get('timeout', OP_TIMEOUT), 120))
+        if items is None:
+            print("⚠️ Không lấy được danh sách item, bỏ qua kiểm tra trùng lặp")
+            if error:
+                print(f"Lỗi: {error}")
+            indexes[vault_id] = None
+            return None
+        index = VaultIndex.from_items(vault_id, items)
+        print(f"✅ Vault có sẵn {len(index)} item")
+        
+    indexes[vault_id] = index
+    return index
+
+def save_vault_index(index: VaultIndex) -> None:
+    """Lưu chỉ mục vault để lần chạy sau không cần gọi lại op item list"""
+    ensure_temp_dir()
+    with _VAULT_INDEX_LOCK:
+        index.save(os.path.join(TEMP_DIR, INDEX_FILE_TEMPLATE.format(vault_id=index.vault_id)))
+
+def get_sync_store(vault_id: str, options: Dict) -> SyncStore:
+    """Bản ghi đồng bộ của vault, mỗi vault chỉ đọc từ đĩa một lần trong một lần chạy"""
+    with _SYNC_STORE_LOCK:
+        stores = options.setdefault('sync_stores', {})
+        if vault_id not in stores:
+            stores[vault_id] = SyncStore(sync_store_path(vault_id)).load()
+            print(f"🔄 Bản ghi đồng bộ của vault: {len(stores[vault_id])} item")
+        return stores[vault_id]
+
 def get_vault_info() -> Optional[str]:
     """Lấy thông tin vault từ user"""
     global VAULT_LIST
@@ -155,112 +298,71 @@ def get_user_notes():
             print(f"\n✅ Đã lưu {len(lines)} dòng ghi chú")
         return "\n".join(lines)
 
-def parse_line(line: str, account_type: Dict) -> Optional[Dict]:
+def parse_line(line: str, account_type: AccountSchema) -> Tuple[Optional[Record], Optional[str]]:
     """Parse a line based on account type config"""
     try:
-        # Xử lý format mới
-        if "format" in account_type:
-            format_fields = account_type["format"].split(account_type.get("delimiter", "|"))
-            delimiter = account_type.get("delimiter", "|")
-            parts = line.strip().split(delimiter)
-            
-            if len(parts) < len(format_fields):
-                return None, f"Thiếu dữ liệu. Cần {len(format_fields)} trường, chỉ có {len(parts)} trường"
-                
-            data = {}
-            for i, field_name in enumerate(format_fields):
-                if i < len(parts):
-                    data[field_name] = parts[i].strip()
-            
-            # Validate required fields
-            missing_fields = []
-            for field in account_type["fields"]:
-                if field["required"] and (field["name"] not in data or not data[field["name"]]):
-                    missing_fields.append(field["name"])
-            
-            if missing_fields:
-                return None, f"Thiếu các trường: {', '.join(missing_fields)}"
-                
-            return data, None
-            
-        return None, "Không tìm thấy định dạng trong cấu hình"
-        
+        return account_type.parse_line(line)
     except Exception as e:
         return None, f"Lỗi khi parse dữ liệu: {str(e)}"
 
-def add_to_1password(data: Dict, account_type: Dict, vault: str, notes: str = "") -> tuple:
-    """Add a single item to 1Password"""
+def classify_op_error(error: Optional[str]) -> str:
+    """Phân loại lỗi của op: THROTTLED, RETRYABLE hoặc FATAL"""
+    message = error or ""
+    if THROTTLE_ERROR_PATTERN.search(message):
+        return THROTTLED
+    if RETRYABLE_ERROR_PATTERN.search(message):
+        return RETRYABLE
+    return FATAL
+
+def classify_create_result(result: tuple) -> Optional[str]:
+    """Dùng cho RetryScheduler: None nếu thành công, ngược lại là loại lỗi"""
+    success, error = result[0], result[2]
+    return None if success else classify_op_error(error)
+
+def create_retry_scheduler(options: Dict) -> RetryScheduler:
+    """Tạo bộ lập lịch thử lại dùng chung cho một lần chạy"""
+    return RetryScheduler(
+        classify_create_result,
+        # Khi import song song nhiều file, giới hạn chung có thể lớn hơn số lệnh song song của một file
+        max_concurrency=max(options['workers'], options.get('max_in_flight') or 0),
+        max_attempts=options['max_attempts'],
+        budget=options['retry_budget'],
+    )
+
+async def add_to_1password_async(data: Record, account_type: AccountSchema, vault: str, notes: str = "",
+                                 timeout: float = OP_TIMEOUT, item_mode: str = 'argv') -> tuple:
+    """Add a single item to 1Password without blocking the event loop
+
+    Item được ghi qua backend của lần chạy (op CLI hoặc Connect, xem --backend).
+    Với item_mode='template', op nhận item dưới dạng JSON qua stdin
+    thay vì từng trường qua tham số dòng lệnh.
+    """
+    title = data.get("username", "Unknown")
     try:
-        # Create base command
-        cmd = [
-            "op", "item", "create",
-            "--category", account_type.get("category", "login"),  # Sử dụng category từ config
-            "--vault", vault,
-            "--format", "json"
-        ]
-        
-        # Add title based on category
-        title_field = "username"  # Mặc định là username
-        if account_type.get("category") == "credit-card":
-            title_field = "cardholder_name"
-        elif account_type.get("category") == "bank-account":
-            title_field = "account_name"
-        elif account_type.get("category") == "identity":
-            title_field = "full_name"
-            
-        title = data.get(title_field, "Unknown")
-        cmd.append("--title")
-        cmd.append(f"{account_type['title_prefix']} {title}")
-        
-        # Add URL if provided
-        if "url" in account_type:
-            cmd.append("--url")
-            cmd.append(account_type["url"])
-        
-        # Add fields based on config
-        for field in account_type["fields"]:
-            field_name = field["name"]
-            if field_name in data and data[field_name]:  # Only add if field has value
-                value = data[field_name].replace('"', '\\"').replace('$', '\\$').replace('`', '\\`')
-                
-                # Handle special fields
-                if field["type"] == "otp":
-                    cmd.append(f"totp={value}")
-                elif field["type"] == "credit-card-number":
-                    cmd.append(f"cardNumber={value}")
-                elif field["type"] == "credit-card-type":
-                    cmd.append(f"cardType={value}")
-                elif field["type"] == "credit-card-expiry":
-                    cmd.append(f"expiry={value}")
-                elif field["type"] == "credit-card-cvv":
-                    cmd.append(f"cvv={value}")
-                else:
-                    cmd.append(f"{field_name}[{field['type']}]={value}")
-        
-        # Add notes if provided
-        if notes:
-            cmd.append(f"notes[text]={notes}")
-        
-        result = run_op_command(cmd)
-        
-        if result and result.returncode == 0:
-            try:
-                response = json.loads(result.stdout)
-                print(f"✅ Đã thêm {title} vào 1Password")
-                return True, response.get('id')
-            except json.JSONDecodeError as e:
-                print(f"❌ Không thể parse JSON response cho {title}")
-                print(f"Response: {result.stdout}")
-                return False, None
-        else:
-            print(f"❌ Không thể thêm {title}")
-            if result:
-                print(f"Lỗi: {result.stderr}")
-            return False, None
-            
+        return await get_backend().create_item(data, account_type, vault, notes, timeout, item_mode)
+    except Exception as e:
+        echo(f"❌ Lỗi khi thêm {title}: {str(e)}")
+        return False, None, str(e)
+
+async def update_in_1password_async(item_id: str, data: Record, account_type: AccountSchema, vault: str,
+                                    notes: str = "", timeout: float = OP_TIMEOUT) -> tuple:
+    """Cập nhật item đã có qua backend của lần chạy (op item edit hoặc Connect)"""
+    title = data.get("username", "Unknown")
+    try:
+        return await get_backend().update_item(item_id, data, account_type, vault, notes, timeout)
     except Exception as e:
-        print(f"❌ Lỗi khi thêm {title}: {str(e)}")
-        return False, None
+        echo(f"❌ Lỗi khi cập nhật {title}: {str(e)}")
+        return False, None, str(e)
+
+def update_in_1password(item_id: str, data: Record, account_type: AccountSchema, vault: str,
+                        notes: str = "", timeout: float = OP_TIMEOUT) -> tuple:
+    """Update an existing 1Password item"""
+    return run_in_thread_loop(update_in_1password_async(item_id, data, account_type, vault, notes, timeout))
+
+def add_to_1password(data: Record, account_type: AccountSchema, vault: str, notes: str = "",
+                     timeout: float = OP_TIMEOUT, item_mode: str = 'argv') -> tuple:
+    """Add a single item to 1Password"""
+    return run_in_thread_loop(add_to_1password_async(data, account_type, vault, notes, timeout, item_mode))
 
 def ensure_directories():
     """Ensure input and output directories exist"""
@@ -287,7 +389,7 @@ def detect_account_type(filename: str, account_types: Dict) -> Optional[str]:
             return acc_type
     return None
 
-def get_account_type_for_file(filename: str, account_types: Dict) -> Dict:
+def get_account_type_for_file(filename: str, account_types: Dict[str, AccountSchema]) -> Optional[AccountSchema]:
     """Get account type configuration for a file"""
     print(f"\n📄 File: {os.path.basename(filename)}")
     
@@ -301,91 +403,564 @@ def get_account_type_for_file(filename: str, account_types: Dict) -> Dict:
     # Let user select manually
     return select_account_type(account_types)
 
-def process_file(filename: str, account_type: Dict, vault_id: str, notes: str) -> None:
+def process_file(filename: str, account_type: AccountSchema, vault_id: str, notes: str, options: Dict = None) -> None:
     """Xử lý một file input và thêm các tài khoản vào 1Password"""
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    metrics = get_metrics()
+    file_started = time.perf_counter()
     try:
         # Lấy handler phù hợp cho file
-        handler = get_file_handler(filename, account_type)
+        handler = get_file_handler(filename, account_type, options)
         if not handler:
             print(f"❌ Không hỗ trợ định dạng file: {filename}")
             return
             
-        # Đọc dữ liệu từ file
-        accounts = handler.read_data()
-        if not accounts:
+        # Đọc dữ liệu từ file dạng stream: lấy trước dòng đầu tiên để handler xử lý
+        # xong phần header (bổ sung custom field) và dùng schema riêng của file.
+        # Thời gian đọc/parse được tính riêng vào giai đoạn 'parse'
+        # Mỗi dòng kèm số dòng trong file do handler đánh (giống thông báo "Dòng N" khi bỏ qua dòng)
+        rows = metrics.timed_iter('parse', handler.iter_numbered())
+        first_entry = next(rows, None)
+        if first_entry is None:
             print(f"❌ Không đọc được dữ liệu từ file: {filename}")
             return
+        account_type = handler.account_type
+        shard = options.get('shard')
+        
+        total = 0
+        last_row = 0
+        
+        def count_rows():
+            """Đếm số dòng dữ liệu đã đọc và số dòng cuối cùng, chạy trong luồng producer"""
+            nonlocal total, last_row
+            for entry in itertools.chain([first_entry], rows):
+                total += 1
+                last_row = entry[0]
+                yield entry
+                
+        # Kiểm tra và chuẩn hóa dữ liệu theo cột trước khi gọi op: dòng lỗi và dòng trùng trong file
+        # được ghi vào báo cáo riêng, chỉ các dòng sạch được đưa sang bước import. Mọi bước đều dùng
+        # số dòng trong file, nên báo cáo, nhật ký và file kết quả luôn khớp với file gốc
+        numbered = count_rows()
+        preflight = None
+        if options['preflight']:
+            report_name = os.path.splitext(os.path.basename(filename))[0]
+            if shard:
+                report_name += f"_shard{shard['index'] + 1}"
+            preflight = Preflight(account_type, os.path.join("output", f"{report_name}_preflight.csv"),
+                                  dedupe=options['duplicates'] == 'skip', seen=options.get('preflight_seen'))
+            numbered = preflight.iter_clean(numbered)
+            first_entry = next(numbered, None)
+            if first_entry is None:
+                preflight.close()
+                print(f"❌ Không còn dòng hợp lệ sau bước kiểm tra dữ liệu: {filename}")
+                print(f"📝 Xem lỗi từng dòng trong file: {preflight.report_path}")
+                return
+            numbered = itertools.chain([first_entry], numbered)
+                
+        
+        # Chỉ mục vault để bỏ qua item đã tồn tại, tra cứu O(1) cho mỗi dòng
+        with metrics.phase('vault_index'):
+            vault_index = get_vault_index(vault_id, options) if options['duplicates'] != 'off' else None
+        item_url = account_type.url
+        flagged = set()
+        
+        def find_existing(row: int, account: Record) -> Optional[str]:
+            """Trả về id item đã có nếu cần bỏ qua dòng này"""
+            if vault_index is None:
+                return None
+            title = account_type.item_title(account)
+            existing_id = vault_index.find(title, item_url)
+            if not existing_id:
+                return None
+            if options['duplicates'] == 'flag':
+                echo(f"⚠️ {title} đã tồn tại trong vault ({existing_id}), vẫn tạo mới")
+                flagged.add(row)
+                return None
+            return existing_id
+            
+        # Chế độ đồng bộ: dòng không đổi được bỏ qua, dòng đã đổi được cập nhật bằng op item edit
+        sync_store = get_sync_store(vault_id, options) if options['sync'] else None
+        updated = set()
+        
+        def plan_row(row: int, account: Record) -> Tuple[str, Optional[str]]:
+            """Việc cần làm với một dòng: ('create'|'update'|'unchanged'|'exists', item id)"""
+            if sync_store is not None:
+                synced = sync_store.get(record_key(account_type, account))
+                if synced:
+                    if synced[0] == content_hash(account_type, account, notes):
+                        return 'unchanged', synced[1]
+                    updated.add(row)
+                    return 'update', synced[1]
+            existing_id = find_existing(row, account)
+            if existing_id and sync_store is not None:
+                # Item có sẵn trong vault nhưng chưa có trong bản ghi đồng bộ: cập nhật và nhận quản lý
+                updated.add(row)
+                return 'update', existing_id
+            if existing_id:
+                return 'exists', existing_id
+            return 'create', None
             
-        # Thêm từng tài khoản vào 1Password
-        total = len(accounts)
+        # Khi nhiều file chạy song song, mỗi lệnh op phải lấy lượt từ giới hạn chung của cả lần chạy
+        limiter = options.get('limiter')
+        
+        # Kết quả mỗi item: (thành công, item id, lỗi, độ trễ tính bằng giây)
+        def import_account(entry: Tuple[int, Record]) -> Tuple[bool, Optional[str], Optional[str], float]:
+            row, account = entry
+            started = time.perf_counter()
+            action, item_id = plan_row(row, account)
+            if action == 'unchanged':
+                result = (False, item_id, ITEM_UNCHANGED)
+            elif action == 'exists':
+                result = (False, item_id, ITEM_EXISTS)
+            else:
+                if limiter:
+                    limiter.acquire(filename, vault_id)
+                try:
+                    result = run_in_thread_loop(write_account_async(row, account, action, item_id))
+                except Exception as e:
+                    echo(f"❌ Lỗi khi xử lý tài khoản {account.get('username', '')}: {str(e)}")
+                    result = (False, None, str(e))
+                finally:
+                    if limiter:
+                        limiter.release(filename, vault_id)
+            return result + (time.perf_counter() - started,)
+                
+        # Dòng có lần tạo item trước lỗi giữa chừng (timeout, mất kết nối, 5xx): item có thể đã được tạo dù
+        # không nhận được phản hồi, nên lần thử lại tìm item theo tiêu đề trước khi tạo lại
+        unconfirmed = set()
+        
+        async def create_account_async(row: int, account: Record) -> tuple:
+            if row in unconfirmed:
+                found_id, error = await get_backend().find_item(account_type.item_title(account), vault_id,
+                                                                options['timeout'])
+                if error:
+                    return False, None, error
+                unconfirmed.discard(row)
+                if found_id:
+                    return True, found_id, None
+            result = await add_to_1password_async(account, account_type, vault_id, notes, options['timeout'], options['item_mode'])
+            if not result[0] and classify_op_error(result[2]) == RETRYABLE:
+                unconfirmed.add(row)
+            return result
+            
+        async def write_account_async(row: int, account: Record, action: str, item_id: Optional[str]) -> tuple:
+            if action == 'update':
+                result = await update_in_1password_async(item_id, account, account_type, vault_id, notes, options['timeout'])
+                if result[0] or not is_missing_item_error(result[2]):
+                    return result
+                # Item đã bị xóa khỏi vault: tạo lại
+                updated.discard(row)
+            return await create_account_async(row, account)
+            
+        async def import_account_async(entry: Tuple[int, Record]) -> Tuple[bool, Optional[str], Optional[str], float]:
+            row, account = entry
+            started = time.perf_counter()
+            action, item_id = plan_row(row, account)
+            if action == 'unchanged':
+                result = (False, item_id, ITEM_UNCHANGED)
+            elif action == 'exists':
+                result = (False, item_id, ITEM_EXISTS)
+            elif limiter:
+                async with limiter.slot_async(filename, vault_id):
+                    result = await write_account_async(row, account, action, item_id)
+            else:
+                result = await write_account_async(row, account, action, item_id)
+            return result + (time.perf_counter() - started,)
+            
+        # Backend ghi ra file (--export): mỗi dòng được ghi ngay trong luồng đọc, không cần pool
+        backend = get_backend()
+        
+        def import_account_inline(entry: Tuple[int, Record]) -> Tuple[bool, Optional[str], Optional[str], float]:
+            row, account = entry
+            started = time.perf_counter()
+            action, item_id = plan_row(row, account)
+            if action == 'exists':
+                result = (False, item_id, ITEM_EXISTS)
+            else:
+                result = backend.create_item_inline(account, account_type, vault_id, notes)
+            return result + (time.perf_counter() - started,)
+            
+        # Bộ lập lịch thử lại dùng chung cả lần chạy (ngân sách thử lại tính theo lần chạy)
+        scheduler = options.get('scheduler') or create_retry_scheduler(options)
+        retried_before = scheduler.retried
+        
+        # Bỏ qua các dòng đã import ở lần chạy trước theo nhật ký checkpoint
+        journal = options.get('journal')
+        resumed = journal.done_count(filename) if journal else 0
+        pending = numbered
+        if journal:
+            if resumed:
+                print(f"⏩ Bỏ qua {resumed} dòng đã import ở lần chạy trước")
+            # Số dòng có thể không liên tục (dòng bị loại ở bước kiểm tra dữ liệu), nên bỏ qua theo số dòng
+            watermark = journal.watermark(filename)
+            pending = (
+                (row, account)
+                for row, account in itertools.dropwhile(lambda entry: entry[0] <= watermark, pending)
+                if not journal.is_done(filename, row)
+            )
+            
+        # Bước đọc file chạy trong luồng riêng, đưa dữ liệu sang bước import qua hàng đợi có giới hạn
+        pending = iter_prefetch(pending, options['read_ahead'])
+        
+        def row_status(row: int, success: bool, error: Optional[str]) -> str:
+            """Trạng thái của một dòng trong file kết quả và kho trạng thái"""
+            if success:
+                if row in updated:
+                    return 'updated'
+                return 'duplicate' if row in flagged else 'success'
+            if error == ITEM_UNCHANGED:
+                return 'unchanged'
+            return 'exists' if error == ITEM_EXISTS else 'failed'
+            
+        def on_result(index: int, entry: Tuple[int, Record], result: tuple) -> None:
+            # Chạy ngay khi item hoàn tất, không chờ đến lượt theo thứ tự
+            row, account = entry
+            success, item_id = result[0], result[1]
+            if journal:
+                journal.record(filename, row, success, item_id, status=row_status(row, success, result[2]),
+                               error=result[2], key=account_type.item_title(account))
+            if vault_index is not None and success:
+                vault_index.add(account_type.item_title(account), item_url, item_id)
+            if sync_store is not None and success:
+                sync_store.record(record_key(account_type, account), content_hash(account_type, account, notes), item_id)
+                
+        if backend.inline:
+            results = run_inline(pending, import_account_inline, on_result)
+            if hasattr(journal, 'batch'):
+                results = iter_journal_batches(results, journal, backend)
+        elif options['engine'] == 'async':
+            results = iter_async_pool(pending, import_account_async, options['workers'], on_result, scheduler)
+        else:
+            results = run_pool(pending, import_account, options['workers'], on_result, scheduler)
+            
+        # Thêm các tài khoản vào 1Password song song, kết quả được ghi theo thứ tự dòng
         success = 0
         skipped = 0
+        existing = 0
+        updated_count = 0
+        unchanged = 0
         
-        for idx, account in enumerate(accounts, 1):
-            try:
-                # Thêm tài khoản vào 1Password
-                result, item_id = add_to_1password(account, account_type, vault_id, notes)
-                if result:
+        # Kết quả có cùng định dạng với file input; khi tiếp tục từ checkpoint thì ghi nối
+        # vào file kết quả của lần chạy trước
+        # Mỗi shard (--shards) ghi kết quả riêng, tiến trình điều phối gộp lại sau khi các shard xong
+        if shard:
+            output_file = shard['result']
+        else:
+            output_file = os.path.join(
+                "output", f"{os.path.splitext(os.path.basename(filename))[0]}_result.{handler.result_extension}"
+            )
+        append = bool(resumed) and os.path.exists(output_file)
+        
+        # Một dòng trạng thái (số item, tốc độ, ETA) thay cho việc in từng item
+        try:
+            estimated_total = handler.estimate_rows()
+        except Exception:
+            estimated_total = None
+        done = resumed
+        # Kết quả về theo thứ tự trong file: khi mọi dòng từ đầu đều thành công thì dời watermark
+        # qua cả các số dòng không phải dòng dữ liệu (dòng trống, dòng bị loại ở bước kiểm tra)
+        prefix_done = journal is not None
+        # Khi chạy song song nhiều file, mỗi file in dòng trạng thái riêng theo chu kỳ thay vì vẽ lại tại chỗ
+        label = os.path.basename(filename)
+        if shard:
+            label += f" [shard {shard['index'] + 1}/{shard['count']}]"
+        progress = ProgressLine(label, estimated_total, done=resumed,
+                                tty=False if limiter or shard else None)
+        with metrics.phase('import'), progress, ResultSink(handler, output_file, append=append) as sink:
+            for _, (idx, account), (result, item_id, error, latency) in results:
+                done += 1
+                status = row_status(idx, result, error)
+                if status in ('success', 'duplicate'):
                     success += 1
+                elif status == 'updated':
+                    updated_count += 1
+                elif status == 'unchanged':
+                    unchanged += 1
+                elif status == 'exists':
+                    existing += 1
                 else:
                     skipped += 1
-                    
-            except Exception as e:
-                print(f"❌ Lỗi khi xử lý tài khoản {idx}: {str(e)}")
-                skipped += 1
-                
-        # Lưu kết quả vào file CSV
-        output_file = os.path.join("output", f"{os.path.splitext(os.path.basename(filename))[0]}_result.csv")
-        with open(output_file, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['username', 'password', 'status'])
-            for account in accounts:
-                writer.writerow([
-                    account['username'],
-                    account['password'],
-                    'success' if account['username'] in [a['username'] for a in accounts[:success]] else 'skipped'
-                ])
+                sink.add(idx, account_type.item_title(account), status, item_id, error, latency)
+                prefix_done = prefix_done and result
+                if prefix_done:
+                    journal.advance_to(filename, idx)
+                if sync_store is not None:
+                    progress.update(done, ok=success, updated=updated_count, unchanged=unchanged, failed=skipped)
+                else:
+                    progress.update(done, ok=success, exists=existing, failed=skipped)
+        rejected = 0
+        if preflight is not None:
+            preflight.close()
+            rejected = preflight.rejected
                 
-        print(f"\n✅ Hoàn thành: {success}/{total}")
+        if vault_index is not None and options['vault_index_cache'] and not shard:
+            save_vault_index(vault_index)
+        if sync_store is not None:
+            # Các shard ghi nối vào cùng một file, chỉ nén lại khi chạy một tiến trình
+            sync_store.close() if shard else sync_store.compact()
+            
+        retried = scheduler.retried - retried_before
+        metrics.incr('items_ok', success)
+        metrics.incr('items_failed', skipped)
+        metrics.incr('items_exists', existing)
+        metrics.incr('items_updated', updated_count)
+        metrics.incr('items_unchanged', unchanged)
+        metrics.incr('items_duplicate', len(flagged))
+        metrics.incr('items_resumed', resumed)
+        metrics.incr('items_retried', retried)
+        metrics.incr('rows_read', total)
+        metrics.incr('rows_rejected', rejected)
+        metrics.add_file({
+            'file': filename,
+            **({'shard': shard['index']} if shard else {}),
+            'account_type': account_type.name,
+            'rows': total,
+            'rejected': rejected,
+            'ok': success,
+            'failed': skipped,
+            'exists': existing,
+            'updated': updated_count,
+            'unchanged': unchanged,
+            'duplicate': len(flagged),
+            'resumed': resumed,
+            'retried': retried,
+            'elapsed_s': round(time.perf_counter() - file_started, 3),
+            'output': output_file,
+        })
+        
+        # Đọc file bị lỗi giữa chừng: các dòng đã import được giữ trong trạng thái, nhưng file không được
+        # đánh dấu đã xử lý để lần chạy sau đọc lại và tiếp tục từ các dòng chưa import
+        if handler.read_error is not None:
+            raise FileReadError(f"Đọc file {filename} bị dừng sau dòng {last_row}: {handler.read_error}")
+            
+        completed = success + updated_count + unchanged + resumed
+        if shard:
+            # Tiến trình điều phối gộp kết quả và đánh dấu file đã xử lý
+            print(f"✅ {label}: xong {completed}/{total}")
+            return
+            
+        print(f"\n✅ Hoàn thành: {completed}/{total}")
         print(f"\n📝 Đã xuất kết quả ra file: {output_file}")
         
-        # Lưu thông tin về file đã xử lý
-        processed_files = []
-        processed_lines = {}
-        if os.path.exists(os.path.join(TEMP_DIR, TEMP_FILE)):
-            with open(os.path.join(TEMP_DIR, TEMP_FILE), 'r') as f:
-                state = json.load(f)
-                processed_files = state.get('processed_files', [])
-                processed_lines = state.get('processed_lines', {})
-        
-        if filename not in processed_files:
-            processed_files.append(filename)
-            processed_lines[filename] = idx  # Lưu số dòng đã xử lý
-            save_import_state([], processed_files, processed_lines)
+        mark_file_processed(filename, last_row)
             
-        print(f"\n📊 Kết quả xử lý file {filename}:")
-        print(f"   - Tổng số dòng: {total}")
-        print(f"   - Số tài khoản đã thêm: {success}")
-        print(f"   - Số dòng bị bỏ qua: {skipped}")
-        print(f"   - Đã xử lý đến dòng: {idx}")
+        # In cả khối trong một lần để không bị lẫn với output của file khác khi chạy song song
+        summary = [
+            f"\n📊 Kết quả xử lý file {filename}:",
+            f"   - Tổng số dòng: {total}",
+            f"   - Số tài khoản đã thêm: {success}",
+        ]
+        if rejected:
+            summary.append(f"   - Bị loại ở bước kiểm tra dữ liệu: {rejected} (xem {preflight.report_path})")
+        if resumed:
+            summary.append(f"   - Đã import ở lần chạy trước: {resumed}")
+        if existing:
+            summary.append(f"   - Đã tồn tại trong vault: {existing}")
+        if sync_store is not None:
+            summary.append(f"   - Đã cập nhật: {updated_count}")
+            summary.append(f"   - Không thay đổi: {unchanged}")
+        if flagged:
+            summary.append(f"   - Trùng lặp nhưng vẫn tạo mới: {len(flagged)}")
+        summary.append(f"   - Số dòng bị bỏ qua: {skipped}")
+        summary.append(f"   - Số lần thử lại: {retried} (ngân sách còn lại: {scheduler.budget})")
+        summary.append(f"   - Đã xử lý đến dòng: {last_row}")
+        print("\n".join(summary))
         
+    except LimiterClosed:
+        # Lần chạy song song đã bị dừng ở file khác, run_batch sẽ báo lỗi
+        raise
     except Exception as e:
         print(f"❌ Có lỗi xảy ra: {str(e)}")
         raise
 
-def select_account_type(account_types: Dict) -> Optional[Dict]:
+def iter_journal_batches(results: Iterable, journal: StateStore, backend) -> Iterator:
+    """Ghi nhật ký của backend inline theo lô: mỗi lô một transaction, commit sau khi backend flush"""
+    results = iter(results)
+    while True:
+        with journal.batch():
+            chunk = list(itertools.islice(results, backend.inline_batch))
+            backend.flush()
+        yield from chunk
+        if len(chunk) < backend.inline_batch:
+            return
+
+def mark_file_processed(filename: str, last_row: int) -> None:
+    """Ghi file đã xử lý xong (và số dòng đã xử lý) vào kho trạng thái"""
+    open_state_store().mark_file_processed(filename, last_row)
+
+def process_file_sharded(filename: str, account_type: AccountSchema, vault_id: str, notes: str,
+                         options: Dict = None) -> None:
+    """Import một file lớn bằng nhiều tiến trình, mỗi tiến trình một khoảng byte của file.
+    
+    Mỗi shard tự đọc, parse và chạy lệnh op với pool, checkpoint và file kết quả riêng trong
+    temp/shards/; sau khi mọi shard xong, kết quả được gộp theo thứ tự dòng vào file kết quả
+    thông thường. Dừng giữa chừng rồi chạy lại sẽ dùng lại cách chia cũ và tiếp tục từng shard.
+    Chỉ hỗ trợ file .txt và .csv; file khác (hoặc file quá nhỏ để chia) chạy như bình thường.
+    """
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    if not is_shardable(filename):
+        print(f"ℹ️ Không chia shard được file {os.path.splitext(filename)[1]}, xử lý bằng một tiến trình")
+        return process_file(filename, account_type, vault_id, notes, options)
+        
+    ranges = load_shard_plan(filename, options['shards'])
+    if len(ranges) < 2:
+        shutil.rmtree(shard_dir(filename), ignore_errors=True)
+        print("ℹ️ File nhỏ, xử lý bằng một tiến trình")
+        return process_file(filename, account_type, vault_id, notes, options)
+        
+    metrics = get_metrics()
+    file_started = time.perf_counter()
+    count = len(ranges)
+    
+    # Lấy chỉ mục vault một lần ở tiến trình điều phối rồi chia sẻ cho các shard qua file
+    index = None
+    index_path = None
+    if options['duplicates'] != 'off':
+        with metrics.phase('vault_index'):
+            index = get_vault_index(vault_id, options)
+        if index is not None:
+            index_path = os.path.join(shard_dir(filename), "vault_index.json")
+            index.save(index_path)
+            
+    # Chỉ truyền các tùy chọn dạng dữ liệu; ngân sách thử lại được chia đều cho các shard
+    worker_options = {key: options[key] for key in DEFAULT_OPTIONS if key not in ('report', 'metrics_textfile')}
+    worker_options['retry_budget'] = max(1, options['retry_budget'] // count)
+    line_offsets = shard_line_offsets(filename, ranges)
+    # Mỗi shard chỉ so trùng các dòng của mình: lấy trước khóa của cả file để dòng trùng với
+    # một dòng ở shard trước cũng bị loại ở bước kiểm tra dữ liệu
+    seen_keys = [None] * count
+    if options['preflight'] and options['duplicates'] == 'skip':
+        print("🔎 Đang đọc khóa của các dòng để so trùng giữa các shard...")
+        with metrics.phase('preflight'):
+            seen_keys = shard_seen_keys(filename, account_type, line_offsets, options)
+    jobs = [{
+        'file': filename,
+        'account_type': account_type.name,
+        'vault_id': vault_id,
+        'notes': notes,
+        'index': shard_index,
+        'count': count,
+        'byte_range': byte_range,
+        'line_offset': line_offset,
+        'seen_keys': seen_keys[shard_index],
+        'options': worker_options,
+        'vault_index': index_path,
+        # Token phiên op chuyển cho shard qua tham số của tiến trình, không qua argv hay biến môi trường
+        'op_session': get_op_session().credentials(),
+    } for shard_index, (byte_range, line_offset) in enumerate(zip(ranges, line_offsets))]
+    
+    print(f"🧩 Chia file thành {count} shard, mỗi shard chạy trong một tiến trình riêng")
+    for job in jobs:
+        summary_path = shard_paths(filename, job['index'])['summary']
+        if os.path.exists(summary_path):
+            os.remove(summary_path)
+            
+    processes = [multiprocessing.Process(target=run_shard, args=(job,), name=f"shard-{job['index']}")
+                 for job in jobs]
+    try:
+        with metrics.phase('import'):
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+    except KeyboardInterrupt:
+        # Chuyển Ctrl+C cho các shard (khi tín hiệu chỉ gửi tới tiến trình này) rồi chờ chúng lưu checkpoint
+        for process in processes:
+            if process.is_alive():
+                if os.name == 'nt':
+                    process.terminate()
+                else:
+                    os.kill(process.pid, signal.SIGINT)
+        for process in processes:
+            process.join()
+        raise
+        
+    summaries = []
+    for job in jobs:
+        summary_path = shard_paths(filename, job['index'])['summary']
+        if not os.path.exists(summary_path):
+            raise RuntimeError(f"Shard {job['index'] + 1}/{count} dừng bất thường, chạy lại để tiếp tục")
+        with open(summary_path, 'r', encoding='utf-8') as f:
+            summaries.append(json.load(f))
+    for summary in summaries:
+        metrics.merge(summary['report'])
+    if any(summary['interrupted'] for summary in summaries):
+        raise KeyboardInterrupt
+    for summary in summaries:
+        # Shard đọc file bị lỗi: giữ checkpoint của các shard, chưa gộp kết quả và chưa đánh dấu file đã xử lý
+        if summary.get('error'):
+            raise FileReadError(f"Shard {summary['index'] + 1}/{count}: {summary['error']}")
+        
+    # Gộp kết quả: các shard đã đánh số dòng theo cả file nên chỉ cần nối theo thứ tự shard
+    shard_files = [summary['report']['files'][0] if summary['report']['files'] else {} for summary in summaries]
+    output_file = os.path.join("output", f"{os.path.splitext(os.path.basename(filename))[0]}_result.csv")
+    
+    journal = options.get('journal')
+    prefix_done = True
+    
+    def on_merged_row(row: List[str]) -> None:
+        # Đưa các item các shard vừa tạo vào chỉ mục vault của tiến trình này và kết quả vào kho trạng thái
+        nonlocal prefix_done
+        success = row[2] in ('success', 'duplicate', 'updated')
+        if index is not None and success and row[3]:
+            index.add(row[1], account_type.url, row[3])
+        if journal:
+            journal.record(filename, int(row[0]), success, row[3] or None, status=row[2], error=row[4] or None, key=row[1])
+            # Dòng gộp theo thứ tự trong file: dời watermark qua chỗ trống như process_file
+            prefix_done = prefix_done and success
+            if prefix_done:
+                journal.advance_to(filename, int(row[0]))
+            
+    with metrics.phase('write'), (journal.batch() if journal else contextlib.nullcontext()):
+        merge_shard_results([shard_file.get('output') for shard_file in shard_files], output_file,
+                            on_row=on_merged_row)
+    if index is not None and options['vault_index_cache']:
+        save_vault_index(index)
+    
+    totals = {key: sum(shard_file.get(key, 0) for shard_file in shard_files)
+              for key in ('rows', 'rejected', 'ok', 'failed', 'exists', 'updated', 'unchanged', 'duplicate', 'resumed', 'retried')}
+    completed = totals['ok'] + totals['updated'] + totals['unchanged'] + totals['resumed']
+    print(f"\n✅ Hoàn thành: {completed}/{totals['rows']}")
+    print(f"\n📝 Đã xuất kết quả ra file: {output_file}")
+    mark_file_processed(filename, totals['rows'])
+    shutil.rmtree(shard_dir(filename), ignore_errors=True)
+    
+    summary = [
+        f"\n📊 Kết quả xử lý file {filename} ({count} shard, {time.perf_counter() - file_started:.1f} giây):",
+        f"   - Tổng số dòng: {totals['rows']}",
+        f"   - Số tài khoản đã thêm: {totals['ok']}",
+    ]
+    if totals['rejected']:
+        report_name = os.path.splitext(os.path.basename(filename))[0]
+        summary.append(f"   - Bị loại ở bước kiểm tra dữ liệu: {totals['rejected']} "
+                       f"(xem output/{report_name}_shard*_preflight.csv)")
+    if totals['resumed']:
+        summary.append(f"   - Đã import ở lần chạy trước: {totals['resumed']}")
+    if totals['exists']:
+        summary.append(f"   - Đã tồn tại trong vault: {totals['exists']}")
+    if options['sync']:
+        summary.append(f"   - Đã cập nhật: {totals['updated']}")
+        summary.append(f"   - Không thay đổi: {totals['unchanged']}")
+    if totals['duplicate']:
+        summary.append(f"   - Trùng lặp nhưng vẫn tạo mới: {totals['duplicate']}")
+    summary.append(f"   - Số dòng bị bỏ qua: {totals['failed']}")
+    summary.append(f"   - Số lần thử lại: {totals['retried']}")
+    print("\n".join(summary))
+
+def select_account_type(account_types: Dict[str, AccountSchema]) -> Optional[AccountSchema]:
     """Let user select account type"""
     print("\n📋 Các loại tài khoản có sẵn:")
     types_list = list(account_types.items())
     
-    for idx, (name, config) in enumerate(types_list, 1):
+    for idx, (name, schema) in enumerate(types_list, 1):
         print(f"\n{idx}. {name.upper()}")
-        print(f"   - URL: {config.get('url', 'N/A')}")
-        print(f"   - Định dạng: {config.get('format', 'N/A')}")
+        print(f"   - URL: {schema.url or 'N/A'}")
+        print(f"   - Định dạng: {schema.config.get('format', 'N/A')}")
         print("   - Các trường:")
-        for field in config["fields"]:
-            required = "(bắt buộc)" if field["required"] else "(tùy chọn)"
-            print(f"     + {field['name']}: {field['type']} {required}")
+        for field in schema.fields:
+            required = "(bắt buộc)" if field.required else "(tùy chọn)"
+            print(f"     + {field.name}: {field.type} {required}")
     
     while True:
         print(f"\nChọn loại tài khoản (1-{len(types_list)}): ", end="")
@@ -421,159 +996,261 @@ def ensure_temp_dir():
     """Đảm bảo thư mục temp tồn tại"""
     os.makedirs(TEMP_DIR, exist_ok=True)
 
-def save_import_state(file_configs: List[Dict], processed_files: List[str], processed_lines: Dict[str, int] = None) -> None:
-    """Lưu trạng thái xử lý vào file tạm"""
-    if processed_lines is None:
-        processed_lines = {}
-        
-    state = {
-        'file_configs': file_configs,
-        'processed_files': processed_files,
-        'processed_lines': processed_lines
-    }
-    
-    with open(os.path.join(TEMP_DIR, TEMP_FILE), 'w') as f:
-        json.dump(state, f, indent=2)
+def open_state_store() -> StateStore:
+    """Kho trạng thái SQLite trong thư mục temp"""
+    return get_state_store(os.path.join(TEMP_DIR, STATE_DB))
 
-def load_import_state() -> Tuple[List[Dict], List[str], Dict[str, int]]:
-    """Đọc trạng thái xử lý từ file tạm"""
-    if not os.path.exists(os.path.join(TEMP_DIR, TEMP_FILE)):
-        return None, None, None
-        
-    with open(os.path.join(TEMP_DIR, TEMP_FILE), 'r') as f:
+def save_import_state(file_configs: List[Dict]) -> None:
+    """Lưu cấu hình các file của lần chạy hiện tại vào kho trạng thái"""
+    open_state_store().save_file_configs(file_configs)
+
+def load_import_state(mode: str) -> Tuple[List[Dict], Dict[str, int]]:
+    """Mở lần chạy chưa xong gần nhất (hoặc bắt đầu lần mới), trả về (cấu hình file, file đã xử lý -> số dòng)"""
+    store = open_state_store()
+    _, resuming = store.open_run(mode)
+    if not resuming:
+        return [], {}
+    return store.file_configs(), store.processed_files()
+
+def migrate_legacy_state(account_types: Dict[str, AccountSchema]) -> None:
+    """Chuyển trạng thái dạng cũ (temp_import_state.json + nhật ký JSONL) của lần chạy dở sang kho SQLite"""
+    legacy_path = os.path.join(TEMP_DIR, TEMP_FILE)
+    if not os.path.exists(legacy_path):
+        return
+    with open(legacy_path, 'r') as f:
         state = json.load(f)
-        return (
-            state.get('file_configs', []),
-            state.get('processed_files', []),
-            state.get('processed_lines', {})
-        )
+    journal = CheckpointJournal(os.path.join(TEMP_DIR, JOURNAL_FILE))
+    journal.load()
+    
+    store = open_state_store()
+    store.open_run("legacy")
+    file_configs = [
+        {**config, 'account_type': resolve_account_type(config.get('account_type'), account_types)}
+        for config in state.get('file_configs', [])
+    ]
+    with store.batch():
+        store.save_file_configs(file_configs)
+        for filename in journal.files():
+            store.record_many(filename, ((row, True, item_id, None, None, None)
+                                         for row, item_id in journal.done_rows(filename)))
+        processed_lines = state.get('processed_lines', {})
+        for filename in state.get('processed_files', []):
+            store.mark_file_processed(filename, processed_lines.get(filename, 0))
+    journal.close()
+    for temp_file in (TEMP_FILE, JOURNAL_FILE):
+        temp_path = os.path.join(TEMP_DIR, temp_file)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    print(f"🔁 Đã chuyển trạng thái của lần chạy trước sang {store.path}")
 
 def clean_temp_files() -> None:
-    """Xóa các file tạm"""
+    """Đánh dấu lần chạy đã xong trong kho trạng thái và xóa các file tạm"""
     try:
-        temp_path = os.path.join(TEMP_DIR, TEMP_FILE)
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-            print(f"\n🧹 Đã xóa file tạm: {temp_path}")
+        open_state_store().finish_run()
+        if os.path.isdir(SHARD_DIR) and not os.listdir(SHARD_DIR):
+            os.rmdir(SHARD_DIR)
     except Exception as e:
         print(f"❌ Lỗi khi xóa file tạm: {str(e)}")
 
-def process_input_files(input_files: List[str], account_types: Dict) -> None:
-    """Xử lý từng file input và hỏi user về việc xử lý"""
+def resolve_account_type(value, account_types: Dict[str, AccountSchema]) -> Optional[str]:
+    """Tên loại tài khoản lưu trong file trạng thái dạng cũ
+    
+    Trạng thái cũ có thể lưu cả cấu hình dạng dict, khi đó tìm lại loại tài khoản theo cấu hình.
+    """
+    if isinstance(value, str):
+        return value if value in account_types else None
+    if isinstance(value, dict):
+        for name, schema in account_types.items():
+            if schema.config == value:
+                return name
+        for name, schema in account_types.items():
+            if schema.title_prefix == value.get('title_prefix'):
+                return name
+    return None
+
+def print_file_configs(file_configs: List[Dict]) -> None:
+    """In tóm tắt cấu hình các file sẽ xử lý"""
+    print("\n📋 Tóm tắt cấu hình:")
+    for idx, config in enumerate(file_configs, 1):
+        print(f"\n{idx}. File: {config['file']}")
+        print(f"   - Loại tài khoản: {config['account_type'].upper()}")
+        print(f"   - Vault: {config['vault_id']}")
+        if config['notes']:
+            print(f"   - Ghi chú: {config['notes']}")
+
+def gather_file_configs(input_files: List[str], account_types: Dict[str, AccountSchema]) -> List[Dict]:
+    """Hỏi user cấu hình cho từng file (loại tài khoản, vault, ghi chú), trả về [] nếu hủy"""
+    # Hiển thị danh sách file tìm thấy
+    print("\n📁 Danh sách file tìm thấy:")
+    for idx, file in enumerate(input_files, 1):
+        print(f"{idx}. {file}")
+    print()
+    
+    # Lưu thông tin xử lý cho từng file
+    file_configs = []
+    
+    for file in input_files:
+        print(f"\n{'='*50}")
+        print(f"📄 Đang cấu hình file: {file}")
+        print(f"{'='*50}")
+        
+        # Phát hiện loại tài khoản từ tên file
+        account_type = get_account_type_for_file(file, account_types)
+        if not account_type:
+            print("⏭️  Bỏ qua file này")
+            continue
+            
+        # Hiển thị thông tin file và hỏi user
+        print(f"\n📝 Loại tài khoản: {account_type.name.upper()}")
+        
+        while True:
+            choice = input("\nBạn có muốn xử lý file này không? (y/n): ").lower().strip()
+            if choice in ['y', 'n']:
+                break
+            print("❌ Vui lòng chọn 'y' hoặc 'n'")
+            
+        if choice == 'n':
+            print("⏭️  Bỏ qua file này")
+            continue
+            
+        # Lấy vault để lưu
+        vault_id = get_vault_info()
+        if not vault_id:
+            print("⏭️  Bỏ qua file này")
+            continue
+            
+        # Lấy ghi chú từ user
+        notes = get_user_notes()
+        
+        # Lưu cấu hình (chỉ lưu tên loại tài khoản)
+        file_configs.append({
+            'file': file,
+            'account_type': account_type.name,
+            'vault_id': vault_id,
+            'notes': notes
+        })
+        
+        # Lưu trạng thái ngay sau khi lấy thông tin
+        save_import_state(file_configs)
+        print(f"\n💾 Đã lưu thông tin cho file: {file}")
+    
+    # Hiển thị tóm tắt cấu hình
+    if not file_configs:
+        print("\n❌ Không có file nào được chọn để xử lý")
+        return []
+        
+    print_file_configs(file_configs)
+    
+    # Xác nhận trước khi xử lý
+    if not confirm_action("\n⚠️ Bạn có muốn bắt đầu xử lý các file không?", default=True):
+        print("❌ Đã hủy thao tác")
+        return []
+        
+    return file_configs
+
+def process_input_files(input_files: List[str], account_types: Dict[str, AccountSchema], options: Dict = None,
+                        manifest_configs: Optional[List[Dict]] = None) -> None:
+    """Xử lý từng file input và hỏi user về việc xử lý
+    
+    Nếu có `manifest_configs` (từ --manifest), cấu hình lấy từ manifest và không hỏi user.
+    """
+    
+    # Metric của lần chạy; thời gian cấu hình (kể cả chờ người dùng nhập) tính vào 'setup'
+    metrics = reset_metrics()
+    setup_started = time.perf_counter()
     
     # Đảm bảo thư mục temp tồn tại
     ensure_temp_dir()
     
-    # Thử đọc trạng thái trước đó
-    file_configs, processed_files, processed_lines = load_import_state()
-    if file_configs:
+    # Thử đọc trạng thái trước đó; kho trạng thái cũng là nhật ký checkpoint của từng dòng
+    migrate_legacy_state(account_types)
+    file_configs, processed_lines = load_import_state("manifest" if manifest_configs is not None else "interactive")
+    processed_files = list(processed_lines)
+    journal = open_state_store()
+    # Backend biết lần chạy hiện tại (chế độ xuất file ghi tiếp vào file tạm của lần chạy dở)
+    get_backend().open(journal)
+    if manifest_configs is not None:
+        # Chế độ manifest: các file đã xong ở lần chạy trước (nếu có) vẫn được bỏ qua
+        resumed_files = [config['file'] for config in manifest_configs if config['file'] in processed_files]
+        if resumed_files:
+            print(f"\n📋 Tiếp tục từ trạng thái trước: {len(resumed_files)} file đã xử lý sẽ được bỏ qua")
+        file_configs = manifest_configs
+        save_import_state(file_configs)
+        print_file_configs(file_configs)
+    elif file_configs:
         print("\n📋 Tiếp tục xử lý từ trạng thái trước:")
         for idx, config in enumerate(file_configs, 1):
+            if config['account_type'] not in account_types:
+                config['account_type'] = None
             if config['file'] not in processed_files:
                 print(f"\n{idx}. File: {config['file']}")
-                print(f"   - Loại tài khoản: {list(account_types.keys())[list(account_types.values()).index(config['account_type'])].upper()}")
+                print(f"   - Loại tài khoản: {(config['account_type'] or 'không xác định').upper()}")
                 print(f"   - Vault: {config['vault_id']}")
                 if config['notes']:
                     print(f"   - Ghi chú: {config['notes']}")
-                if config['file'] in processed_lines:
+                if journal.done_count(config['file']):
+                    print(f"   - Đã xử lý: {journal.done_count(config['file'])} dòng")
+                elif config['file'] in processed_lines:
                     print(f"   - Đã xử lý: {processed_lines[config['file']]} dòng")
     else:
-        # Hiển thị danh sách file tìm thấy
-        print("\n📁 Danh sách file tìm thấy:")
-        for idx, file in enumerate(input_files, 1):
-            print(f"{idx}. {file}")
-        print()
-        
-        # Lưu thông tin xử lý cho từng file
-        file_configs = []
-        processed_files = []
-        processed_lines = {}
-        
-        for file in input_files:
-            print(f"\n{'='*50}")
-            print(f"📄 Đang cấu hình file: {file}")
-            print(f"{'='*50}")
-            
-            # Phát hiện loại tài khoản từ tên file
-            account_type = get_account_type_for_file(file, account_types)
-            if not account_type:
-                print("⏭️  Bỏ qua file này")
-                continue
-                
-            # Hiển thị thông tin file và hỏi user
-            print(f"\n📝 Loại tài khoản: {list(account_types.keys())[list(account_types.values()).index(account_type)].upper()}")
-            
-            while True:
-                choice = input("\nBạn có muốn xử lý file này không? (y/n): ").lower().strip()
-                if choice in ['y', 'n']:
-                    break
-                print("❌ Vui lòng chọn 'y' hoặc 'n'")
-                
-            if choice == 'n':
-                print("⏭️  Bỏ qua file này")
-                continue
-                
-            # Lấy vault để lưu
-            vault_id = get_vault_info()
-            if not vault_id:
-                print("⏭️  Bỏ qua file này")
-                continue
-                
-            # Lấy ghi chú từ user
-            notes = get_user_notes()
-            
-            # Lưu cấu hình
-            file_configs.append({
-                'file': file,
-                'account_type': account_type,
-                'vault_id': vault_id,
-                'notes': notes
-            })
-            
-            # Lưu trạng thái ngay sau khi lấy thông tin
-            save_import_state(file_configs, processed_files, processed_lines)
-            print(f"\n💾 Đã lưu thông tin cho file: {file}")
-        
-        # Hiển thị tóm tắt cấu hình
+        file_configs = gather_file_configs(input_files, account_types)
         if not file_configs:
-            print("\n❌ Không có file nào được chọn để xử lý")
-            return
-            
-        print("\n📋 Tóm tắt cấu hình:")
-        for idx, config in enumerate(file_configs, 1):
-            print(f"\n{idx}. File: {config['file']}")
-            print(f"   - Loại tài khoản: {list(account_types.keys())[list(account_types.values()).index(config['account_type'])].upper()}")
-            print(f"   - Vault: {config['vault_id']}")
-            if config['notes']:
-                print(f"   - Ghi chú: {config['notes']}")
-        
-        # Xác nhận trước khi xử lý
-        if not confirm_action("\n⚠️ Bạn có muốn bắt đầu xử lý các file không?", default=True):
-            print("❌ Đã hủy thao tác")
             return
     
+    # Ngân sách thử lại và mức song song được dùng chung cho mọi file trong lần chạy
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    options['scheduler'] = create_retry_scheduler(options)
+    options['journal'] = journal
+    metrics.add_time('setup', time.perf_counter() - setup_started)
+    
+    run_batch(file_configs, processed_files, account_types, options)
+
+def run_batch(file_configs: List[Dict], processed_files: List[str], account_types: Dict[str, AccountSchema],
+              options: Dict) -> None:
+    """Import lần lượt các file đã cấu hình, không cần tương tác với user"""
+    journal = options['journal']
+    
+    # Chỉ mục vault dùng chung cho mọi file cùng vault trong lần chạy
+    options.setdefault('vault_indexes', {})
+    
     # Xử lý hàng loạt
     print("\n🔄 Bắt đầu xử lý hàng loạt...")
     try:
+        pending = []
         for config in file_configs:
             if config['file'] in processed_files:
                 print(f"\n⏭️  Bỏ qua file đã xử lý: {config['file']}")
                 continue
-                
-            print(f"\n{'='*50}")
-            print(f"📄 Đang xử lý file: {config['file']}")
-            print(f"{'='*50}")
-            
-            # Xử lý file
-            process_file(config['file'], config['account_type'], config['vault_id'], config['notes'])
+            if not config['account_type']:
+                print(f"\n⚠️ Không tìm thấy loại tài khoản của file {config['file']} trong cấu hình, bỏ qua")
+                continue
+            pending.append(config)
             
-            print(f"\n{'='*50}")
-            print(f"✅ Hoàn thành xử lý file: {config['file']}")
-            print(f"{'='*50}\n")
+        if options['shards'] > 1 and options['parallel_files'] > 1:
+            print("ℹ️ --shards đã dùng nhiều tiến trình cho mỗi file, các file được xử lý lần lượt")
+        if options['parallel_files'] > 1 and options['shards'] <= 1 and len(pending) > 1:
+            run_files_parallel(pending, account_types, options)
+        else:
+            for config in pending:
+                print(f"\n{'='*50}")
+                print(f"📄 Đang xử lý file: {config['file']}")
+                print(f"{'='*50}")
+                
+                # Xử lý file; file đã chia shard ở lần chạy trước vẫn được tiếp tục theo shard
+                import_file = process_file
+                if options['shards'] > 1 or has_shard_plan(config['file']):
+                    import_file = process_file_sharded
+                import_file(config['file'], account_types[config['account_type']], config['vault_id'], config['notes'], options)
+                
+                print(f"\n{'='*50}")
+                print(f"✅ Hoàn thành xử lý file: {config['file']}")
+                print(f"{'='*50}\n")
         
         print("\n✨ Đã hoàn thành xử lý tất cả các file!")
+        get_backend().finish()
         
         # Xóa file tạm sau khi hoàn thành
+        journal.close()
         clean_temp_files()
         
     except KeyboardInterrupt:
@@ -584,13 +1261,238 @@ def process_input_files(input_files: List[str], account_types: Dict) -> None:
         print(f"\n❌ Có lỗi xảy ra: {str(e)}")
         print("💾 Đã lưu trạng thái để có thể tiếp tục sau")
         sys.exit(1)
+    finally:
+        # Báo cáo được ghi cả khi dừng giữa chừng
+        write_run_report(options)
+
+def run_files_parallel(file_configs: List[Dict], account_types: Dict[str, AccountSchema], options: Dict) -> None:
+    """Import nhiều file cùng lúc dưới một giới hạn chung về số lệnh op đang chạy.
+    
+    Mỗi file vẫn có pool, file kết quả, checkpoint và dòng trạng thái riêng; FairLimiter chia
+    lượt chạy op đều giữa các file (hoặc giữa các vault với --fair-share vault). Khi một file
+    lỗi hoặc bị Ctrl+C, các file còn lại dừng lấy lượt mới và lỗi được ném lại cho run_batch.
+    """
+    capacity = options['max_in_flight'] or options['workers']
+    limiter = FairLimiter(capacity, by_group=options['fair_share'] == 'vault', scheduler=options['scheduler'])
+    file_options = {**options, 'limiter': limiter}
+    parallel = min(options['parallel_files'], len(file_configs))
+    print(f"\n🔀 Xử lý song song {parallel} file, tối đa {capacity} lệnh op cùng lúc "
+          f"(chia đều theo {'vault' if limiter.by_group else 'file'})")
+    
+    executor = ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="import-file")
+    try:
+        futures = {}
+        for config in file_configs:
+            future = executor.submit(process_file, config['file'], account_types[config['account_type']],
+                                     config['vault_id'], config['notes'], file_options)
+            futures[future] = config['file']
+        for future in as_completed(futures):
+            future.result()
+            print(f"\n✅ Hoàn thành xử lý file: {futures[future]}")
+    except BaseException:
+        limiter.close()
+        raise
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def write_run_report(options: Dict) -> None:
+    """Ghi báo cáo JSON của lần chạy, và file textfile cho Prometheus nếu được yêu cầu"""
+    metrics = get_metrics()
+    try:
+        if options.get('report'):
+            metrics.write_json(options['report'])
+            print(f"\n📈 Đã ghi báo cáo lần chạy: {options['report']}")
+        if options.get('metrics_textfile'):
+            metrics.write_prometheus(options['metrics_textfile'])
+            print(f"📈 Đã ghi metric Prometheus: {options['metrics_textfile']}")
+    except OSError as e:
+        print(f"⚠️ Không ghi được báo cáo lần chạy: {str(e)}")
+
+def print_runs(limit: int = 10) -> None:
+    """In các lần chạy gần nhất trong kho trạng thái"""
+    runs = open_state_store().runs(limit)
+    if not runs:
+        print("ℹ️ Chưa có lần chạy nào")
+        return
+    print("📜 Các lần chạy gần nhất:")
+    for run in runs:
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run['started_at']))
+        outcomes = ", ".join(f"{status} {count}" for status, count in sorted(run['outcomes'].items())) or "chưa có dòng nào"
+        print(f"   #{run['id']} {started} [{run['status']}, {run['mode']}] {run['files']} file: {outcomes}")
+
+def print_failures(run: str) -> None:
+    """In các dòng lỗi của một lần chạy ('last' là lần gần nhất) dạng CSV ra stdout"""
+    if run != 'last' and not run.isdigit():
+        print(f"❌ Lần chạy không hợp lệ: {run} (dùng số thứ tự trong --runs)")
+        return
+    store = open_state_store()
+    run_id = store.last_run_id() if run == 'last' else int(run)
+    if run_id is None:
+        print("ℹ️ Chưa có lần chạy nào")
+        return
+    writer = None
+    for path, row, title, error, at in store.failures(run_id):
+        if writer is None:
+            writer = csv.writer(sys.stdout)
+            writer.writerow(["file", "row", "title", "error", "at"])
+        writer.writerow([path, row, title or "", error or "", time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(at))])
+    if writer is None:
+        print(f"✅ Lần chạy #{run_id} không có dòng lỗi nào")
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """Đọc các tham số dòng lệnh"""
+    parser = argparse.ArgumentParser(description="Import tài khoản vào 1Password")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Số lệnh op chạy song song (mặc định: {DEFAULT_WORKERS})")
+    parser.add_argument("--engine", choices=["thread", "async"], default="thread",
+                        help="Cách chạy song song: thread (mặc định) hoặc async (asyncio, phù hợp hàng trăm lệnh cùng lúc)")
+    parser.add_argument("--timeout", type=float, default=OP_TIMEOUT,
+                        help=f"Thời gian chờ tối đa cho mỗi lệnh op, tính bằng giây (mặc định: {OP_TIMEOUT})")
+    parser.add_argument("--item-mode", choices=["argv", "template"], default="argv",
+                        help="Cách gửi dữ liệu cho op item create: argv (mặc định) hoặc template (JSON qua stdin)")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f"Số lần thử tối đa cho mỗi item khi op lỗi tạm thời (mặc định: {DEFAULT_MAX_ATTEMPTS})")
+    parser.add_argument("--retry-budget", type=int, default=DEFAULT_RETRY_BUDGET,
+                        help=f"Tổng số lần thử lại cho cả lần chạy (mặc định: {DEFAULT_RETRY_BUDGET})")
+    parser.add_argument("--on-duplicate", choices=["skip", "flag", "off"], default="skip",
+                        help="Xử lý item đã có trong vault (cùng tiêu đề và URL): skip (mặc định) bỏ qua, "
+                             "flag vẫn tạo nhưng đánh dấu trong kết quả, off không kiểm tra")
+    parser.add_argument("--vault-index-cache", action="store_true",
+                        help="Lưu chỉ mục vault vào thư mục temp và dùng lại ở lần chạy sau trong thời hạn "
+                             "--op-cache-ttl")
+    parser.add_argument("--read-ahead", type=int, default=DEFAULT_READ_AHEAD,
+                        help=f"Số dòng tối đa được đọc trước khi chờ import (mặc định: {DEFAULT_READ_AHEAD})")
+    parser.add_argument("--parse-workers", type=int, default=1, metavar="N",
+                        help="Số tiến trình parse file .txt lớn song song (mặc định: 1 - đọc tuần tự trong một luồng)")
+    parser.add_argument("--no-preflight", dest="preflight", action="store_false",
+                        help="Bỏ bước kiểm tra dữ liệu trước khi import (trường bắt buộc, email, số thẻ, ngày hết hạn, "
+                             "dòng trùng trong file); mặc định dòng lỗi được ghi vào output/<file>_preflight.csv")
+    parser.add_argument("--sheet", default=None,
+                        help="Sheet cần đọc trong file Excel (tên hoặc số thứ tự bắt đầu từ 0, mặc định: sheet đầu tiên)")
+    parser.add_argument("--skip-rows", type=int, default=0,
+                        help="Số dòng bỏ qua trước dòng tiêu đề trong file Excel (mặc định: 0)")
+    parser.add_argument("--report", default=DEFAULT_OPTIONS['report'],
+                        help=f"File JSON ghi thời gian từng giai đoạn và các bộ đếm của lần chạy (mặc định: {DEFAULT_OPTIONS['report']})")
+    parser.add_argument("--metrics-textfile", default=None,
+                        help="Ghi thêm metric theo định dạng textfile của Prometheus (node_exporter) ra file này")
+    parser.add_argument("--parallel-files", type=int, default=1, metavar="N",
+                        help="Số file được import cùng lúc (mặc định: 1 - lần lượt từng file)")
+    parser.add_argument("--max-in-flight", type=int, metavar="N",
+                        help="Giới hạn chung số lệnh op đang chạy khi import song song nhiều file (mặc định: bằng --workers)")
+    parser.add_argument("--fair-share", choices=["file", "vault"], default="file",
+                        help="Chia đều lượt chạy op giữa các file (mặc định) hoặc giữa các vault trước, khi dùng --parallel-files")
+    parser.add_argument("--shards", type=int, default=1, metavar="N",
+                        help="Chia mỗi file .txt/.csv lớn thành N phần, import bằng N tiến trình song song (mặc định: 1)")
+    parser.add_argument("--op-cache-ttl", type=float, default=DEFAULT_CACHE_TTL, metavar="GIÂY",
+                        help=f"Thời gian dùng lại kết quả kiểm tra op và danh sách vault đã cache trong temp/ "
+                             f"(mặc định: {DEFAULT_CACHE_TTL}, 0 để tắt)")
+    parser.add_argument("--state-sync", choices=list(SYNCHRONOUS_MODES), default=DEFAULT_SYNCHRONOUS,
+                        help="Mức an toàn khi ghi kho trạng thái: full (mặc định) fsync mỗi kết quả, normal nhanh hơn "
+                             "nhưng có thể mất vài kết quả cuối nếu máy tắt đột ngột (các dòng đó sẽ được import lại)")
+    parser.add_argument("--sync", action="store_true",
+                        help="Đồng bộ thay vì chỉ thêm mới: bỏ qua dòng không đổi, cập nhật dòng đã đổi (op item edit), "
+                             "chỉ tạo item cho dòng mới; bản ghi đồng bộ lưu trong thư mục sync/")
+    parser.add_argument("--manifest", metavar="FILE",
+                        help="Chạy không tương tác theo file manifest YAML/JSON (file/glob -> loại tài khoản, vault, ghi chú)")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="op",
+                        help="Cách ghi item: op (mặc định, 1Password CLI), connect (REST API của 1Password Connect "
+                             "server, token trong biến môi trường OP_CONNECT_TOKEN) hoặc export (ghi ra file --export)")
+    parser.add_argument("--connect-host", metavar="URL",
+                        help="Địa chỉ Connect server, ví dụ http://localhost:8080 (mặc định: biến môi trường OP_CONNECT_HOST)")
+    parser.add_argument("--export", metavar="FILE",
+                        help="Không gọi op mà ghi mọi item ra một file import của 1Password: .1pux hoặc .csv "
+                             "(chỉ item đăng nhập); dùng cho lần chuyển dữ liệu đầu tiên với rất nhiều item")
+    parser.add_argument("--runs", action="store_true",
+                        help="Liệt kê các lần chạy gần nhất (từ kho trạng thái temp/import_state.db) rồi thoát")
+    parser.add_argument("--failures", nargs="?", const="last", metavar="RUN",
+                        help="In các dòng lỗi của lần chạy RUN (mặc định: lần gần nhất) dạng CSV rồi thoát")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile cả lần chạy (cProfile + tracemalloc), ghi kết quả vào thư mục output")
+    return parser.parse_args(argv)
 
 def main():
     """Hàm chính của chương trình"""
+    args = parse_args()
+    if args.runs or args.failures:
+        # Chỉ tra cứu kho trạng thái, không cần 1Password CLI
+        if args.runs:
+            print_runs()
+        if args.failures:
+            print_failures(args.failures)
+        return
+        
+    options = {
+        'workers': max(1, args.workers),
+        'engine': args.engine,
+        'timeout': args.timeout,
+        'item_mode': args.item_mode,
+        'max_attempts': max(1, args.max_attempts),
+        'retry_budget': max(0, args.retry_budget),
+        'duplicates': args.on_duplicate,
+        'vault_index_cache': args.vault_index_cache,
+        'read_ahead': max(1, args.read_ahead),
+        'parse_workers': max(1, args.parse_workers),
+        'preflight': args.preflight,
+        'sheet': args.sheet,
+        'skip_rows': max(0, args.skip_rows),
+        'report': args.report,
+        'metrics_textfile': args.metrics_textfile,
+        'parallel_files': max(1, args.parallel_files),
+        'max_in_flight': max(1, args.max_in_flight) if args.max_in_flight else None,
+        'fair_share': args.fair_share,
+        'shards': max(1, args.shards),
+        'op_cache_ttl': max(0.0, args.op_cache_ttl),
+        'state_sync': args.state_sync,
+        'sync': args.sync,
+        'backend': 'export' if args.export and args.backend == 'op' else args.backend,
+        'connect_host': args.connect_host,
+        'export': args.export,
+    }
+    
+    profiler = None
+    if args.profile:
+        # Chỉ import khi cần để không làm chậm lúc khởi động
+        from profiling import start_profiler
+        profiler = start_profiler()
+    try:
+        run_import(options, args.manifest)
+    finally:
+        if profiler:
+            from profiling import finish_profiler
+            finish_profiler(profiler)
+
+def run_import(options: Dict, manifest_path: Optional[str] = None) -> None:
+    """Kiểm tra 1Password CLI, đọc cấu hình rồi xử lý các file input
+    
+    Với `manifest_path`, toàn bộ cấu hình lấy từ manifest và được kiểm tra trước khi import.
+    """
     global VAULT_LIST
     
+    # Phiên op dùng chung cho mọi lệnh op của lần chạy
+    session = configure_op_session(options.get('op_cache_ttl', DEFAULT_CACHE_TTL), interactive=manifest_path is None)
+    configure_state_store(options.get('state_sync', DEFAULT_SYNCHRONOUS))
+    
+    # Backend ghi item: op CLI hoặc Connect server
+    try:
+        backend = configure_backend({**DEFAULT_OPTIONS, **options})
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        sys.exit(1)
+    if isinstance(backend, ConnectBackend):
+        if not backend.check():
+            sys.exit(1)
+    elif isinstance(backend, ExportBackend):
+        if options.get('sync'):
+            print("❌ --sync cần đọc và sửa item trong vault, không dùng được khi xuất ra file")
+            sys.exit(1)
+        if options.get('shards', 1) > 1:
+            print("ℹ️ Chế độ xuất file không gọi op, bỏ qua --shards")
+            options['shards'] = 1
+        # Bundle luôn bắt đầu rỗng, chỉ mục vault đã lưu của vault thật không áp dụng
+        options['vault_index_cache'] = False
+        print(f"📦 Xuất item ra {backend.bundle.path}, không gọi op")
     # Kiểm tra 1Password CLI
-    if not check_1password_cli():
+    elif not check_1password_cli(interactive=manifest_path is None):
         return
         
     # Tạo các thư mục cần thiết
@@ -601,6 +1503,36 @@ def main():
     if not account_types:
         return
         
+    if manifest_path:
+        # Chế độ manifest: lấy danh sách vault để đổi tên vault thành id, kiểm tra mọi thứ trước khi chạy
+        try:
+            manifest = load_manifest(manifest_path)
+            if isinstance(backend, ExportBackend):
+                # Mỗi tên vault trong manifest là một vault của bundle
+                defaults = manifest.get('defaults') if isinstance(manifest.get('defaults'), dict) else {}
+                for job in manifest['jobs']:
+                    vault = job.get('vault', defaults.get('vault')) if isinstance(job, dict) else None
+                    if vault:
+                        backend.bundle.add_vault(str(vault).strip())
+            VAULT_LIST = get_vault_list()
+            try:
+                file_configs = build_file_configs(manifest, account_types, VAULT_LIST)
+            except ManifestError:
+                # Danh sách vault trong cache có thể đã cũ (vault mới tạo, đổi tên): lấy lại rồi kiểm tra lại
+                if session.cached('vaults') is None:
+                    raise
+                VAULT_LIST = get_vault_list(refresh=True)
+                file_configs = build_file_configs(manifest, account_types, VAULT_LIST)
+        except ManifestError as e:
+            print(f"❌ Manifest {manifest_path} không hợp lệ:")
+            for error in e.errors:
+                print(f"   - {error}")
+            sys.exit(1)
+        print(f"✅ Manifest hợp lệ: {len(file_configs)} file")
+        process_input_files([config['file'] for config in file_configs], account_types, options,
+                            manifest_configs=file_configs)
+        return
+        
     # Lấy danh sách file từ thư mục input
     input_files = get_input_files()
     if not input_files:
@@ -613,7 +1545,7 @@ def main():
         return
         
     # Xử lý từng file
-    process_input_files(input_files, account_types)
+    process_input_files(input_files, account_types, options)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,290 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from connect_client import CONNECT_HOST_ENV, CONNECT_TOKEN_ENV, ConnectClient, ConnectError
+from export_bundle import DEFAULT_EXPORT_PATH, ExportBundle
+from metrics import echo
+from op_cli import (
+    OP_NO_RESPONSE, OP_TIMEOUT, build_edit_command, build_item_command, is_missing_item_error, parse_create_result,
+    run_op_command, run_op_command_async
+)
+from schema import AccountSchema, Record
+
+# Các backend ghi item được hỗ trợ (--backend)
+BACKENDS = ("op", "connect", "export")
+
+class ItemBackend:
+    """Nơi ghi item vào 1Password: process_file chỉ làm việc qua giao diện này.
+
+    create_item/update_item trả về (thành công, item id, lỗi); lỗi có dạng giống lỗi của op
+    (ví dụ "(429) Too Many Requests") để RetryScheduler phân loại và thử lại như nhau.
+    """
+
+    name = ""
+    # Danh sách vault có được cache trong temp/op_cache.json (--op-cache-ttl) không
+    cache_vaults = False
+    # Ghi item không chờ I/O mạng: process_file gọi create_item_inline tuần tự thay vì chạy pool,
+    # ghi nhật ký theo lô `inline_batch` dòng và gọi flush() trước mỗi lần commit
+    inline = False
+    inline_batch = 1000
+
+    def list_vaults(self) -> Optional[List[Dict]]:
+        """Danh sách vault [{'id', 'name'}], None nếu không lấy được"""
+        raise NotImplementedError
+
+    def list_items(self, vault_id: str, timeout: float = OP_TIMEOUT) -> Tuple[Optional[List[Dict]], Optional[str]]:
+        """(các item có sẵn trong vault [{'id', 'title', 'urls'}], lỗi)"""
+        raise NotImplementedError
+
+    async def create_item(self, data: Record, account_type: AccountSchema, vault: str, notes: str = "",
+                          timeout: float = OP_TIMEOUT, item_mode: str = 'argv') -> tuple:
+        raise NotImplementedError
+
+    async def update_item(self, item_id: str, data: Record, account_type: AccountSchema, vault: str,
+                          notes: str = "", timeout: float = OP_TIMEOUT) -> tuple:
+        raise NotImplementedError
+
+    async def find_item(self, title: str, vault: str, timeout: float = OP_TIMEOUT) -> Tuple[Optional[str], Optional[str]]:
+        """(id của item có đúng tiêu đề `title` hoặc None, lỗi); dùng để biết một lần tạo item bị lỗi
+        giữa chừng (timeout, mất kết nối) có thực ra đã thành công chưa trước khi tạo lại
+        """
+        raise NotImplementedError
+
+    def create_item_inline(self, data: Record, account_type: AccountSchema, vault: str, notes: str = "") -> tuple:
+        """Phiên bản đồng bộ của create_item cho backend có `inline`"""
+        raise NotImplementedError
+
+    def open(self, journal) -> None:
+        """Gọi khi bắt đầu (hoặc tiếp tục) một lần chạy; `journal` là kho trạng thái của lần chạy"""
+
+    def flush(self) -> None:
+        """Đưa các item đã ghi xuống đĩa (backend inline)"""
+
+    def finish(self) -> None:
+        """Gọi khi mọi file của lần chạy đã xử lý xong"""
+
+    def close(self) -> None:
+        pass
+
+class OpCliBackend(ItemBackend):
+    """Ghi item bằng 1Password CLI: mỗi item là một tiến trình op"""
+
+    name = "op"
+    cache_vaults = True
+
+    def list_vaults(self) -> Optional[List[Dict]]:
+        result = run_op_command(["op", "vault", "list", "--format", "json"])
+        if result and result.returncode == 0:
+            return json.loads(result.stdout)
+        return None
+
+    def list_items(self, vault_id: str, timeout: float = OP_TIMEOUT) -> Tuple[Optional[List[Dict]], Optional[str]]:
+        result = run_op_command(["op", "item", "list", "--vault", vault_id, "--format", "json"], timeout=timeout)
+        if not result or result.returncode != 0:
+            return None, result.stderr if result else None
+        try:
+            return json.loads(result.stdout or "[]"), None
+        except json.JSONDecodeError as e:
+            return None, f"Không thể parse danh sách item: {str(e)}"
+
+    async def create_item(self, data: Record, account_type: AccountSchema, vault: str, notes: str = "",
+                          timeout: float = OP_TIMEOUT, item_mode: str = 'argv') -> tuple:
+        """Với item_mode='template', item được gửi dưới dạng JSON qua stdin
+        thay vì truyền từng trường qua tham số dòng lệnh.
+        """
+        if item_mode == 'template':
+            title = account_type.title_value(data)
+            item_json = account_type.render_template(data, notes)
+            cmd = ["op", "item", "create", "--vault", vault, "--format", "json", "-"]
+            result = await run_op_command_async(cmd, timeout, input=item_json)
+        else:
+            cmd, title = build_item_command(data, account_type, vault, notes)
+            result = await run_op_command_async(cmd, timeout)
+        return parse_create_result(result, title)
+
+    async def update_item(self, item_id: str, data: Record, account_type: AccountSchema, vault: str,
+                          notes: str = "", timeout: float = OP_TIMEOUT) -> tuple:
+        """Cập nhật bằng op item edit (luôn truyền trường qua tham số dòng lệnh)"""
+        cmd, title = build_edit_command(item_id, data, account_type, vault, notes)
+        result = await run_op_command_async(cmd, timeout)
+        return parse_create_result(result, title, action="cập nhật")
+
+    async def find_item(self, title: str, vault: str, timeout: float = OP_TIMEOUT) -> Tuple[Optional[str], Optional[str]]:
+        result = await run_op_command_async(["op", "item", "get", title, "--vault", vault, "--format", "json"], timeout)
+        if result and result.returncode == 0:
+            try:
+                return json.loads(result.stdout).get("id"), None
+            except json.JSONDecodeError as e:
+                return None, f"Không thể parse JSON response: {str(e)}"
+        error = result.stderr.strip() if result else OP_NO_RESPONSE
+        if is_missing_item_error(error):
+            return None, None
+        # Ví dụ nhiều item cùng tiêu đề: không chắc item đã được tạo chưa, báo lỗi thay vì tạo thêm
+        return None, error or f"op trả về mã lỗi {result.returncode}"
+
+class ConnectBackend(ItemBackend):
+    """Ghi item qua REST API của 1Password Connect server, dùng chung một pool kết nối keep-alive"""
+
+    name = "connect"
+
+    def __init__(self, client: ConnectClient):
+        self.client = client
+
+    def check(self) -> bool:
+        """Kiểm tra kết nối và token trước khi import"""
+        try:
+            vaults = self.client.list_vaults()
+        except ConnectError as e:
+            print(f"❌ Không kết nối được 1Password Connect ({self.client.host}): {str(e)}")
+            return False
+        print(f"✅ Đã kết nối 1Password Connect {self.client.host} ({len(vaults)} vault)")
+        return True
+
+    def list_vaults(self) -> Optional[List[Dict]]:
+        try:
+            return self.client.list_vaults()
+        except ConnectError as e:
+            print(f"❌ Lỗi khi lấy danh sách vault: {str(e)}")
+            return None
+
+    def list_items(self, vault_id: str, timeout: float = OP_TIMEOUT) -> Tuple[Optional[List[Dict]], Optional[str]]:
+        try:
+            return self.client.list_items(vault_id, timeout), None
+        except ConnectError as e:
+            return None, str(e)
+
+    async def create_item(self, data: Record, account_type: AccountSchema, vault: str, notes: str = "",
+                          timeout: float = OP_TIMEOUT, item_mode: str = 'argv') -> tuple:
+        """Tạo item bằng POST /v1/vaults/{vault}/items (item_mode không áp dụng, luôn gửi JSON)"""
+        item = account_type.item_payload(data, notes)
+        item["vault"] = {"id": vault}
+        try:
+            response = await self.client.create_item_async(vault, item, timeout)
+        except ConnectError as e:
+            echo(f"❌ Không thể thêm {account_type.title_value(data)}\nLỗi: {str(e)}")
+            return False, None, str(e)
+        return True, (response or {}).get("id"), None
+
+    async def update_item(self, item_id: str, data: Record, account_type: AccountSchema, vault: str,
+                          notes: str = "", timeout: float = OP_TIMEOUT) -> tuple:
+        """Đọc item hiện tại, ghi đè các trường của dòng rồi PUT lại, giữ nguyên các trường khác
+        (giống op item edit)
+        """
+        try:
+            current = await self.client.get_item_async(vault, item_id, timeout)
+            item = merge_item(current or {}, account_type.item_payload(data, notes))
+            response = await self.client.replace_item_async(vault, item_id, item, timeout)
+        except ConnectError as e:
+            echo(f"❌ Không thể cập nhật {account_type.title_value(data)}\nLỗi: {str(e)}")
+            return False, None, str(e)
+        return True, (response or {}).get("id", item_id), None
+
+    async def find_item(self, title: str, vault: str, timeout: float = OP_TIMEOUT) -> Tuple[Optional[str], Optional[str]]:
+        try:
+            items = await self.client.find_items_async(vault, title, timeout)
+        except ConnectError as e:
+            return None, str(e)
+        return (items[0].get("id") if items else None), None
+
+    def close(self) -> None:
+        self.client.close()
+
+class ExportBackend(ItemBackend):
+    """Không ghi vào 1Password mà ghi mọi item vào một file import (1PUX hoặc CSV), không gọi op.
+
+    Vault là các vault của bundle (mặc định một vault "Imported", hoặc theo tên vault trong
+    manifest); vault đích được chọn khi import file vào 1Password. Bundle ban đầu rỗng, nên kiểm
+    tra trùng lặp chỉ bắt các dòng trùng nhau trong lần xuất.
+    """
+
+    name = "export"
+    inline = True
+
+    def __init__(self, bundle: ExportBundle):
+        self.bundle = bundle
+
+    def list_vaults(self) -> Optional[List[Dict]]:
+        return [{'id': vault_id, 'name': name} for vault_id, name in self.bundle.vaults.items()]
+
+    def list_items(self, vault_id: str, timeout: float = OP_TIMEOUT) -> Tuple[Optional[List[Dict]], Optional[str]]:
+        return [], None
+
+    async def create_item(self, data: Record, account_type: AccountSchema, vault: str, notes: str = "",
+                          timeout: float = OP_TIMEOUT, item_mode: str = 'argv') -> tuple:
+        result = self.create_item_inline(data, account_type, vault, notes)
+        # Gọi từng item (không qua lô của process_file): dòng được ghi vào nhật ký ngay sau đó
+        self.flush()
+        return result
+
+    def create_item_inline(self, data: Record, account_type: AccountSchema, vault: str, notes: str = "") -> tuple:
+        item_id, error = self.bundle.add(vault, account_type, data, notes)
+        if error:
+            echo(f"❌ Không thể xuất {account_type.title_value(data)}\nLỗi: {error}")
+            return False, None, error
+        return True, item_id, None
+
+    async def update_item(self, item_id: str, data: Record, account_type: AccountSchema, vault: str,
+                          notes: str = "", timeout: float = OP_TIMEOUT) -> tuple:
+        return False, None, "Chế độ xuất file không hỗ trợ cập nhật item"
+
+    def open(self, journal) -> None:
+        # Dòng chưa commit chỉ có thể nằm trong lô cuối (cộng một dòng chờ của mỗi file chạy song song)
+        self.bundle.open(journal.run_id, journal.recorded_item_ids, tail=self.inline_batch * 2)
+
+    def flush(self) -> None:
+        self.bundle.flush()
+
+    def finish(self) -> None:
+        count = self.bundle.finish()
+        print(f"📦 Đã xuất {count} item ra {self.bundle.path}")
+
+    def close(self) -> None:
+        self.bundle.close()
+
+def merge_item(current: Dict, changes: Dict) -> Dict:
+    """Item hiện tại với tiêu đề, URL và các trường (so theo id) lấy từ `changes`"""
+    item = dict(current)
+    item["title"] = changes["title"]
+    if changes.get("urls"):
+        item["urls"] = changes["urls"]
+    fields = [dict(field) for field in current.get("fields") or []]
+    by_id = {field.get("id"): field for field in fields}
+    for field in changes.get("fields", []):
+        existing = by_id.get(field["id"])
+        if existing is not None:
+            existing.update(field)
+        else:
+            fields.append(dict(field))
+    item["fields"] = fields
+    return item
+
+_current: ItemBackend = OpCliBackend()
+
+def get_backend() -> ItemBackend:
+    """Backend ghi item của lần chạy hiện tại"""
+    return _current
+
+def configure_backend(options: Dict) -> ItemBackend:
+    """Chọn backend theo tùy chọn --backend; Connect cần địa chỉ server và token (OP_CONNECT_TOKEN),
+    export ghi vào file --export (phần mở rộng không hỗ trợ thì báo ValueError)
+
+    Pool kết nối của Connect có kích thước bằng số request chạy song song tối đa của lần chạy.
+    """
+    global _current
+    _current.close()
+    backend = options.get('backend', 'op')
+    if backend == 'export':
+        _current = ExportBackend(ExportBundle(options.get('export') or DEFAULT_EXPORT_PATH))
+        return _current
+    if backend != 'connect':
+        _current = OpCliBackend()
+        return _current
+    host = options.get('connect_host') or os.environ.get(CONNECT_HOST_ENV)
+    token = os.environ.get(CONNECT_TOKEN_ENV)
+    if not host or not token:
+        raise ValueError(f"--backend connect cần địa chỉ server (--connect-host hoặc {CONNECT_HOST_ENV}) "
+                         f"và token trong biến môi trường {CONNECT_TOKEN_ENV}")
+    pool_size = max(options.get('workers') or 1, options.get('max_in_flight') or 0)
+    _current = ConnectBackend(ConnectClient(host, token, pool_size, options.get('timeout', OP_TIMEOUT)))
+    return _current
@@ -0,0 +1,87 @@
+"""So sánh tốc độ đọc CSV: cách cũ (pandas + iterrows) và CSVFileHandler hiện tại.
+
+Cách dùng:
+    python benchmarks/bench_csv_reader.py --rows 1000000
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_handlers import CSVFileHandler
+from schema import AccountSchema
+
+ACCOUNT_TYPE = {
+    "category": "login",
+    "title_prefix": "Bench:",
+    "fields": [
+        {"name": "username", "type": "email", "required": True},
+        {"name": "password", "type": "password", "required": True},
+        {"name": "otp", "type": "otp", "required": False},
+    ],
+}
+
+def write_sample(path: str, rows: int) -> None:
+    """Tạo file CSV mẫu với `rows` dòng"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["username", "password", "otp", "note"])
+        for i in range(rows):
+            writer.writerow([f"user{i}@example.com", f" pass{i} ", "" if i % 3 else f"OTP{i}", f"note {i}"])
+
+def read_with_iterrows(path: str, account_type: dict) -> int:
+    """Cách đọc cũ: pd.read_csv rồi duyệt bằng iterrows, str().strip() và pd.notna cho từng ô"""
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    fields = [f["name"] for f in account_type["fields"]] + [c for c in df.columns if c not in
+                                                             [f["name"] for f in account_type["fields"]]]
+    count = 0
+    for idx, row in df.iterrows():
+        item = {}
+        for field_name in fields:
+            if field_name in df.columns:
+                value = row[field_name]
+                item[field_name] = str(value).strip() if pd.notna(value) else ""
+            else:
+                item[field_name] = ""
+        count += 1
+    return count
+
+def read_with_handler(path: str, account_type: dict) -> int:
+    """Cách đọc mới: CSVFileHandler.iter_data"""
+    handler = CSVFileHandler(path, AccountSchema("bench", account_type))
+    return sum(1 for _ in handler.iter_data())
+
+def measure(name: str, func, path: str) -> float:
+    start = time.perf_counter()
+    count = func(path, ACCOUNT_TYPE)
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed else 0
+    print(f"{name:<22} {count:>10,} dòng  {elapsed:8.2f} s  {rate:>12,.0f} dòng/s")
+    return rate
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark đọc file CSV")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Số dòng của file mẫu (mặc định: 1.000.000)")
+    parser.add_argument("--skip-pandas", action="store_true", help="Bỏ qua cách đọc cũ bằng pandas")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.csv")
+        write_sample(path, args.rows)
+        print(f"📄 File mẫu: {args.rows:,} dòng, {os.path.getsize(path) / 1024 / 1024:.1f} MB\n")
+
+        before = None
+        if not args.skip_pandas:
+            before = measure("pandas + iterrows", read_with_iterrows, path)
+        after = measure("CSVFileHandler", read_with_handler, path)
+        if before:
+            print(f"\n🚀 Nhanh hơn {after / before:.1f} lần")
+
+if __name__ == "__main__":
+    main()
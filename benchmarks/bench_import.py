@@ -0,0 +1,219 @@
+"""Đo tốc độ import của process_file với `op` giả (benchmarks/fake_op.py) hoặc Connect server giả
+(benchmarks/fake_connect.py, `--backend connect`), không cần tài khoản 1Password.
+
+Mỗi cấu hình (số dòng × số lệnh song song × engine) chạy trong một tiến trình con riêng trên
+một thư mục tạm, với `op` giả đặt đầu PATH. Kết quả gồm số item/giây, độ trễ p50/p95/p99
+(lấy từ cột latency_ms của file kết quả) và bộ nhớ tối đa (peak RSS) của tiến trình import.
+
+Cách dùng:
+    python benchmarks/bench_import.py --sizes 100,1000 --workers 1,4,16
+    python benchmarks/bench_import.py --engines thread,async --latency 0.2 --throttle-rate 0.05
+    python benchmarks/bench_import.py --max-concurrency 8 --json import.json
+    python benchmarks/bench_import.py --backend connect --sizes 1000 --workers 1,16,64
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_OP = os.path.join(ROOT, "benchmarks", "fake_op.py")
+FAKE_CONNECT = os.path.join(ROOT, "benchmarks", "fake_connect.py")
+ACCOUNT_TYPE = "hotmail"
+VAULT_ID = "benchvault0000000000000000"
+
+# Chạy trong tiến trình con: import một file rồi ghi thời gian và peak RSS ra file JSON
+DRIVER = """
+import json, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+import account_import
+from backends import configure_backend
+
+configure_backend(json.loads(sys.argv[4]))
+account_types = account_import.load_account_types()
+options = json.loads(sys.argv[4])
+started = time.perf_counter()
+account_import.process_file(sys.argv[2], account_types[sys.argv[3]], sys.argv[5], "", options)
+elapsed = time.perf_counter() - started
+
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+peak_mb = peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+with open(sys.argv[6], "w") as f:
+    json.dump({"elapsed_s": elapsed, "peak_rss_mb": peak_mb}, f)
+"""
+
+def write_input(path: str, rows: int) -> None:
+    """Tạo file text mẫu theo format của loại tài khoản hotmail"""
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(rows):
+            f.write(f"bench{i}@example.com|pass{i}|token{i}|client{i}\n")
+
+def write_op_shim(bin_dir: str) -> None:
+    """Đặt lệnh `op` trỏ tới fake_op.py bằng đúng trình thông dịch đang chạy (-S để khởi động nhanh hơn)"""
+    op_path = os.path.join(bin_dir, "op")
+    with open(op_path, "w") as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" -S "{FAKE_OP}" "$@"\n')
+    os.chmod(op_path, 0o755)
+
+def percentile(values: List[float], pct: float) -> float:
+    """Phân vị theo nearest-rank"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+def read_results(path: str) -> Dict:
+    """Đếm trạng thái và lấy độ trễ từ file kết quả"""
+    statuses: Dict[str, int] = {}
+    latencies = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            statuses[row["status"]] = statuses.get(row["status"], 0) + 1
+            if row["latency_ms"]:
+                latencies.append(float(row["latency_ms"]))
+    return {"statuses": statuses, "latencies": latencies}
+
+def run_case(workdir: str, env: Dict, rows: int, workers: int, engine: str, args) -> Dict:
+    """Chạy một cấu hình trong tiến trình con và tổng hợp kết quả"""
+    input_file = os.path.join("input", f"bench_{rows}.txt")
+    result_file = os.path.join(workdir, "output", f"bench_{rows}_result.csv")
+    report_file = os.path.join(workdir, "driver.json")
+    for path in (result_file, report_file):
+        if os.path.exists(path):
+            os.remove(path)
+
+    options = {
+        "workers": workers,
+        "engine": engine,
+        "item_mode": args.item_mode,
+        "timeout": args.timeout,
+        "duplicates": "off",
+        "backend": args.backend,
+    }
+    subprocess.run(
+        [sys.executable, "-c", DRIVER, ROOT, input_file, ACCOUNT_TYPE, json.dumps(options), VAULT_ID, report_file],
+        cwd=workdir, env=env, check=True,
+        stdout=subprocess.DEVNULL if not args.verbose else None, stdin=subprocess.DEVNULL,
+    )
+    with open(report_file) as f:
+        driver = json.load(f)
+    results = read_results(result_file)
+
+    created = results["statuses"].get("success", 0)
+    latencies = results["latencies"]
+    return {
+        "rows": rows,
+        "workers": workers,
+        "engine": engine,
+        "item_mode": args.item_mode,
+        "backend": args.backend,
+        "elapsed_s": round(driver["elapsed_s"], 3),
+        "items_per_s": round(created / driver["elapsed_s"], 1) if driver["elapsed_s"] else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        },
+        "peak_rss_mb": round(driver["peak_rss_mb"], 1),
+        "statuses": results["statuses"],
+    }
+
+def start_fake_connect(args) -> subprocess.Popen:
+    """Chạy Connect server giả trên một cổng trống với cùng cấu hình độ trễ/lỗi như op giả"""
+    server = subprocess.Popen(
+        [sys.executable, FAKE_CONNECT, "--port", "0", "--token", "bench-token",
+         "--latency", str(args.latency), "--jitter", str(args.jitter), "--error-rate", str(args.error_rate),
+         "--fatal-rate", str(args.fatal_rate), "--throttle-rate", str(args.throttle_rate),
+         "--max-concurrency", str(args.max_concurrency)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    server.url = server.stdout.readline().strip()
+    return server
+
+def parse_list(value: str, cast=int) -> list:
+    return [cast(part) for part in value.split(",") if part.strip()]
+
+def main():
+    if os.name == "nt":
+        print("❌ Benchmark này cần shell POSIX (Linux/macOS)")
+        sys.exit(1)
+
+    parser = argparse.ArgumentParser(description="Benchmark tốc độ import với op giả")
+    parser.add_argument("--sizes", default="100,1000", help="Các số dòng cần đo, cách nhau bởi dấu phẩy (mặc định: 100,1000)")
+    parser.add_argument("--workers", default="1,4,16", help="Các mức song song cần đo (mặc định: 1,4,16)")
+    parser.add_argument("--engines", default="thread", help="Các engine cần đo: thread, async (mặc định: thread)")
+    parser.add_argument("--backend", choices=["op", "connect"], default="op",
+                        help="Backend ghi item: op (op giả, mặc định) hoặc connect (Connect server giả)")
+    parser.add_argument("--item-mode", choices=["argv", "template"], default="argv",
+                        help="Cách gửi dữ liệu cho op item create (mặc định: argv)")
+    parser.add_argument("--timeout", type=float, default=30, help="Timeout mỗi lệnh op, giây (mặc định: 30)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latency trung bình của op giả, giây (mặc định: 0.05)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Độ dao động latency, tỉ lệ 0-1 (mặc định: 0.2)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỉ lệ lỗi tạm thời (mặc định: 0)")
+    parser.add_argument("--fatal-rate", type=float, default=0.0, help="Tỉ lệ lỗi không thử lại được (mặc định: 0)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Tỉ lệ bị giới hạn tốc độ ngẫu nhiên (mặc định: 0)")
+    parser.add_argument("--max-concurrency", type=int, default=0,
+                        help="Số lệnh chạy cùng lúc tối đa trước khi op giả báo 429 (mặc định: 0 - không giới hạn)")
+    parser.add_argument("--json", metavar="FILE", help="Ghi kết quả ra file JSON")
+    parser.add_argument("--verbose", action="store_true", help="Hiển thị output của chương trình import")
+    args = parser.parse_args()
+
+    sizes = parse_list(args.sizes)
+    worker_levels = parse_list(args.workers)
+    engines = parse_list(args.engines, str.strip)
+
+    reports = []
+    with tempfile.TemporaryDirectory() as workdir:
+        bin_dir = os.path.join(workdir, "bin")
+        for sub in ("bin", "input", "output", "temp"):
+            os.makedirs(os.path.join(workdir, sub))
+        shutil.copy(os.path.join(ROOT, "account_types.yaml"), workdir)
+        write_op_shim(bin_dir)
+        for rows in sizes:
+            write_input(os.path.join(workdir, "input", f"bench_{rows}.txt"), rows)
+
+        env = dict(
+            os.environ,
+            PATH=bin_dir + os.pathsep + os.environ.get("PATH", ""),
+            FAKE_OP_LATENCY=str(args.latency),
+            FAKE_OP_JITTER=str(args.jitter),
+            FAKE_OP_ERROR_RATE=str(args.error_rate),
+            FAKE_OP_FATAL_RATE=str(args.fatal_rate),
+            FAKE_OP_THROTTLE_RATE=str(args.throttle_rate),
+            FAKE_OP_MAX_CONCURRENCY=str(args.max_concurrency),
+            FAKE_OP_STATE_DIR=os.path.join(workdir, "op_state"),
+        )
+        server = start_fake_connect(args) if args.backend == "connect" else None
+        if server:
+            env.update(OP_CONNECT_HOST=server.url, OP_CONNECT_TOKEN="bench-token")
+
+        print(f"{'dòng':>8} {'engine':>7} {'song song':>9} {'item/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'p99 ms':>8} {'RSS MB':>8}  kết quả")
+        try:
+            for rows in sizes:
+                for engine in engines:
+                    for workers in worker_levels:
+                        report = run_case(workdir, env, rows, workers, engine, args)
+                        reports.append(report)
+                        latency = report["latency_ms"]
+                        statuses = ", ".join(f"{name}={count}" for name, count in sorted(report["statuses"].items()))
+                        print(f"{rows:>8} {engine:>7} {workers:>9} {report['items_per_s']:>9.1f} {latency['p50']:>8.0f} "
+                              f"{latency['p95']:>8.0f} {latency['p99']:>8.0f} {report['peak_rss_mb']:>8.1f}  {statuses}")
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": sys.version.split()[0], "runs": reports}, f, indent=2)
+        print(f"\n📝 Đã ghi kết quả ra file: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Đo thời gian khởi động của account_import.py: từ lúc chạy lệnh đến lệnh `op` đầu tiên.
+
+Một file `op` giả được đặt đầu PATH; nó chỉ ghi lại thời điểm được gọi rồi thoát với mã lỗi,
+nên chương trình dừng ngay sau bước kiểm tra 1Password CLI. Kết quả có thể xuất dạng JSON
+để CI theo dõi qua các lần build.
+
+Cách dùng:
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FAKE_OP = """#!/bin/sh
+# op giả: ghi lại thời điểm được gọi (qua mtime của file đánh dấu) rồi báo lỗi
+: > "$BENCH_OP_MARKER"
+exit 1
+"""
+
+def measure_once(bin_dir: str, marker: str) -> float:
+    """Số giây từ lúc tạo tiến trình đến khi `op` được gọi lần đầu"""
+    if os.path.exists(marker):
+        os.remove(marker)
+    env = dict(os.environ, PATH=bin_dir + os.pathsep + os.environ.get("PATH", ""), BENCH_OP_MARKER=marker)
+
+    started = time.time_ns()
+    subprocess.run([sys.executable, os.path.join(ROOT, "account_import.py")], cwd=ROOT, env=env,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL)
+    if not os.path.exists(marker):
+        raise RuntimeError("op giả không được gọi, kiểm tra lại account_import.py")
+    return (os.stat(marker).st_mtime_ns - started) / 1e9
+
+def heavy_modules() -> list:
+    """Các thư viện nặng bị import ngay khi nạp account_import"""
+    code = "import sys, account_import; print(' '.join(m for m in ('pandas', 'openpyxl', 'numpy') if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    return output.stdout.split()
+
+def main():
+    if os.name == "nt":
+        print("❌ Benchmark này cần shell POSIX (Linux/macOS)")
+        sys.exit(1)
+
+    parser = argparse.ArgumentParser(description="Benchmark thời gian khởi động đến lệnh op đầu tiên")
+    parser.add_argument("--runs", type=int, default=10, help="Số lần chạy (mặc định: 10)")
+    parser.add_argument("--json", metavar="FILE", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        op_path = os.path.join(tmp, "op")
+        with open(op_path, "w") as f:
+            f.write(FAKE_OP)
+        os.chmod(op_path, 0o755)
+        marker = os.path.join(tmp, "called")
+
+        # Lần chạy đầu để làm nóng cache của hệ điều hành, không tính vào kết quả
+        measure_once(tmp, marker)
+        samples = [measure_once(tmp, marker) for _ in range(max(1, args.runs))]
+
+    report = {
+        "runs": len(samples),
+        "time_to_first_op_ms": {
+            "min": round(min(samples) * 1000, 1),
+            "median": round(statistics.median(samples) * 1000, 1),
+            "max": round(max(samples) * 1000, 1),
+        },
+        "heavy_modules_at_startup": heavy_modules(),
+        "python": sys.version.split()[0],
+    }
+
+    timing = report["time_to_first_op_ms"]
+    print(f"⏱️  Thời gian đến lệnh op đầu tiên ({report['runs']} lần): "
+          f"min {timing['min']} ms, median {timing['median']} ms, max {timing['max']} ms")
+    if report["heavy_modules_at_startup"]:
+        print(f"⚠️ Thư viện nặng được import khi khởi động: {', '.join(report['heavy_modules_at_startup'])}")
+    else:
+        print("✅ Không import pandas/openpyxl khi khởi động")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Đã ghi kết quả ra file: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""So sánh tốc độ đọc file text lớn: TextFileHandler tuần tự và parse song song bằng mmap (--parse-workers).
+
+Kiểm tra luôn hai cách cho cùng các Record và cùng số dòng của các dòng lỗi.
+
+Cách dùng:
+    python benchmarks/bench_text_parser.py --rows 5000000 --workers 2,4,8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_handlers import TextFileHandler
+from schema import AccountSchema
+
+ACCOUNT_TYPE = {
+    "category": "login",
+    "title_prefix": "Bench:",
+    "format": "username|password|refresh_token|client_id",
+    "delimiter": "|",
+    "fields": [
+        {"name": "username", "type": "email", "required": True},
+        {"name": "password", "type": "password", "required": True},
+        {"name": "refresh_token", "type": "text", "required": False},
+        {"name": "client_id", "type": "text", "required": False},
+    ],
+}
+
+def write_sample(path: str, rows: int) -> None:
+    """Tạo file mẫu; cứ 1000 dòng có một dòng thiếu trường và một dòng trống"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(rows):
+            if i % 1000 == 999:
+                f.write(f"user{i}@hotmail.com\n\n")
+            else:
+                f.write(f"user{i}@hotmail.com| pass{i} |M.R3_BAY.{i:012d}-token|9e5f94bc-e8a4-4e73-b8be-63364c29d753\n")
+
+def read_all(path: str, workers: int):
+    """Đọc cả file, trả về (các Record, số dòng của các dòng lỗi)"""
+    errors = []
+    skip_row = TextFileHandler._skip_row
+    TextFileHandler._skip_row = lambda self, row_num, error: errors.append(row_num)
+    try:
+        handler = TextFileHandler(path, AccountSchema("bench", ACCOUNT_TYPE), {'parse_workers': workers})
+        return list(handler.iter_data()), errors
+    finally:
+        TextFileHandler._skip_row = skip_row
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parse file text")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Số dòng của file mẫu (mặc định: 2.000.000)")
+    parser.add_argument("--workers", default="2,4", help="Các số tiến trình parse cần đo, cách nhau bởi dấu phẩy")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.txt")
+        write_sample(path, args.rows)
+        print(f"📄 File mẫu: {args.rows:,} dòng, {os.path.getsize(path) / 1024 / 1024:.1f} MB "
+              f"({os.cpu_count()} CPU)\n")
+
+        baseline = None
+        for workers in [1] + [int(value) for value in args.workers.split(",") if value.strip()]:
+            start = time.perf_counter()
+            records, errors = read_all(path, workers)
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline = (records, errors, elapsed)
+            same = records == baseline[0] and errors == baseline[1]
+            label = "tuần tự" if workers == 1 else f"{workers} tiến trình"
+            print(f"{label:<14} {len(records):>10,} dòng  {len(errors):>6,} lỗi  {elapsed:8.2f} s  "
+                  f"{len(records) / elapsed:>12,.0f} dòng/s  x{baseline[2] / elapsed:.2f}"
+                  f"{'' if same else '  ❌ KHÁC KẾT QUẢ TUẦN TỰ'}")
+
+if __name__ == "__main__":
+    main()
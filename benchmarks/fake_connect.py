@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""1Password Connect server giả dùng cho benchmark và kiểm thử `--backend connect`, không cần tài khoản thật.
+
+Hỗ trợ: `GET /heartbeat`, `GET /v1/vaults`, `GET/POST /v1/vaults/{id}/items` (lọc bằng `?filter=title eq "..."`),
+`GET/PUT /v1/vaults/{id}/items/{item}` với header `Authorization: Bearer TOKEN`, giữ kết nối
+keep-alive (HTTP/1.1). Dữ liệu chỉ nằm trong bộ nhớ. `GET /stats` (không có trong Connect thật)
+trả về số kết nối, số request và số item để kiểm tra pool kết nối của client.
+
+Cách dùng:
+    python benchmarks/fake_connect.py --port 8080 --token bench-token --latency 0.05
+    OP_CONNECT_HOST=http://127.0.0.1:8080 OP_CONNECT_TOKEN=bench-token python3 account_import.py --backend connect
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+VAULTS = [{"id": "benchvault0000000000000000", "name": "Benchmark"}]
+
+ITEMS_PATH = re.compile(r"^/v1/vaults/([^/]+)/items(?:/([^/]+))?$")
+
+TITLE_FILTER = re.compile(r'^title eq "((?:[^"\\]|\\.)*)"$')
+
+class FakeConnect:
+    """Trạng thái của server: item theo vault, bộ đếm và cấu hình lỗi/độ trễ"""
+
+    def __init__(self, args):
+        self.args = args
+        self.items = {vault["id"]: {} for vault in VAULTS}
+        self.connections = 0
+        self.requests = 0
+        self.running = 0
+        self.lock = threading.Lock()
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server_version = "FakeConnect/1.0"
+
+    def setup(self) -> None:
+        super().setup()
+        with self.state.lock:
+            self.state.connections += 1
+
+    @property
+    def state(self) -> FakeConnect:
+        return self.server.state
+
+    def log_message(self, format: str, *args) -> None:
+        if self.state.args.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self) -> None:
+        self.handle_request("GET")
+
+    def do_POST(self) -> None:
+        self.handle_request("POST")
+
+    def do_PUT(self) -> None:
+        self.handle_request("PUT")
+
+    def handle_request(self, method: str) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        with self.state.lock:
+            self.state.requests += 1
+
+        if self.path == "/heartbeat":
+            return self.send_text(200, ".")
+        if self.path == "/stats":
+            with self.state.lock:
+                stats = {
+                    "connections": self.state.connections,
+                    "requests": self.state.requests,
+                    "items": sum(len(items) for items in self.state.items.values()),
+                }
+            return self.send_json(200, stats)
+        if self.headers.get("Authorization") != f"Bearer {self.state.args.token}":
+            return self.send_error_json(401, "Invalid bearer token")
+        if self.path == "/v1/vaults" and method == "GET":
+            return self.send_json(200, VAULTS)
+
+        url = urlsplit(self.path)
+        match = ITEMS_PATH.match(url.path)
+        if not match or match.group(1) not in self.state.items:
+            return self.send_error_json(404, "Vault not found" if match else "Not found")
+        items = self.state.items[match.group(1)]
+        item_id = match.group(2)
+
+        if method == "GET" and item_id is None:
+            title = None
+            for item_filter in parse_qs(url.query).get("filter", []):
+                filter_match = TITLE_FILTER.match(item_filter)
+                if not filter_match:
+                    return self.send_error_json(400, f"Unsupported filter: {item_filter}")
+                title = re.sub(r'\\(.)', r"\1", filter_match.group(1))
+            with self.state.lock:
+                summaries = [{key: item[key] for key in ("id", "title", "category", "urls", "vault") if key in item}
+                             for item in items.values() if title is None or item.get("title") == title]
+            return self.send_json(200, summaries)
+        if method == "GET":
+            item = items.get(item_id)
+            return self.send_json(200, item) if item else self.send_error_json(404, "Item not found")
+        if method not in ("POST", "PUT") or (method == "POST") == (item_id is not None):
+            return self.send_error_json(405, "Method not allowed")
+
+        try:
+            item = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            return self.send_error_json(400, "Invalid JSON body")
+        error = self.simulate_write()
+        if error:
+            return self.send_error_json(*error)
+        with self.state.lock:
+            missing = method == "PUT" and item_id not in items
+            if not missing:
+                item["id"] = item_id or os.urandom(13).hex()
+                item["vault"] = {"id": match.group(1)}
+                item.setdefault("createdAt", time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+                items[item["id"]] = item
+        if missing:
+            return self.send_error_json(404, "Item not found")
+        if random.random() < self.state.args.lost_rate:
+            # Item đã được ghi nhưng client không nhận được phản hồi (ví dụ proxy timeout)
+            return self.send_error_json(504, "Gateway Timeout")
+        return self.send_json(200, item)
+
+    def simulate_write(self):
+        """Độ trễ và các lỗi ngẫu nhiên của một request ghi item; trả về (mã, thông điệp) nếu lỗi"""
+        args = self.state.args
+        with self.state.lock:
+            self.state.running += 1
+            running = self.state.running
+        try:
+            if (args.max_concurrency and running > args.max_concurrency) or random.random() < args.throttle_rate:
+                return 429, "Too Many Requests: rate limit exceeded"
+            time.sleep(max(0.0, args.latency * (1 + random.uniform(-args.jitter, args.jitter))))
+            if random.random() < args.error_rate:
+                return 503, "Service Unavailable"
+            if random.random() < args.fatal_rate:
+                return 400, "Validation: field validation failed"
+            return None
+        finally:
+            with self.state.lock:
+                self.state.running -= 1
+
+    def send_json(self, status: int, data) -> None:
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_error_json(self, status: int, message: str) -> None:
+        self.send_json(status, {"status": status, "message": message})
+
+    def send_text(self, status: int, text: str) -> None:
+        payload = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="1Password Connect server giả")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="Cổng lắng nghe (0 để chọn cổng trống)")
+    parser.add_argument("--token", default="bench-token", help="Token hợp lệ (mặc định: bench-token)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Thời gian xử lý trung bình mỗi request ghi, giây")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Độ dao động latency, tỉ lệ 0-1")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỉ lệ lỗi tạm thời (503)")
+    parser.add_argument("--fatal-rate", type=float, default=0.0, help="Tỉ lệ lỗi không thử lại được (400)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Tỉ lệ bị giới hạn tốc độ ngẫu nhiên (429)")
+    parser.add_argument("--lost-rate", type=float, default=0.0,
+                        help="Tỉ lệ request ghi đã thành công nhưng vẫn trả về 504 (client không biết item đã được tạo)")
+    parser.add_argument("--max-concurrency", type=int, default=0,
+                        help="Số request ghi cùng lúc tối đa, vượt quá sẽ trả về 429 (mặc định: 0 - không giới hạn)")
+    parser.add_argument("--verbose", action="store_true", help="In từng request")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    server.state = FakeConnect(args)
+    # Dòng đầu tiên cho bên gọi biết địa chỉ thực tế (khi --port 0)
+    print(f"http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""`op` giả dùng cho benchmark: trả lời như 1Password CLI nhưng không cần tài khoản thật.
+
+Hỗ trợ: `--version`, `whoami`, `signin [--raw]`, `vault list`, `item list`, `item get TITLE`, `item create --format json`
+(cả dạng tham số lẫn JSON template qua stdin), `item edit ID --format json`, token phiên qua biến môi trường
+`OP_SESSION_<shorthand>` hoặc tham số chung `--session TOKEN`. Hành vi được cấu hình qua biến môi trường:
+
+    FAKE_OP_LATENCY          Thời gian xử lý trung bình mỗi lệnh item create/edit, giây (mặc định: 0.05)
+    FAKE_OP_JITTER           Độ dao động của latency, tỉ lệ 0-1 (mặc định: 0.2)
+    FAKE_OP_ERROR_RATE       Tỉ lệ lỗi tạm thời, ví dụ 503 (mặc định: 0)
+    FAKE_OP_FATAL_RATE       Tỉ lệ lỗi không thử lại được (mặc định: 0)
+    FAKE_OP_THROTTLE_RATE    Tỉ lệ bị giới hạn tốc độ ngẫu nhiên (mặc định: 0)
+    FAKE_OP_MAX_CONCURRENCY  Số lệnh item create chạy cùng lúc tối đa, vượt quá sẽ bị
+                             giới hạn tốc độ (mặc định: 0 - không giới hạn)
+    FAKE_OP_STATE_DIR        Thư mục đếm số lệnh đang chạy (bắt buộc khi dùng FAKE_OP_MAX_CONCURRENCY)
+    FAKE_OP_ITEMS            File JSON trả về cho `item list` và được tìm theo tiêu đề khi `item get`
+                             (mặc định: danh sách rỗng)
+    FAKE_OP_LOG              File ghi lại tham số của từng lệnh (mặc định: không ghi)
+    FAKE_OP_SESSION          Nếu đặt, mọi lệnh (trừ --version, signin) phải có token phiên bằng giá trị
+                             này, nếu không sẽ báo chưa đăng nhập; `signin` in ra dòng
+                             `export OP_SESSION_<shorthand>="..."` (`signin --raw`: chỉ giá trị này)
+    FAKE_OP_ACCOUNT          Shorthand của tài khoản trong tên biến OP_SESSION_ (mặc định: benchmark)
+"""
+import json
+import os
+import random
+import sys
+import time
+
+VAULTS = [{"id": "benchvault0000000000000000", "name": "Benchmark"}]
+
+def env_float(name: str, default: float = 0.0) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+def fail(message: str) -> None:
+    sys.stderr.write(f"[ERROR] {time.strftime('%Y/%m/%d %H:%M:%S')} {message}\n")
+    sys.exit(1)
+
+def log_call(args: list) -> None:
+    log_file = os.environ.get("FAKE_OP_LOG")
+    if log_file:
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(args) + "\n")
+
+def item_list() -> None:
+    items_file = os.environ.get("FAKE_OP_ITEMS")
+    if items_file and os.path.exists(items_file):
+        with open(items_file, "r", encoding="utf-8") as f:
+            sys.stdout.write(f.read())
+    else:
+        print("[]")
+
+def item_get(args: list) -> None:
+    if not args or args[0].startswith("-"):
+        fail("expected an item to get")
+    items_file = os.environ.get("FAKE_OP_ITEMS")
+    if items_file and os.path.exists(items_file):
+        with open(items_file, "r", encoding="utf-8") as f:
+            for item in json.load(f):
+                if args[0] in (item.get("id"), item.get("title")):
+                    print(json.dumps(item))
+                    return
+    fail(f'"{args[0]}" isn\'t an item in the "{VAULTS[0]["name"]}" vault. Specify the item with its UUID, name, or domain.')
+
+def enter_slot() -> str:
+    """Đánh dấu một lệnh đang chạy, trả về đường dẫn file đánh dấu (hoặc "" nếu không theo dõi)"""
+    state_dir = os.environ.get("FAKE_OP_STATE_DIR")
+    if not state_dir:
+        return ""
+    os.makedirs(state_dir, exist_ok=True)
+    slot = os.path.join(state_dir, f"{os.getpid()}.running")
+    open(slot, "w").close()
+    return slot
+
+def running_count() -> int:
+    state_dir = os.environ.get("FAKE_OP_STATE_DIR")
+    if not state_dir:
+        return 0
+    return sum(1 for name in os.listdir(state_dir) if name.endswith(".running"))
+
+def simulate_write() -> None:
+    """Độ trễ và các lỗi ngẫu nhiên của một lệnh ghi item"""
+    slot = enter_slot()
+    try:
+        max_concurrency = int(env_float("FAKE_OP_MAX_CONCURRENCY"))
+        if max_concurrency and running_count() > max_concurrency:
+            fail("(429) Too Many Requests: rate limit exceeded")
+        if random.random() < env_float("FAKE_OP_THROTTLE_RATE"):
+            fail("(429) Too Many Requests: rate limit exceeded")
+
+        latency = env_float("FAKE_OP_LATENCY", 0.05)
+        jitter = env_float("FAKE_OP_JITTER", 0.2)
+        time.sleep(max(0.0, latency * (1 + random.uniform(-jitter, jitter))))
+
+        if random.random() < env_float("FAKE_OP_ERROR_RATE"):
+            fail("(503) Service Unavailable")
+        if random.random() < env_float("FAKE_OP_FATAL_RATE"):
+            fail("invalid item: field validation failed")
+    finally:
+        if slot:
+            os.remove(slot)
+
+def item_create(args: list) -> None:
+    title = args[args.index("--title") + 1] if "--title" in args else None
+    if args and args[-1] == "-":
+        item = json.loads(sys.stdin.read() or "{}")
+        title = item.get("title", title)
+
+    simulate_write()
+    print(json.dumps({
+        "id": os.urandom(13).hex(),
+        "title": title or "Untitled",
+        "vault": {"id": VAULTS[0]["id"], "name": VAULTS[0]["name"]},
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }))
+
+def item_edit(args: list) -> None:
+    if not args or args[0].startswith("-"):
+        fail("expected an item to edit")
+    title = args[args.index("--title") + 1] if "--title" in args else None
+
+    simulate_write()
+    print(json.dumps({
+        "id": args[0],
+        "title": title or "Untitled",
+        "vault": {"id": VAULTS[0]["id"], "name": VAULTS[0]["name"]},
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }))
+
+def main() -> None:
+    args = sys.argv[1:]
+    log_call(args)
+
+    account = os.environ.get("FAKE_OP_ACCOUNT", "benchmark")
+    session = os.environ.get(f"OP_SESSION_{account}")
+    if args[:1] == ["--session"]:
+        session, args = args[1], args[2:]
+    required_session = os.environ.get("FAKE_OP_SESSION")
+
+    if args[:1] == ["--version"]:
+        print("2.30.0")
+    elif args[:1] == ["signin"]:
+        if "--raw" in args:
+            print(required_session or "")
+        elif required_session:
+            print(f'export OP_SESSION_{account}="{required_session}"\n'
+                  "# This command is meant to be used with your shell's eval function.")
+    elif required_session and session != required_session:
+        fail("You are not currently signed in. Please run `op signin --help` for instructions")
+    elif args[:1] == ["whoami"]:
+        print("URL:        https://benchmark.1password.com\nUser Type:  HUMAN")
+    elif args[:2] == ["vault", "list"]:
+        print(json.dumps(VAULTS))
+    elif args[:2] == ["item", "list"]:
+        item_list()
+    elif args[:2] == ["item", "get"]:
+        item_get(args[2:])
+    elif args[:2] == ["item", "create"]:
+        item_create(args[2:])
+    elif args[:2] == ["item", "edit"]:
+        item_edit(args[2:])
+    else:
+        fail(f"unknown command: {' '.join(args)}")
+
+if __name__ == "__main__":
+    main()
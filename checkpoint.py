@@ -0,0 +1,217 @@
+import heapq
+import json
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# File nhật ký nằm trong thư mục temp, cạnh temp_import_state.json
+JOURNAL_FILE = "import_journal.jsonl"
+
+# Số bản ghi mới trước khi nén nhật ký
+DEFAULT_COMPACT_EVERY = 5000
+
+class DoneRows:
+    """Tập các dòng đã import thành công của từng file, giữ gọn bằng watermark.
+
+    watermark là số dòng mà mọi dòng dữ liệu từ đầu file đến đó đã import thành công; chỉ các
+    dòng lẻ phía sau watermark mới cần giữ trong bộ nhớ. Số dòng là số dòng trong file nên có
+    thể không liên tục (dòng trống, dòng lỗi): watermark tự dời qua các dòng liên tiếp đã xong,
+    còn advance_to dời qua chỗ trống khi bên gọi biết mọi dòng dữ liệu phía trước đã xong.
+    """
+
+    def __init__(self):
+        self._watermarks: Dict[str, int] = {}
+        self._counts: Dict[str, int] = {}  # số dòng đã xong từ đầu file đến watermark
+        self._rows: Dict[str, Dict[int, Optional[str]]] = {}
+        self._heaps: Dict[str, List[int]] = {}  # các dòng lẻ, nhỏ nhất trước (có thể còn dòng đã bỏ)
+
+    def watermark(self, filename: str) -> int:
+        """Mọi dòng dữ liệu từ đầu file đến dòng này đã import thành công"""
+        return self._watermarks.get(filename, 0)
+
+    def is_done(self, filename: str, row: int) -> bool:
+        """Dòng này đã được import thành công ở lần chạy trước chưa"""
+        return row <= self._watermarks.get(filename, 0) or row in self._rows.get(filename, ())
+
+    def done_count(self, filename: str) -> int:
+        """Số dòng đã import thành công của một file"""
+        return self._counts.get(filename, 0) + len(self._rows.get(filename, ()))
+
+    def done_rows(self, filename: str) -> Iterator[Tuple[int, Optional[str]]]:
+        """Các dòng đã xong và item id của nhật ký dạng cũ, khi watermark là số dòng liên tiếp
+        (không còn giữ item id của các dòng dưới watermark)"""
+        for row in range(1, self._watermarks.get(filename, 0) + 1):
+            yield row, None
+        yield from sorted(self._rows.get(filename, {}).items())
+
+    def files(self) -> Iterator[str]:
+        return iter(sorted(set(self._watermarks) | set(self._rows)))
+
+    def advance_to(self, filename: str, row: int) -> None:
+        """Dời watermark tới `row`: bên gọi bảo đảm mọi dòng dữ liệu đến `row` đã xong"""
+        if row <= self._watermarks.get(filename, 0):
+            return
+        rows = self._rows.get(filename, {})
+        heap = self._heaps.get(filename, [])
+        done = self._counts.get(filename, 0)
+        while heap and heap[0] <= row:
+            key = heapq.heappop(heap)
+            if key in rows:
+                del rows[key]
+                done += 1
+        self._watermarks[filename] = row
+        self._counts[filename] = done
+        self._advance(filename)
+
+    def _set_watermark(self, filename: str, watermark: int, done: int) -> None:
+        """Đặt watermark đã lưu (kèm số dòng đã xong đến đó), bỏ các dòng lẻ không còn cần"""
+        self._watermarks[filename] = watermark
+        self._counts[filename] = done
+        rows = self._rows.get(filename, {})
+        for row in [row for row in rows if row <= watermark]:
+            del rows[row]
+        self._advance(filename)
+
+    def _clear(self) -> None:
+        self._watermarks.clear()
+        self._counts.clear()
+        self._rows.clear()
+        self._heaps.clear()
+
+    def _mark_done(self, filename: str, row: int, item_id: Optional[str]) -> None:
+        if row <= self._watermarks.get(filename, 0):
+            return
+        self._rows.setdefault(filename, {})[row] = item_id
+        heapq.heappush(self._heaps.setdefault(filename, []), row)
+        self._advance(filename)
+
+    def _advance(self, filename: str) -> None:
+        """Dời watermark qua các dòng liên tiếp đã xong"""
+        rows = self._rows.get(filename, {})
+        watermark = self._watermarks.get(filename, 0)
+        done = self._counts.get(filename, 0)
+        while watermark + 1 in rows:
+            watermark += 1
+            del rows[watermark]
+            done += 1
+        self._watermarks[filename] = watermark
+        self._counts[filename] = done
+        heap = self._heaps.get(filename)
+        while heap and heap[0] <= watermark:
+            heapq.heappop(heap)
+
+class CheckpointJournal(DoneRows):
+    """Nhật ký append-only ghi lại từng item đã import xong.
+
+    Mỗi item hoàn tất được ghi thành một dòng JSON và fsync ngay, nên khi chương trình
+    dừng giữa chừng có thể tiếp tục chính xác từ các dòng chưa xử lý.
+
+    Dòng bản ghi:  {"file": ..., "row": 12, "status": "success", "item_id": "..."}
+    Dòng đã nén:   {"file": ..., "watermark": 15000, "done": 14800, "rows": {"15002": "item_id", ...}}
+
+    Nhờ watermark (xem DoneRows), việc đọc lại nhật ký không tăng theo số dòng đã xong.
+    Các tiến trình shard dùng nhật ký này; lần chạy chính lưu trạng thái trong StateStore.
+    """
+
+    def __init__(self, path: str, compact_every: int = DEFAULT_COMPACT_EVERY):
+        super().__init__()
+        self.path = path
+        self.compact_every = compact_every
+        self._pending_records = 0
+        self._lock = threading.Lock()
+        self._handle = None
+
+    def load(self) -> None:
+        """Đọc lại nhật ký từ lần chạy trước"""
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dòng cuối có thể bị ghi dở nếu chương trình dừng đột ngột
+                    continue
+                if "watermark" in record:
+                    filename = record["file"]
+                    if record["watermark"] > self._watermarks.get(filename, 0):
+                        # Nhật ký dạng cũ không có "done": watermark là số dòng liên tiếp đã xong
+                        self._set_watermark(filename, record["watermark"], record.get("done", record["watermark"]))
+                    for row, item_id in record.get("rows", {}).items():
+                        self._mark_done(filename, int(row), item_id)
+                else:
+                    self._pending_records += 1
+                    if record.get("status") == "success":
+                        self._mark_done(record["file"], record["row"], record.get("item_id"))
+
+        # Nén luôn nếu phần đuôi nhật ký đã dài
+        if self._pending_records >= self.compact_every:
+            self.compact()
+
+    def record(self, filename: str, row: int, success: bool, item_id: Optional[str] = None,
+               status: Optional[str] = None, error: Optional[str] = None, key: Optional[str] = None) -> None:
+        """Ghi một item đã hoàn tất và fsync ngay xuống đĩa
+
+        status/error/key (trạng thái chi tiết, lỗi, tiêu đề item) chỉ để tra cứu, không ảnh hưởng
+        việc tiếp tục; dòng được coi là xong khi success.
+        """
+        entry = {
+            "file": filename,
+            "row": row,
+            "status": "success" if success else "failed",
+            "item_id": item_id,
+        }
+        if status:
+            entry["detail"] = status
+        if error:
+            entry["error"] = error
+        if key:
+            entry["key"] = key
+        with self._lock:
+            if self._handle is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._handle = open(self.path, 'a', encoding='utf-8')
+            self._handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+
+            if success:
+                self._mark_done(filename, row, item_id)
+            self._pending_records += 1
+            if self._pending_records >= self.compact_every:
+                self._compact_locked()
+
+    def advance_to(self, filename: str, row: int) -> None:
+        with self._lock:
+            super().advance_to(filename, row)
+
+    def compact(self) -> None:
+        """Ghi lại nhật ký chỉ gồm watermark và các dòng lẻ của từng file"""
+        with self._lock:
+            self._compact_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+    def _compact_locked(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for filename in sorted(set(self._watermarks) | set(self._rows)):
+                f.write(json.dumps({
+                    "file": filename,
+                    "watermark": self._watermarks.get(filename, 0),
+                    "done": self._counts.get(filename, 0),
+                    "rows": {str(row): item_id for row, item_id in self._rows.get(filename, {}).items()},
+                }, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._pending_records = 0
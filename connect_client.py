@@ -0,0 +1,198 @@
+import asyncio
+import functools
+import http.client
+import json
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, urlsplit
+
+from metrics import get_metrics
+
+# Biến môi trường chuẩn của 1Password Connect (giống SDK và Terraform provider)
+CONNECT_HOST_ENV = "OP_CONNECT_HOST"
+CONNECT_TOKEN_ENV = "OP_CONNECT_TOKEN"
+
+# Số kết nối keep-alive tối đa tới Connect server
+DEFAULT_POOL_SIZE = 16
+
+# Thời gian chờ tối đa cho mỗi request (giây)
+DEFAULT_TIMEOUT = 30
+
+# Lỗi khi dùng lại một kết nối keep-alive mà server đã đóng; request được gửi lại bằng kết nối mới
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                           BrokenPipeError, ConnectionResetError)
+
+# Request gửi lại được cả khi server có thể đã nhận đủ (mất kết nối lúc chờ response); POST tạo item
+# thì không, vì có thể tạo item hai lần
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE")
+
+class ConnectError(Exception):
+    """Lỗi từ Connect server; thông điệp có dạng `(mã HTTP) nội dung` giống lỗi của op"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"({status}) {message}" if status else message)
+        self.status = status
+
+class ConnectClient:
+    """Client REST của 1Password Connect với pool kết nối HTTP keep-alive.
+
+    Mỗi request lấy một kết nối đang rảnh trong pool (hoặc mở kết nối mới, tối đa `pool_size`
+    kết nối cùng lúc), nên các item được gửi song song trên một số ít kết nối TCP/TLS dùng lại
+    thay vì mở một tiến trình op cho mỗi item. Các hàm *_async chạy request trên executor
+    riêng của client, dùng được từ cả engine thread lẫn async.
+    """
+
+    def __init__(self, host: str, token: str, pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT):
+        parts = urlsplit(host if "://" in host else f"http://{host}")
+        if parts.scheme not in ("http", "https") or not parts.netloc:
+            raise ValueError(f"Địa chỉ Connect server không hợp lệ: {host}")
+        self.host = host
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.base_path = parts.path.rstrip("/")
+        self.token = token
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.opened = 0  # số kết nối đã mở, để biết pool có được dùng lại không
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None, timeout: Optional[float] = None) -> Any:
+        """Gửi một request, trả về JSON đã parse; lỗi HTTP hoặc mạng được báo bằng ConnectError"""
+        metrics = get_metrics()
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else None
+        headers = {"Authorization": f"Bearer {self.token}", "Accept": "application/json"}
+        if payload is not None:
+            headers["Content-Type"] = "application/json"
+
+        self._slots.acquire()
+        started = time.perf_counter()
+        metrics.incr('connect_requests')
+        try:
+            status, reason, data = self._send(method, self.base_path + path, payload, headers,
+                                              timeout or self.timeout)
+        finally:
+            self._slots.release()
+            elapsed = time.perf_counter() - started
+            metrics.add_time('connect_wait', elapsed)
+            metrics.observe('connect_latency', elapsed)
+
+        if status >= 400:
+            raise ConnectError(status, _error_message(data, reason))
+        if not data:
+            return None
+        try:
+            return json.loads(data)
+        except json.JSONDecodeError as e:
+            raise ConnectError(status, f"Không thể parse JSON response: {str(e)}")
+
+    async def request_async(self, method: str, path: str, body: Optional[Dict] = None,
+                            timeout: Optional[float] = None) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(),
+                                          functools.partial(self.request, method, path, body, timeout))
+
+    def list_vaults(self) -> List[Dict]:
+        return self.request("GET", "/v1/vaults") or []
+
+    def list_items(self, vault_id: str, timeout: Optional[float] = None) -> List[Dict]:
+        return self.request("GET", f"/v1/vaults/{quote(vault_id)}/items", timeout=timeout) or []
+
+    async def find_items_async(self, vault_id: str, title: str, timeout: Optional[float] = None) -> List[Dict]:
+        """Các item có đúng tiêu đề `title` (GET .../items?filter=title eq "...")"""
+        title_filter = 'title eq "{}"'.format(title.replace("\\", "\\\\").replace('"', '\\"'))
+        return await self.request_async(
+            "GET", f"/v1/vaults/{quote(vault_id)}/items?filter={quote(title_filter)}", timeout=timeout) or []
+
+    async def get_item_async(self, vault_id: str, item_id: str, timeout: Optional[float] = None) -> Dict:
+        return await self.request_async("GET", f"/v1/vaults/{quote(vault_id)}/items/{quote(item_id)}", timeout=timeout)
+
+    async def create_item_async(self, vault_id: str, item: Dict, timeout: Optional[float] = None) -> Dict:
+        return await self.request_async("POST", f"/v1/vaults/{quote(vault_id)}/items", item, timeout)
+
+    async def replace_item_async(self, vault_id: str, item_id: str, item: Dict,
+                                 timeout: Optional[float] = None) -> Dict:
+        return await self.request_async("PUT", f"/v1/vaults/{quote(vault_id)}/items/{quote(item_id)}", item, timeout)
+
+    def close(self) -> None:
+        """Đóng các kết nối đang rảnh và dừng executor"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _send(self, method: str, path: str, payload: Optional[bytes], headers: Dict[str, str],
+              timeout: float):
+        for attempt in range(2):
+            conn, reused = self._checkout(timeout)
+            sent = False
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                    # Header và body được gửi trong hai lần ghi; tắt Nagle để body không phải chờ ACK
+                    conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                conn.request(method, path, body=payload, headers=headers)
+                sent = True
+                response = conn.getresponse()
+                data = response.read()
+            except STALE_CONNECTION_ERRORS as e:
+                conn.close()
+                # Kết nối keep-alive đã bị server đóng: gửi lại bằng kết nối mới nếu request chưa gửi xong
+                # (server bỏ request dở dang) hoặc gửi lại không gây tác dụng phụ
+                if reused and attempt == 0 and (not sent or method in IDEMPOTENT_METHODS):
+                    continue
+                raise ConnectError(0, f"connection reset: {str(e) or type(e).__name__}")
+            except socket.timeout:
+                conn.close()
+                raise ConnectError(0, f"request timed out sau {timeout} giây")
+            except OSError as e:
+                conn.close()
+                raise ConnectError(0, f"network error: {str(e)}")
+            if response.will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+            return response.status, response.reason, data
+        raise ConnectError(0, "connection reset")
+
+    def _checkout(self, timeout: float):
+        """Lấy một kết nối đang rảnh (đã dùng trước đó) hoặc mở kết nối mới"""
+        try:
+            conn = self._idle.get_nowait()
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+        except queue.Empty:
+            pass
+        connection_class = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        with self._lock:
+            self.opened += 1
+        get_metrics().incr('connect_connections')
+        return connection_class(self.netloc, timeout=timeout), False
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="connect")
+            return self._executor
+
+def _error_message(data: bytes, reason: str) -> str:
+    """Thông điệp lỗi trong body JSON của Connect ({"status": ..., "message": ...})"""
+    try:
+        body = json.loads(data)
+        if isinstance(body, dict) and body.get("message"):
+            return str(body["message"])
+    except (ValueError, TypeError):
+        pass
+    return reason or "Connect server trả về lỗi"
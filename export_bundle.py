@@ -0,0 +1,342 @@
+import base64
+import csv
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import threading
+import time
+import zipfile
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from schema import AccountSchema, Record
+
+# Định dạng file xuất theo phần mở rộng (--export)
+EXPORT_FORMATS = {".1pux": "1pux", ".csv": "csv"}
+
+# File xuất mặc định khi dùng --backend export mà không có --export
+DEFAULT_EXPORT_PATH = os.path.join("output", "1password_export.1pux")
+
+# Thư mục chứa các file tạm (mỗi vault một file) của lần chạy, để dừng giữa chừng rồi chạy tiếp được
+SPOOL_DIR = os.path.join("temp", "export")
+
+# Vault mặc định của bundle khi không dùng manifest; khi import vào 1Password sẽ chọn vault đích
+DEFAULT_VAULT_NAME = "Imported"
+
+# Mã category của 1PUX theo category trong JSON của 1Password
+PUX_CATEGORIES = {
+    "LOGIN": "001",
+    "CREDIT_CARD": "002",
+    "SECURE_NOTE": "003",
+    "IDENTITY": "004",
+    "PASSWORD": "005",
+    "SOFTWARE_LICENSE": "100",
+    "BANK_ACCOUNT": "101",
+    "DATABASE": "102",
+    "WIRELESS_ROUTER": "109",
+    "API_CREDENTIAL": "112",
+    "SSH_KEY": "114",
+}
+# Khóa giá trị của trường trong section của 1PUX theo loại trường
+PUX_VALUE_TYPES = {
+    "STRING": "string",
+    "CONCEALED": "concealed",
+    "OTP": "totp",
+    "URL": "url",
+    "EMAIL": "email",
+    "PHONE": "phone",
+    "DATE": "date",
+    "MENU": "menu",
+    "CREDIT_CARD_NUMBER": "creditCardNumber",
+    "CREDIT_CARD_TYPE": "creditCardType",
+    "MONTH_YEAR": "monthYear",
+}
+PUX_INPUT_TRAITS = {"keyboard": "default", "correction": "default", "capitalization": "default"}
+
+# Cột của file CSV import của 1Password; chỉ dùng được cho item đăng nhập
+CSV_COLUMNS = ["Title", "Website", "Username", "Password", "Notes"]
+CSV_CATEGORIES = ("LOGIN", "PASSWORD")
+
+def export_format(path: str) -> Optional[str]:
+    """Định dạng xuất theo phần mở rộng của file, None nếu không hỗ trợ"""
+    return EXPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+
+def vault_uuid(name: str) -> str:
+    """Id (26 ký tự base32 như uuid của 1Password) cố định theo tên vault, để tiếp tục lần chạy được"""
+    return base64.b32encode(hashlib.sha1(name.encode("utf-8")).digest()[:16]).decode().lower().rstrip("=")
+
+def new_item_uuid() -> str:
+    """Id mới cho item (26 ký tự như uuid của 1Password); chỉ cần không trùng, không cần bí mật"""
+    return f"{random.getrandbits(104):026x}"
+
+def _pux_value(field_type: str, value: str) -> Dict:
+    """Giá trị trường của 1PUX; ngày và tháng/năm không đọc được thì giữ dạng chuỗi"""
+    kind = PUX_VALUE_TYPES.get(field_type, "string")
+    if kind == "email":
+        return {"email": {"email_address": value, "provider": None}}
+    if kind == "date":
+        try:
+            return {"date": int(time.mktime(time.strptime(value, "%Y-%m-%d")))}
+        except ValueError:
+            return {"string": value}
+    if kind == "monthYear":
+        month, _, year = value.partition("/")
+        if month.isdigit() and year.isdigit():
+            year = int(year) + 2000 if len(year) == 2 else int(year)
+            return {"monthYear": year * 100 + int(month)}
+        return {"string": value}
+    return {kind: value}
+
+def render_pux_item(account_type: AccountSchema, record: Record, notes: str, item_uuid: str, now: int) -> Dict:
+    """Item của một dòng theo định dạng 1PUX (dựng từ cùng item JSON dùng cho op template và Connect)"""
+    payload = account_type.item_payload(record, notes)
+    login_fields = []
+    section_fields = []
+    details = {"loginFields": login_fields, "notesPlain": "", "sections": [], "passwordHistory": []}
+    for field in payload["fields"]:
+        purpose = field.get("purpose")
+        if purpose == "NOTES":
+            details["notesPlain"] = field["value"]
+        elif purpose == "PASSWORD" and payload["category"] == "PASSWORD":
+            details["password"] = field["value"]
+        elif purpose in ("USERNAME", "PASSWORD"):
+            login_fields.append({
+                "value": field["value"], "id": "", "name": purpose.lower(),
+                "fieldType": "P" if purpose == "PASSWORD" else "T", "designation": purpose.lower(),
+            })
+        else:
+            section_fields.append({
+                "title": field["label"], "id": field["id"], "value": _pux_value(field["type"], field["value"]),
+                "indexAtSource": len(section_fields), "guarded": False, "multiline": False,
+                "dontGenerate": False, "inputTraits": PUX_INPUT_TRAITS,
+            })
+    if section_fields:
+        details["sections"].append({"title": "", "name": "add more", "fields": section_fields})
+
+    urls = [url["href"] for url in payload.get("urls", [])]
+    return {
+        "uuid": item_uuid,
+        "favIndex": 0,
+        "createdAt": now,
+        "updatedAt": now,
+        "state": "active",
+        "categoryUuid": PUX_CATEGORIES.get(payload["category"], "001"),
+        "details": details,
+        "overview": {
+            "subtitle": account_type.title_value(record),
+            "urls": [{"label": "", "url": url} for url in urls],
+            "title": payload["title"],
+            "url": urls[0] if urls else "",
+            "ps": 0,
+            "pbe": 0.0,
+            "pgrng": False,
+            "tags": [],
+        },
+    }
+
+def render_csv_row(account_type: AccountSchema, record: Record, notes: str) -> Tuple[Optional[List[str]], Optional[str]]:
+    """(dòng CSV import của 1Password, lỗi); các trường ngoài username/password được ghi vào Notes"""
+    payload = account_type.item_payload(record, notes)
+    if payload["category"] not in CSV_CATEGORIES:
+        return None, f"CSV của 1Password chỉ nhập được item đăng nhập, không hỗ trợ category {account_type.category} (dùng .1pux)"
+    username = password = ""
+    extra = []
+    note_text = ""
+    for field in payload["fields"]:
+        purpose = field.get("purpose")
+        if purpose == "USERNAME":
+            username = field["value"]
+        elif purpose == "PASSWORD":
+            password = field["value"]
+        elif purpose == "NOTES":
+            note_text = field["value"]
+        else:
+            extra.append(f"{field['label']}: {field['value']}")
+    if not username and account_type.title_index is not None:
+        username = account_type.title_value(record)
+    urls = payload.get("urls") or []
+    return [payload["title"], urls[0]["href"] if urls else "", username, password,
+            "\n".join(extra + ([note_text] if note_text else []))], None
+
+class ExportBundle:
+    """File import của 1Password (1PUX hoặc CSV) được ghi dần trong một lượt đọc, không gọi op.
+
+    Mỗi item được render ngay khi dòng được đọc và ghi nối vào file tạm của vault trong
+    `temp/export/<lần chạy>/` (mỗi item một dòng `id<TAB>JSON`), nên bộ nhớ không tăng theo
+    số item. Nhật ký dòng được ghi theo lô sau `flush`, nên khi tiếp tục lần chạy bị dừng, các
+    dòng cuối file tạm chưa có trong nhật ký bị bỏ để không xuất trùng. `finish` ghép các file
+    tạm thành file xuất (1PUX: zip chứa export.data, ghi dạng stream từng vault) rồi xóa file tạm.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.format = export_format(path)
+        if self.format is None:
+            raise ValueError(f"Không hỗ trợ định dạng xuất {path} (dùng {', '.join(EXPORT_FORMATS)})")
+        self.vaults: Dict[str, str] = {}  # id -> tên
+        self.spool_dir: Optional[str] = None
+        self._spools: Dict[str, io.TextIOBase] = {}
+        self._lock = threading.Lock()
+        self.add_vault(DEFAULT_VAULT_NAME)
+
+    def add_vault(self, name: str) -> str:
+        """Thêm vault (theo tên) vào bundle, trả về id của vault"""
+        vault_id = vault_uuid(name)
+        self.vaults.setdefault(vault_id, name)
+        return vault_id
+
+    def open(self, run_id, committed: Callable[[List[str]], Set[str]], tail: int) -> None:
+        """Dùng thư mục tạm của lần chạy `run_id`; thư mục của các lần chạy khác bị xóa.
+
+        Khi tiếp tục, `tail` dòng cuối của mỗi file tạm chỉ được giữ nếu id của item có trong
+        `committed(ids)` (các id đã ghi vào nhật ký).
+        """
+        with self._lock:
+            self._close_spools()
+            self.spool_dir = os.path.join(SPOOL_DIR, str(run_id))
+            if os.path.isdir(SPOOL_DIR):
+                for name in os.listdir(SPOOL_DIR):
+                    if name != str(run_id):
+                        shutil.rmtree(os.path.join(SPOOL_DIR, name), ignore_errors=True)
+            os.makedirs(self.spool_dir, exist_ok=True)
+            for _, path in self._spool_files():
+                _drop_uncommitted(path, committed, tail)
+
+    def add(self, vault_id: str, account_type: AccountSchema, record: Record, notes: str = "") -> Tuple[Optional[str], Optional[str]]:
+        """Render và ghi một item (chưa flush), trả về (id item, lỗi)"""
+        item_uuid = new_item_uuid()
+        if self.format == "csv":
+            item, error = render_csv_row(account_type, record, notes)
+            if error:
+                return None, error
+        else:
+            item = render_pux_item(account_type, record, notes, item_uuid, int(time.time()))
+        # Mỗi item một dòng JSON (kể cả dòng CSV, vì trường CSV có thể chứa xuống dòng)
+        line = f"{item_uuid}\t{json.dumps(item, ensure_ascii=False)}\n"
+        with self._lock:
+            self._spool(vault_id).write(line)
+        return item_uuid, None
+
+    def flush(self) -> None:
+        """Đưa các item đã ghi xuống đĩa; gọi trước khi ghi các dòng tương ứng vào nhật ký"""
+        with self._lock:
+            for spool in self._spools.values():
+                spool.flush()
+
+    def finish(self) -> int:
+        """Ghi file xuất từ các file tạm, trả về số item"""
+        with self._lock:
+            self._close_spools()
+            spools = self._spool_files()
+            tmp_path = self.path + ".tmp"
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if self.format == "csv":
+                count = self._write_csv(tmp_path, spools)
+            else:
+                count = self._write_pux(tmp_path, spools)
+            os.replace(tmp_path, self.path)
+            if self.spool_dir:
+                shutil.rmtree(self.spool_dir, ignore_errors=True)
+                self.spool_dir = None
+            if os.path.isdir(SPOOL_DIR) and not os.listdir(SPOOL_DIR):
+                os.rmdir(SPOOL_DIR)
+            return count
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_spools()
+
+    def _write_csv(self, path: str, spools: List[Tuple[str, str]]) -> int:
+        count = 0
+        with open(path, "w", newline="", encoding="utf-8") as out:
+            writer = csv.writer(out)
+            writer.writerow(CSV_COLUMNS)
+            for _, spool in spools:
+                with open(spool, "r", encoding="utf-8") as f:
+                    for line in f:
+                        writer.writerow(json.loads(line.split("\t", 1)[1]))
+                        count += 1
+        return count
+
+    def _write_pux(self, path: str, spools: List[Tuple[str, str]]) -> int:
+        count = 0
+        now = int(time.time())
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as bundle:
+            bundle.writestr("export.attributes", json.dumps(
+                {"version": 3, "description": "1Password Unencrypted Export", "createdAt": now}))
+            with bundle.open("export.data", "w") as data:
+                account = {"accountName": "Account Import", "name": "Account Import", "avatar": "", "email": "",
+                           "uuid": vault_uuid("account"), "domain": ""}
+                data.write(('{"accounts":[{"attrs":' + json.dumps(account) + ',"vaults":[').encode("utf-8"))
+                for number, (vault_id, spool) in enumerate(spools):
+                    attrs = {"uuid": vault_id, "desc": "", "avatar": "", "name": self.vaults.get(vault_id, vault_id),
+                             "type": "P"}
+                    data.write(((',' if number else '') + '{"attrs":' + json.dumps(attrs, ensure_ascii=False)
+                                + ',"items":[').encode("utf-8"))
+                    with open(spool, "rb") as f:
+                        # Gom các item thành khối khoảng 1 MB trước khi nén, thay vì ghi từng item
+                        block = []
+                        size = 0
+                        for index, line in enumerate(f):
+                            item = line.rstrip(b"\n").split(b"\t", 1)[1]
+                            block.append(b"," + item if index else item)
+                            size += len(item)
+                            count += 1
+                            if size >= 1 << 20:
+                                data.write(b"".join(block))
+                                block.clear()
+                                size = 0
+                        data.write(b"".join(block))
+                    data.write(b"]}")
+                data.write(b"]}]}")
+        return count
+
+    def _spool(self, vault_id: str):
+        spool = self._spools.get(vault_id)
+        if spool is None:
+            if self.spool_dir is None:
+                # Gọi process_file trực tiếp, không qua lần chạy
+                self.spool_dir = os.path.join(SPOOL_DIR, "direct")
+                os.makedirs(self.spool_dir, exist_ok=True)
+            spool = open(os.path.join(self.spool_dir, f"{vault_id}.spool"), "a", encoding="utf-8")
+            self._spools[vault_id] = spool
+        return spool
+
+    def _spool_files(self) -> List[Tuple[str, str]]:
+        """(id vault, đường dẫn) của các file tạm, theo thứ tự vault được thêm vào bundle"""
+        if not self.spool_dir or not os.path.isdir(self.spool_dir):
+            return []
+        found = {name[:-len(".spool")]: os.path.join(self.spool_dir, name)
+                 for name in os.listdir(self.spool_dir) if name.endswith(".spool")}
+        order = list(self.vaults) + sorted(set(found) - set(self.vaults))
+        return [(vault_id, found[vault_id]) for vault_id in order if vault_id in found]
+
+    def _close_spools(self) -> None:
+        for spool in self._spools.values():
+            spool.close()
+        self._spools.clear()
+
+def _drop_uncommitted(path: str, committed: Callable[[List[str]], Set[str]], tail: int) -> None:
+    """Bỏ dòng ghi dở và các dòng chưa có trong nhật ký ở cuối file tạm (tối đa `tail` dòng)"""
+    with open(path, "rb+") as f:
+        start = f.seek(0, os.SEEK_END)
+        data = b""
+        while start > 0 and data.count(b"\n") <= tail:
+            step = min(start, 1 << 20)
+            start -= step
+            f.seek(start)
+            data = f.read(step) + data
+        if start > 0:
+            # Bỏ phần đầu thuộc dòng nằm ngoài `tail` dòng cuối
+            cut = data.index(b"\n") + 1
+            start += cut
+            data = data[cut:]
+        lines = data.split(b"\n")
+        lines.pop()  # phần sau ký tự xuống dòng cuối cùng: rỗng hoặc dòng ghi dở
+        ids = [line.split(b"\t", 1)[0].decode("ascii", "replace") for line in lines]
+        keep = committed(ids) if ids else set()
+        f.seek(start)
+        f.truncate()
+        f.writelines(line + b"\n" for line, item_id in zip(lines, ids) if item_id in keep)
@@ -1,201 +1,555 @@
 from abc import ABC, abstractmethod
-import pandas as pd
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 import csv
+import os
+from schema import AccountSchema, Record
+from metrics import echo, get_metrics
+from text_parser import MIN_PARALLEL_BYTES, iter_parsed_chunks, parse_spec
+from preflight import Preflight
+
+# Các cột của file kết quả, theo thứ tự
+RESULT_COLUMNS = ['row', 'title', 'status', 'item_id', 'error', 'latency_ms']
+
+# Số dòng kết quả được gom lại trước mỗi lần ghi ra file
+RESULT_BATCH_SIZE = 500
+
+# Kích thước mỗi lần đọc khi đếm số dòng của file
+COUNT_CHUNK_SIZE = 1024 * 1024
+
+def count_lines(filename: str, byte_range: Optional[Tuple[int, int]] = None) -> int:
+    """Đếm nhanh số dòng của file (hoặc của một khoảng byte) ở chế độ nhị phân, không decode"""
+    start, end = byte_range or (0, None)
+    lines = 0
+    last = b"\n"
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        remaining = end - start if end is not None else None
+        while remaining is None or remaining > 0:
+            chunk = f.read(COUNT_CHUNK_SIZE if remaining is None else min(COUNT_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            lines += chunk.count(b"\n")
+            last = chunk[-1:]
+    return lines + (last != b"\n")
+
+def read_byte_range(filename: str, start: int, end: int, encoding: str = 'utf-8') -> Iterator[str]:
+    """Đọc các dòng nằm trong khoảng byte [start, end) của file (start và end là đầu dòng)
+    
+    Dòng được giữ nguyên ký tự xuống dòng như khi mở file với newline='', dùng cho chế độ --shards.
+    """
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line.decode(encoding)
+
+class FileReadError(Exception):
+    """File input bị lỗi khi đang đọc dở: các dòng phía sau chỗ lỗi chưa được đọc"""
 
 class FileHandler(ABC):
     """Base class for file handlers"""
     
-    def __init__(self, filename: str, account_type: Dict):
+    # Đuôi của file kết quả, để kết quả có cùng định dạng với file input
+    result_extension = "csv"
+    
+    def __init__(self, filename: str, account_type: AccountSchema, options: Optional[Dict] = None):
         self.filename = filename
+        # Schema của file; với CSV/Excel được thay bằng schema có thêm custom field sau khi đọc header
         self.account_type = account_type
+        self.options = options or {}
+        # Lỗi làm dừng việc đọc giữa chừng (iter_data kết thúc sớm), None nếu đã đọc hết file
+        self.read_error: Optional[Exception] = None
     
     @abstractmethod
-    def read_data(self) -> List[Dict]:
-        """Read data from file and return list of dictionaries"""
+    def read_data(self) -> List[Record]:
+        """Read data from file and return list of records"""
         pass
     
+    def iter_numbered(self) -> Iterator[Tuple[int, Record]]:
+        """Yield (line number in the file, validated row) one by one instead of loading the whole file
+        
+        Số dòng là số dòng trong file (giống thông báo "Dòng N" khi bỏ qua dòng), nên có thể không
+        liên tục khi có dòng trống hoặc dòng không hợp lệ.
+        """
+        # Mặc định đọc toàn bộ qua read_data; handler hỗ trợ đọc dạng stream sẽ ghi đè
+        yield from enumerate(self.read_data(), 1)
+    
+    def iter_data(self) -> Iterator[Record]:
+        """Yield validated rows one by one instead of loading the whole file"""
+        for _, row in self.iter_numbered():
+            yield row
+    
     @abstractmethod
-    def write_results(self, results: List[Tuple[str, str]], output_file: str):
-        """Write results to output file"""
+    def write_results(self, results: List[Tuple], output_file: str, append: bool = False):
+        """Write a batch of result rows (RESULT_COLUMNS order) to output file
+        
+        append=False starts a new file with a header row, append=True adds to it.
+        """
+        pass
+
+    def close_results(self, output_file: str) -> None:
+        """Finish the result file (for formats that cannot be appended batch by batch)"""
         pass
 
-    def validate_data(self, data: List[Dict], account_type: Dict) -> Tuple[List[Dict], List[Tuple[int, str, str]]]:
-        """Validate data against account type configuration"""
-        valid_data = []
-        errors = []
+    def estimate_rows(self) -> Optional[int]:
+        """Estimated number of data rows, used for the progress ETA (None if unknown)"""
+        return None
+
+    def _read_failed(self, error: Exception, kind: str) -> None:
+        """Ghi nhận lỗi đọc file: các dòng đã trả về vẫn được import, nhưng file chưa được coi là đã đọc xong"""
+        self.read_error = error
+        print(f"❌ Lỗi khi đọc file {kind}: {str(error)}")
+
+    @property
+    def quiet(self) -> bool:
+        """Chỉ đọc lướt dữ liệu (ví dụ lấy khóa so trùng trước khi chia shard): không báo dòng bị
+        bỏ qua và không tính vào metric, vì lần đọc chính sẽ làm việc đó"""
+        return bool(self.options.get('quiet'))
+
+    def _skip_row(self, row_num: int, error: str) -> None:
+        """Bỏ qua một dòng không hợp lệ"""
+        if self.quiet:
+            return
+        get_metrics().incr('rows_invalid')
+        echo(f"❌ Dòng {row_num}: {error}")
+
+    @property
+    def byte_range(self) -> Optional[Tuple[int, int]]:
+        """Khoảng byte [start, end) được giao khi chạy theo shard, None nếu đọc cả file"""
+        byte_range = self.options.get('byte_range')
+        return tuple(byte_range) if byte_range else None
+
+    @property
+    def line_offset(self) -> int:
+        """Số dòng của file nằm trước khoảng byte được giao (shard), để số dòng luôn tính từ đầu file"""
+        return int(self.options.get('line_offset') or 0) if self.byte_range else 0
+
+    def _count_read(self) -> None:
+        """Ghi nhận số byte của file input sau khi đọc xong"""
+        if self.quiet:
+            return
+        byte_range = self.byte_range
+        size = byte_range[1] - byte_range[0] if byte_range else os.path.getsize(self.filename)
+        get_metrics().incr('bytes_read', size)
+
+    def validate_data(self, data: List[Record], account_type: AccountSchema) -> Tuple[List[Record], List[Tuple[int, str, str]]]:
+        """Validate and normalize data against account type configuration, column by column
         
-        for idx, row in enumerate(data, 1):
-            # Check required fields
-            missing_fields = []
-            for field in account_type["fields"]:
-                if field["required"] and (field["name"] not in row or not row[field["name"]]):
-                    missing_fields.append(field["name"])
-            
-            if missing_fields:
-                errors.append((idx, str(row), f"Thiếu các trường: {', '.join(missing_fields)}"))
-                continue
-                
-            valid_data.append(row)
-            
-        return valid_data, errors
+        Returns (clean records, errors [(row, title, error)]); see preflight.Preflight for the checks.
+        """
+        valid_data, problems = Preflight(account_type).check(data)
+        errors = {}
+        for row, title, _, _, error in problems:
+            if row in errors:
+                errors[row] = (row, title, f"{errors[row][2]}; {error}")
+            else:
+                errors[row] = (row, title, error)
+        return valid_data, list(errors.values())
+
+    def _check_required(self, row: Sequence[str], account_type: AccountSchema) -> Optional[str]:
+        """Check required fields of one row, return error message or None"""
+        missing_fields = account_type.missing_required(row)
+        if missing_fields:
+            return f"Thiếu các trường: {', '.join(missing_fields)}"
+        return None
 
-    def _create_custom_field(self, field_name: str) -> Dict:
-        """Tạo custom field mới với tên tương ứng"""
-        return {
-            "name": field_name,
-            "type": "text",  # Mặc định là text
-            "required": False,
-            "custom": True  # Đánh dấu là custom field
-        }
+    def _apply_columns(self, columns: List[str]) -> bool:
+        """Bổ sung custom field cho các cột chưa khai báo và kiểm tra đủ cột bắt buộc"""
+        self.account_type = self.account_type.with_columns(columns)
+        missing_columns = [self.account_type.field_names[idx] for idx in self.account_type.required
+                           if self.account_type.field_names[idx] not in columns]
+        if missing_columns:
+            print(f"❌ Thiếu các cột bắt buộc: {', '.join(missing_columns)}")
+            return False
+        return True
+
+    def _column_positions(self, columns: List[str]) -> List[Optional[int]]:
+        """Vị trí cột trong file của từng trường trong schema (None nếu không có cột)"""
+        column_index = {}
+        for idx, column in enumerate(columns):
+            column_index.setdefault(column, idx)
+        return [column_index.get(field_name) for field_name in self.account_type.field_names]
 
 class TextFileHandler(FileHandler):
     """Handler for text files"""
     
-    def read_data(self) -> List[Dict]:
-        data = []
+    def read_data(self) -> List[Record]:
+        return list(self.iter_data())
+    
+    def iter_numbered(self) -> Iterator[Tuple[int, Record]]:
         try:
             # Kiểm tra format và delimiter trong account_type
-            if "format" not in self.account_type or not self.account_type["format"]:
+            schema = self.account_type
+            if not schema.format_fields:
                 print("❌ Thiếu cấu hình format cho file text")
-                return []
+                return
                 
-            delimiter = self.account_type.get("delimiter", "|")
-            format_fields = self.account_type["format"].split(delimiter)
+            delimiter = schema.delimiter
+            field_count = len(schema.format_fields)
+            format_map = schema.format_map
+            width = len(schema.fields)
+            make_record = schema.record_type
+            byte_range = self.byte_range
             
+            if self._parse_in_parallel():
+                yield from self._iter_parallel()
+                self._count_read()
+                return
+                
             with open(self.filename, 'r', encoding='utf-8') as f:
-                for line_num, line in enumerate(f, 1):
+                lines = f if byte_range is None else read_byte_range(self.filename, *byte_range)
+                for line_num, line in enumerate(lines, self.line_offset + 1):
                     if line.strip():
                         parts = line.strip().split(delimiter)
                         
                         # Kiểm tra số lượng trường
-                        if len(parts) < len(format_fields):
-                            print(f"❌ Dòng {line_num}: Thiếu dữ liệu - cần {len(format_fields)} trường nhưng chỉ có {len(parts)} trường")
+                        if len(parts) < field_count:
+                            self._skip_row(line_num, f"Thiếu dữ liệu - cần {field_count} trường nhưng chỉ có {len(parts)} trường")
                             continue
                         
-                        # Map dữ liệu theo format
-                        row_data = {}
-                        for i, field in enumerate(format_fields):
-                            row_data[field] = parts[i].strip()
+                        # Map dữ liệu theo format (vị trí cột đã tính sẵn trong schema)
+                        values = [""] * width
+                        for pos, idx in format_map:
+                            values[idx] = parts[pos].strip()
                             
-                        data.append(row_data)
-                        
-            return data
+                        error = self._check_required(values, schema)
+                        if error:
+                            self._skip_row(line_num, error)
+                            continue
+                            
+                        yield line_num, make_record(values)
+            self._count_read()
             
         except Exception as e:
-            print(f"❌ Lỗi khi đọc file text: {str(e)}")
-            return []
+            self._read_failed(e, "text")
+    
+    def _parse_in_parallel(self) -> bool:
+        """Dùng nhiều tiến trình parse (--parse-workers) khi file đủ lớn"""
+        if self.options.get('parse_workers', 1) <= 1:
+            return False
+        start, end = self.byte_range or (0, os.path.getsize(self.filename))
+        return end - start >= MIN_PARALLEL_BYTES
+    
+    def _iter_parallel(self) -> Iterator[Tuple[int, Record]]:
+        """Memory-map file, parse từng khối byte trong pool tiến trình rồi tạo Record theo đúng thứ tự dòng"""
+        schema = self.account_type
+        width = len(schema.fields)
+        make_record = schema.record_type
+        line_base = self.line_offset
+        for values, rows, errors, line_count in iter_parsed_chunks(self.filename, parse_spec(schema),
+                                                                   self.options['parse_workers'], self.byte_range):
+            for line_num, error in errors:
+                self._skip_row(line_base + line_num, error)
+            # Gom từng `width` giá trị liên tiếp thành một dòng, kèm số dòng trong file
+            yield from zip(map(line_base.__add__, rows), map(make_record, zip(*[iter(values)] * width)))
+            line_base += line_count
     
-    def write_results(self, results: List[Tuple[str, str]], output_file: str):
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(['Title', '1Password UUID'])
-            writer.writerows(results)
+    def estimate_rows(self) -> Optional[int]:
+        return count_lines(self.filename, self.byte_range)
+    
+    def write_results(self, results: List[Tuple], output_file: str, append: bool = False):
+        _write_csv_results(results, output_file, append)
+
+def _write_csv_results(results: List[Tuple], output_file: str, append: bool) -> None:
+    """Ghi một lô kết quả ra file CSV"""
+    with open(output_file, 'a' if append else 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        if not append:
+            writer.writerow(RESULT_COLUMNS)
+        writer.writerows(results)
 
 class ExcelFileHandler(FileHandler):
-    """Handler for Excel files"""
+    """Handler for Excel files
+    
+    File .xlsx được đọc dạng stream bằng openpyxl (read_only, values_only): từng dòng được
+    trả về ngay, không dựng toàn bộ workbook trong bộ nhớ. File .xls cũ vẫn đọc qua pandas.
+    Tùy chọn: `sheet` (tên hoặc số thứ tự sheet, bắt đầu từ 0) và `skip_rows`
+    (số dòng bỏ qua trước dòng tiêu đề).
+    """
     
-    def read_data(self) -> List[Dict]:
+    result_extension = "xlsx"
+    _result_book = None
+    _result_sheet = None
+    
+    def read_data(self) -> List[Record]:
+        return list(self.iter_data())
+    
+    def iter_numbered(self) -> Iterator[Tuple[int, Record]]:
+        if not self.filename.lower().endswith('.xlsx'):
+            yield from self._read_with_pandas()
+            return
+            
         try:
-            # Đọc file Excel với pandas
-            df = pd.read_excel(self.filename)
+            from openpyxl import load_workbook
+            
+            workbook = load_workbook(self.filename, read_only=True, data_only=True)
+            try:
+                sheet = self._select_sheet(workbook)
+                if sheet is None:
+                    return
+                    
+                rows = sheet.iter_rows(values_only=True)
+                skip_rows = int(self.options.get('skip_rows') or 0)
+                for _ in range(skip_rows):
+                    next(rows, None)
+                    
+                header = next(rows, None)
+                if not header:
+                    print("❌ Sheet không có dòng tiêu đề")
+                    return
+                columns = [str(value).strip() if value is not None else f"Unnamed: {idx}"
+                           for idx, value in enumerate(header)]
+                
+                # Tạo custom field cho các cột chưa được khai báo, kiểm tra các cột bắt buộc
+                if not self._apply_columns(columns):
+                    return
+                schema = self.account_type
+                field_columns = self._column_positions(columns)
+                
+                # Xử lý từng dòng dữ liệu
+                for row_num, row in enumerate(rows, skip_rows + 2):
+                    if not any(value is not None and str(value).strip() for value in row):
+                        continue
+                    values = []
+                    for idx in field_columns:
+                        value = row[idx] if idx is not None and idx < len(row) else None
+                        # Chuyển đổi tất cả giá trị thành string và loại bỏ khoảng trắng
+                        values.append(str(value).strip() if value is not None else "")
+                        
+                    error = self._check_required(values, schema)
+                    if error:
+                        self._skip_row(row_num, error)
+                        continue
+                        
+                    yield row_num, schema.make_record(values)
+                self._count_read()
+            finally:
+                workbook.close()
+                
+        except Exception as e:
+            self._read_failed(e, "Excel")
+    
+    def estimate_rows(self) -> Optional[int]:
+        if not self.filename.lower().endswith('.xlsx'):
+            return None
+        from openpyxl import load_workbook
+        
+        # Kích thước sheet được ghi sẵn trong file, không cần đọc hết các dòng
+        workbook = load_workbook(self.filename, read_only=True)
+        try:
+            sheet = self._select_sheet(workbook, quiet=True)
+            if sheet is None or not sheet.max_row:
+                return None
+            return max(0, sheet.max_row - int(self.options.get('skip_rows') or 0) - 1)
+        finally:
+            workbook.close()
+    
+    def _select_sheet(self, workbook, quiet: bool = False):
+        """Chọn sheet theo tùy chọn `sheet`, mặc định là sheet đầu tiên"""
+        sheet = self.options.get('sheet')
+        if sheet is None or sheet == "":
+            return workbook.worksheets[0]
+        if isinstance(sheet, int) or str(sheet).isdigit():
+            idx = int(sheet)
+            if idx < len(workbook.worksheets):
+                return workbook.worksheets[idx]
+        elif sheet in workbook.sheetnames:
+            return workbook[sheet]
             
-            # Tạo custom field cho các cột chưa được khai báo
-            existing_fields = [f["name"] for f in self.account_type["fields"]]
-            for column in df.columns:
-                if column not in existing_fields:
-                    self.account_type["fields"].append(self._create_custom_field(str(column)))
+        if not quiet:
+            print(f"❌ Không tìm thấy sheet: {sheet}")
+            print(f"Các sheet có sẵn: {', '.join(workbook.sheetnames)}")
+        return None
+    
+    def _read_with_pandas(self) -> List[Tuple[int, Record]]:
+        try:
+            # pandas chỉ cần cho file .xls nên chỉ import khi thực sự dùng
+            import pandas as pd
+            
+            # Đọc file Excel với pandas
+            sheet = self.options.get('sheet')
+            if sheet is None or sheet == "":
+                sheet = 0
+            elif str(sheet).isdigit():
+                sheet = int(sheet)
+            df = pd.read_excel(self.filename, sheet_name=sheet, skiprows=int(self.options.get('skip_rows') or 0))
             
-            # Kiểm tra các cột bắt buộc
-            required_fields = [f["name"] for f in self.account_type["fields"] if f["required"]]
-            missing_columns = [field for field in required_fields if field not in df.columns]
-            if missing_columns:
-                print(f"❌ Thiếu các cột bắt buộc: {', '.join(missing_columns)}")
+            # Tạo custom field cho các cột chưa được khai báo, kiểm tra các cột bắt buộc
+            columns = [str(column) for column in df.columns]
+            if not self._apply_columns(columns):
                 return []
+            schema = self.account_type
+            field_columns = self._column_positions(columns)
             
             # Xử lý từng dòng dữ liệu
             data = []
-            for idx, row in df.iterrows():
-                item = {}
-                for field in self.account_type["fields"]:
-                    field_name = field["name"]
-                    if field_name in df.columns:
-                        value = row[field_name]
-                        # Chuyển đổi tất cả giá trị thành string và loại bỏ khoảng trắng
-                        item[field_name] = str(value).strip() if pd.notna(value) else ""
-                    else:
-                        item[field_name] = ""
-                data.append(item)
+            # Số dòng trong sheet: sau các dòng bỏ qua và dòng tiêu đề
+            for row_num, row in enumerate(df.itertuples(index=False, name=None), int(self.options.get('skip_rows') or 0) + 2):
+                values = []
+                for idx in field_columns:
+                    value = row[idx] if idx is not None else None
+                    # Chuyển đổi tất cả giá trị thành string và loại bỏ khoảng trắng
+                    values.append(str(value).strip() if value is not None and pd.notna(value) else "")
+                data.append((row_num, schema.make_record(values)))
+            self._count_read()
             
             return data
             
         except Exception as e:
-            print(f"❌ Lỗi khi đọc file Excel: {str(e)}")
+            self._read_failed(e, "Excel")
             return []
     
-    def write_results(self, results: List[Tuple[str, str]], output_file: str):
-        # Chuyển đổi kết quả thành DataFrame
-        df = pd.DataFrame(results, columns=['Title', '1Password UUID'])
-        # Lưu ra file Excel
-        df.to_excel(output_file, index=False)
+    def write_results(self, results: List[Tuple], output_file: str, append: bool = False):
+        # Workbook write-only được giữ mở giữa các lô và chỉ lưu ra file ở close_results
+        if self._result_book is None:
+            from openpyxl import Workbook, load_workbook
+            
+            self._result_book = Workbook(write_only=True)
+            self._result_sheet = self._result_book.create_sheet("Results")
+            if append and os.path.exists(output_file):
+                # Không ghi nối trực tiếp được vào xlsx: chép lại các dòng kết quả cũ trước
+                previous = load_workbook(output_file, read_only=True)
+                try:
+                    for row in previous.worksheets[0].iter_rows(values_only=True):
+                        self._result_sheet.append(list(row))
+                finally:
+                    previous.close()
+            else:
+                self._result_sheet.append(RESULT_COLUMNS)
+                
+        for row in results:
+            self._result_sheet.append(list(row))
+    
+    def close_results(self, output_file: str) -> None:
+        if self._result_book is not None:
+            self._result_book.save(output_file)
+            self._result_book = None
+            self._result_sheet = None
 
 class CSVFileHandler(FileHandler):
     """Handler for CSV files"""
     
-    def read_data(self) -> List[Dict]:
+    def read_data(self) -> List[Record]:
+        return list(self.iter_data())
+    
+    def iter_numbered(self) -> Iterator[Tuple[int, Record]]:
+        # Đọc trực tiếp bằng module csv theo từng dòng: không dựng DataFrame, không iterrows,
+        # và giữ nguyên giá trị dạng chuỗi (không mất số 0 ở đầu số thẻ, số tài khoản...)
         try:
-            # Đọc file CSV với pandas
-            df = pd.read_csv(self.filename)
-            
-            # Tạo custom field cho các cột chưa được khai báo
-            existing_fields = [f["name"] for f in self.account_type["fields"]]
-            for column in df.columns:
-                if column not in existing_fields:
-                    self.account_type["fields"].append(self._create_custom_field(str(column)))
-            
-            # Kiểm tra các cột bắt buộc
-            required_fields = [f["name"] for f in self.account_type["fields"] if f["required"]]
-            missing_columns = [field for field in required_fields if field not in df.columns]
-            if missing_columns:
-                print(f"❌ Thiếu các cột bắt buộc: {', '.join(missing_columns)}")
-                return []
-            
-            # Xử lý từng dòng dữ liệu
-            data = []
-            for idx, row in df.iterrows():
-                item = {}
-                for field in self.account_type["fields"]:
-                    field_name = field["name"]
-                    if field_name in df.columns:
-                        value = row[field_name]
-                        # Chuyển đổi tất cả giá trị thành string và loại bỏ khoảng trắng
-                        item[field_name] = str(value).strip() if pd.notna(value) else ""
-                    else:
-                        item[field_name] = ""
-                data.append(item)
-            
-            return data
+            with open(self.filename, 'r', newline='', encoding='utf-8-sig') as csvfile:
+                reader = csv.reader(csvfile)
+                header = next(reader, None)
+                if not header:
+                    print("❌ File CSV không có dòng tiêu đề")
+                    return
+                
+                # Tạo custom field cho các cột chưa được khai báo, kiểm tra các cột bắt buộc
+                if not self._apply_columns(header):
+                    return
+                schema = self.account_type
+                make_record = schema.record_type
+                
+                # Tính sẵn vị trí cột của từng trường một lần cho cả file
+                field_columns = self._column_positions(header)
+                width = len(header)
+                
+                # Khi chạy theo shard: header vẫn lấy ở đầu file, dữ liệu chỉ đọc trong khoảng byte được giao
+                byte_range = self.byte_range
+                line_base = 0
+                if byte_range is not None:
+                    reader = csv.reader(read_byte_range(self.filename, *byte_range))
+                    line_base = self.line_offset
+                
+                # Xử lý từng dòng dữ liệu
+                for row in reader:
+                    if not any(row):
+                        continue
+                    if len(row) < width:
+                        row.extend([""] * (width - len(row)))
+                    values = [row[idx].strip() if idx is not None else "" for idx in field_columns]
+                    
+                    error = self._check_required(values, schema)
+                    if error:
+                        self._skip_row(line_base + reader.line_num, error)
+                        continue
+                        
+                    yield line_base + reader.line_num, make_record(values)
+            self._count_read()
             
         except Exception as e:
-            print(f"❌ Lỗi khi đọc file CSV: {str(e)}")
-            return []
+            self._read_failed(e, "CSV")
+    
+    def estimate_rows(self) -> Optional[int]:
+        # Trừ dòng tiêu đề; ô có xuống dòng làm số này lớn hơn thực tế đôi chút
+        if self.byte_range is not None:
+            return count_lines(self.filename, self.byte_range)
+        return max(0, count_lines(self.filename) - 1)
+    
+    def write_results(self, results: List[Tuple], output_file: str, append: bool = False):
+        _write_csv_results(results, output_file, append)
+
+class ResultSink:
+    """Ghi kết quả từng item ngay khi có, gom theo lô rồi ghi qua write_results của handler
+    
+    Mỗi dòng kết quả gồm: số dòng, tiêu đề, trạng thái, item id, lỗi và độ trễ (ms).
+    """
+    
+    def __init__(self, handler: FileHandler, output_file: str, append: bool = False,
+                 batch_size: int = RESULT_BATCH_SIZE):
+        self.handler = handler
+        self.output_file = output_file
+        self.batch_size = batch_size
+        self._append = append
+        self._started = False
+        self._buffer: List[Tuple] = []
+    
+    def add(self, row: int, title: str, status: str, item_id: Optional[str] = None,
+            error: Optional[str] = None, latency: Optional[float] = None) -> None:
+        self._buffer.append((
+            row,
+            title,
+            status,
+            item_id or "",
+            " ".join(error.split()) if error else "",
+            round(latency * 1000) if latency is not None else "",
+        ))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+    
+    def flush(self) -> None:
+        if not self._buffer and self._started:
+            return
+        with get_metrics().phase('write'):
+            self.handler.write_results(self._buffer, self.output_file, append=self._append)
+        self._buffer = []
+        self._started = True
+        self._append = True
+    
+    def close(self) -> None:
+        self.flush()
+        with get_metrics().phase('write'):
+            self.handler.close_results(self.output_file)
+    
+    def __enter__(self) -> "ResultSink":
+        return self
     
-    def write_results(self, results: List[Tuple[str, str]], output_file: str):
-        # Chuyển đổi kết quả thành DataFrame
-        df = pd.DataFrame(results, columns=['Title', '1Password UUID'])
-        # Lưu ra file CSV
-        df.to_csv(output_file, index=False)
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
 
-def get_file_handler(filename: str, account_type: Dict) -> Optional[FileHandler]:
+def get_file_handler(filename: str, account_type: AccountSchema, options: Optional[Dict] = None) -> Optional[FileHandler]:
     """Factory function to get appropriate file handler"""
     ext = filename.lower().split('.')[-1]
     
     if ext == 'txt':
-        return TextFileHandler(filename, account_type)
+        return TextFileHandler(filename, account_type, options)
     elif ext == 'csv':
-        return CSVFileHandler(filename, account_type)
+        return CSVFileHandler(filename, account_type, options)
     elif ext in ['xlsx', 'xls']:
-        return ExcelFileHandler(filename, account_type)
+        return ExcelFileHandler(filename, account_type, options)
     else:
         print(f"❌ Không hỗ trợ định dạng file: {ext}")
         return None 
\ No newline at end of file
@@ -0,0 +1,568 @@
+import asyncio
+import heapq
+import itertools
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, Iterable, Iterator, Optional, Tuple
+from metrics import echo
+
+# Số luồng mặc định để chạy song song các lệnh `op item create`
+DEFAULT_WORKERS = 4
+
+# Số dòng tối đa được đọc trước, chờ trong hàng đợi giữa bước đọc file và bước import
+DEFAULT_READ_AHEAD = 1000
+
+# Cấu hình thử lại mặc định
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_BUDGET = 500
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+
+# Kết quả phân loại lỗi
+RETRYABLE = "retryable"
+THROTTLED = "throttled"
+FATAL = "fatal"
+
+class RetryScheduler:
+    """Quyết định thử lại item lỗi và điều chỉnh mức song song cho cả một lần chạy.
+
+    classify(result) trả về None nếu thành công, hoặc RETRYABLE / THROTTLED / FATAL.
+    Lỗi RETRYABLE/THROTTLED được thử lại với backoff lũy thừa có jitter, tối đa
+    `max_attempts` lần mỗi item và `budget` lần cho cả lần chạy. Khi gặp THROTTLED,
+    mức song song giảm một nửa rồi tăng dần lại sau mỗi chuỗi thành công.
+    """
+
+    def __init__(self, classify: Callable[[Any], Optional[str]], max_concurrency: int = DEFAULT_WORKERS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, budget: int = DEFAULT_RETRY_BUDGET,
+                 base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY):
+        self.classify = classify
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.limit = self.max_concurrency
+        self.max_attempts = max_attempts
+        self.budget = budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retried = 0
+        self.throttled = 0
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    def retry_delay(self, result: Any, attempt: int) -> Optional[float]:
+        """Trả về số giây chờ trước khi thử lại, hoặc None nếu kết quả là cuối cùng"""
+        kind = self.classify(result)
+        with self._lock:
+            if kind is None:
+                self._on_success()
+                return None
+            if kind == THROTTLED:
+                self._on_throttle()
+            if kind == FATAL or attempt + 1 >= self.max_attempts or self.budget <= 0:
+                return None
+            self.budget -= 1
+            self.retried += 1
+
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    def _on_success(self) -> None:
+        self._successes += 1
+        if self.limit < self.max_concurrency and self._successes >= self.limit:
+            self.limit += 1
+            self._successes = 0
+
+    def _on_throttle(self) -> None:
+        self.throttled += 1
+        self._successes = 0
+        if self.limit > 1:
+            self.limit = max(1, self.limit // 2)
+            echo(f"🐢 Bị giới hạn tốc độ, giảm số lệnh song song còn {self.limit}")
+
+class LimiterClosed(Exception):
+    """FairLimiter đã đóng (lần chạy bị dừng), không cấp thêm lượt chạy lệnh op"""
+
+class _Waiter:
+    """Một lượt đang chờ trong FairLimiter: luồng chờ qua Event, coroutine chờ qua Future"""
+
+    def __init__(self, key: Hashable, group: Hashable, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.key = key
+        self.group = group
+        self.granted = False
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+
+    def wake(self, limiter: "FairLimiter") -> None:
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve, limiter)
+
+    def _resolve(self, limiter: "FairLimiter") -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+        elif self.granted:
+            # Coroutine đã bị hủy ngay trước khi nhận lượt: trả lại lượt đó
+            limiter.release(self.key, self.group)
+
+class FairLimiter:
+    """Giới hạn chung số lệnh op đang chạy cho nhiều file chạy song song.
+
+    Mỗi lệnh op phải lấy một lượt theo `key` (file) trước khi chạy. Khi có lượt trống, lượt
+    được cấp cho key đang chờ có ít lệnh đang chạy nhất (hòa thì key lâu chưa được cấp nhất),
+    nên file nhỏ không phải chờ sau file lớn. Nếu `by_group`, lượt được chia đều theo nhóm
+    (vault) trước rồi mới đến các key trong nhóm. Nếu có scheduler, giới hạn thực tế là
+    min(capacity, scheduler.limit) để việc giảm song song khi bị throttle áp dụng cho cả lần chạy.
+    """
+
+    def __init__(self, capacity: int, by_group: bool = False, scheduler: Optional[RetryScheduler] = None):
+        self.capacity = max(1, int(capacity))
+        self.by_group = by_group
+        self.scheduler = scheduler
+        self.in_flight = 0
+        self.closed = False
+        self._key_in_flight: Dict[Hashable, int] = {}
+        self._group_in_flight: Dict[Hashable, int] = {}
+        self._last_grant: Dict[Hashable, int] = {}
+        self._group_last_grant: Dict[Hashable, int] = {}
+        self._waiters: Dict[Hashable, Deque[_Waiter]] = {}
+        self._ticket = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        if self.scheduler:
+            return min(self.capacity, self.scheduler.limit)
+        return self.capacity
+
+    def acquire(self, key: Hashable, group: Hashable = None) -> None:
+        """Chờ (chặn luồng) đến khi được cấp một lượt cho `key`"""
+        with self._lock:
+            waiter = self._enqueue(key, group)
+        waiter.event.wait()
+        if not waiter.granted:
+            raise LimiterClosed("Đã dừng lần chạy")
+
+    async def acquire_async(self, key: Hashable, group: Hashable = None) -> None:
+        """Phiên bản asyncio của acquire, không chặn event loop"""
+        with self._lock:
+            waiter = self._enqueue(key, group, asyncio.get_running_loop())
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                queued = self._waiters.get(waiter.key)
+                if not waiter.granted and queued and waiter in queued:
+                    queued.remove(waiter)
+            raise
+        if not waiter.granted:
+            raise LimiterClosed("Đã dừng lần chạy")
+
+    def release(self, key: Hashable, group: Hashable = None) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._key_in_flight[key] -= 1
+            if self.by_group:
+                self._group_in_flight[group] -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, key: Hashable, group: Hashable = None) -> Iterator[None]:
+        self.acquire(key, group)
+        try:
+            yield
+        finally:
+            self.release(key, group)
+
+    @asynccontextmanager
+    async def slot_async(self, key: Hashable, group: Hashable = None) -> AsyncIterator[None]:
+        await self.acquire_async(key, group)
+        try:
+            yield
+        finally:
+            self.release(key, group)
+
+    def close(self) -> None:
+        """Đánh thức mọi lượt đang chờ với LimiterClosed; các lệnh đang chạy không bị ảnh hưởng"""
+        with self._lock:
+            self.closed = True
+            for queued in self._waiters.values():
+                while queued:
+                    queued.popleft().wake(self)
+
+    def _enqueue(self, key: Hashable, group: Hashable,
+                 loop: Optional[asyncio.AbstractEventLoop] = None) -> _Waiter:
+        waiter = _Waiter(key, group if self.by_group else None, loop)
+        if self.closed:
+            waiter.wake(self)
+        else:
+            self._waiters.setdefault(key, deque()).append(waiter)
+            self._dispatch()
+        return waiter
+
+    def _dispatch(self) -> None:
+        """Cấp lượt trống cho các key đang chờ, gọi khi đang giữ _lock"""
+        while self.in_flight < self.limit:
+            waiting = [key for key, queued in self._waiters.items() if queued]
+            if not waiting:
+                return
+            if self.by_group:
+                group = min(
+                    {self._waiters[key][0].group for key in waiting},
+                    key=lambda g: (self._group_in_flight.get(g, 0), self._group_last_grant.get(g, -1)),
+                )
+                waiting = [key for key in waiting if self._waiters[key][0].group == group]
+            key = min(waiting, key=lambda k: (self._key_in_flight.get(k, 0), self._last_grant.get(k, -1)))
+            waiter = self._waiters[key].popleft()
+            ticket = next(self._ticket)
+            self._last_grant[key] = ticket
+            self.in_flight += 1
+            self._key_in_flight[key] = self._key_in_flight.get(key, 0) + 1
+            if self.by_group:
+                self._group_last_grant[waiter.group] = ticket
+                self._group_in_flight[waiter.group] = self._group_in_flight.get(waiter.group, 0) + 1
+            waiter.granted = True
+            waiter.wake(self)
+
+_END_OF_ITEMS = object()
+
+def iter_prefetch(items: Iterable, maxsize: int = DEFAULT_READ_AHEAD) -> Iterator[Any]:
+    """Đọc items trong một luồng riêng (producer) và trả qua hàng đợi có giới hạn.
+
+    Bước đọc/parse file chạy song song với bước import, nhưng không bao giờ đọc trước
+    quá `maxsize` dòng nên bộ nhớ không phụ thuộc kích thước file.
+    Lỗi trong producer được ném lại ở phía tiêu thụ.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=max(1, int(maxsize)))
+    stop = threading.Event()
+    errors = []
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except BaseException as e:
+            errors.append(e)
+        put(_END_OF_ITEMS)
+
+    producer = threading.Thread(target=produce, name="import-reader", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END_OF_ITEMS:
+                break
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        # Dừng producer khi bên tiêu thụ kết thúc sớm (lỗi, Ctrl+C)
+        stop.set()
+
+class _PoolState:
+    """Trạng thái chung của run_pool và run_async_pool.
+
+    Giữ cửa sổ item đang chạy, hàng đợi thử lại và bộ đệm để trả kết quả theo thứ tự đầu vào.
+    """
+
+    def __init__(self, items: Iterable, concurrency: int, max_pending: int,
+                 on_result: Optional[Callable[[int, Any, Any], None]], scheduler: Optional[RetryScheduler]):
+        self.iterator = iter(enumerate(items, 1))
+        self.concurrency = max(1, int(concurrency))
+        self.max_pending = max_pending
+        self.on_result = on_result
+        self.scheduler = scheduler
+        self.in_flight: Dict = {}
+        self.retry_queue = []  # heap (thời điểm thử lại, index, item)
+        self.attempts: Dict[int, int] = {}
+        self.done_results: Dict[int, Tuple[Any, Any]] = {}
+        self.next_index = 1
+        self.exhausted = False
+        self.ready: Deque[Tuple[int, Any]] = deque()  # item đã đọc sẵn, chưa đưa vào chạy
+
+    @property
+    def limit(self) -> int:
+        if self.scheduler:
+            return min(self.concurrency, self.scheduler.limit)
+        return self.concurrency
+
+    @property
+    def finished(self) -> bool:
+        return (self.exhausted and not self.ready and not self.in_flight and not self.retry_queue
+                and not self.done_results)
+
+    def refill(self, submit: Callable[[Any], Any], block: bool = True) -> None:
+        """Đưa các item đến hạn thử lại và item mới vào chạy khi còn chỗ.
+
+        Với block=False chỉ lấy các item đã đọc sẵn trong `ready`, không chờ đầu vào.
+        """
+        now = time.monotonic()
+        while self.retry_queue and self.retry_queue[0][0] <= now and len(self.in_flight) < self.limit:
+            _, index, item = heapq.heappop(self.retry_queue)
+            self.in_flight[submit(item)] = (index, item)
+
+        while (len(self.in_flight) < self.limit
+               and len(self.in_flight) + len(self.retry_queue) + len(self.done_results) < self.max_pending):
+            if self.ready:
+                index, item = self.ready.popleft()
+            elif self.exhausted or not block:
+                break
+            else:
+                try:
+                    index, item = next(self.iterator)
+                except StopIteration:
+                    self.exhausted = True
+                    break
+            self.in_flight[submit(item)] = (index, item)
+
+    @property
+    def needs_input(self) -> bool:
+        return not self.exhausted and not self.ready
+
+    def wait_timeout(self) -> Optional[float]:
+        """Thời gian tối đa được chờ trước khi có item cần thử lại"""
+        if not self.retry_queue:
+            return None
+        return max(0.0, self.retry_queue[0][0] - time.monotonic())
+
+    def complete(self, handle: Any, result: Any) -> None:
+        """Ghi nhận kết quả một item, hoặc đưa item vào hàng đợi thử lại"""
+        index, item = self.in_flight.pop(handle)
+        if self.scheduler:
+            attempt = self.attempts.get(index, 0)
+            delay = self.scheduler.retry_delay(result, attempt)
+            if delay is not None:
+                self.attempts[index] = attempt + 1
+                echo(f"🔁 Thử lại dòng {index} sau {delay:.1f} giây (lần {attempt + 1})")
+                heapq.heappush(self.retry_queue, (time.monotonic() + delay, index, item))
+                return
+            self.attempts.pop(index, None)
+
+        if self.on_result:
+            self.on_result(index, item, result)
+        self.done_results[index] = (item, result)
+
+    def drain(self) -> Iterator[Tuple[int, Any, Any]]:
+        """Trả các kết quả đã sẵn sàng theo thứ tự đầu vào"""
+        while self.next_index in self.done_results:
+            item, result = self.done_results.pop(self.next_index)
+            yield self.next_index, item, result
+            self.next_index += 1
+
+def run_pool(items: Iterable, worker: Callable[[Any], Any], workers: int = DEFAULT_WORKERS,
+             on_result: Optional[Callable[[int, Any, Any], None]] = None,
+             scheduler: Optional[RetryScheduler] = None) -> Iterator[Tuple[int, Any, Any]]:
+    """Chạy worker cho từng item với tối đa `workers` luồng song song.
+
+    Yield (index, item, result) theo đúng thứ tự đầu vào (index bắt đầu từ 1).
+    on_result được gọi ngay khi từng item hoàn tất, có thể không theo thứ tự.
+    Số item đang chờ (chạy + chờ yield) bị giới hạn để bộ nhớ không tăng theo kích thước file.
+    Nếu có scheduler, item lỗi tạm thời được đưa lại hàng đợi thay vì trả về ngay.
+    """
+    workers = max(1, int(workers))
+    state = _PoolState(items, workers, workers * 4, on_result, scheduler)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            state.refill(lambda item: executor.submit(worker, item))
+            if state.finished:
+                break
+
+            if state.in_flight:
+                finished, _ = wait(state.in_flight, timeout=state.wait_timeout(), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    state.complete(future, future.result())
+            elif state.retry_queue:
+                time.sleep(state.wait_timeout())
+
+            # Trả kết quả theo thứ tự đầu vào
+            yield from state.drain()
+    finally:
+        # Hủy các item chưa chạy (ví dụ khi Ctrl+C), không chờ các lệnh đang chạy
+        for future in state.in_flight:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+class _ThreadLoop:
+    """Event loop dùng lâu dài của một luồng, được đóng khi luồng kết thúc"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+
+    def __del__(self):
+        if not self.loop.is_closed():
+            self.loop.close()
+
+_thread_loops = threading.local()
+
+def run_in_thread_loop(coro: Awaitable[Any]) -> Any:
+    """Chạy coroutine đến khi xong trên event loop của luồng hiện tại.
+
+    Dùng thay cho asyncio.run trong worker của run_pool: mỗi luồng tạo event loop ở lần gọi đầu tiên
+    rồi dùng lại cho mọi item, thay vì tạo và đóng một event loop (kèm executor mặc định) cho từng item.
+    """
+    holder = getattr(_thread_loops, 'holder', None)
+    if holder is None:
+        holder = _thread_loops.holder = _ThreadLoop()
+        asyncio.set_event_loop(holder.loop)
+    return holder.loop.run_until_complete(coro)
+
+def run_inline(items: Iterable, worker: Callable[[Any], Any],
+               on_result: Optional[Callable[[int, Any, Any], None]] = None) -> Iterator[Tuple[int, Any, Any]]:
+    """Chạy worker tuần tự trong luồng gọi, cùng dạng kết quả với run_pool.
+
+    Dùng cho worker không chờ I/O (ví dụ ghi ra file), khi luồng, event loop và thử lại chỉ thêm chi phí.
+    """
+    for index, item in enumerate(items, 1):
+        result = worker(item)
+        if on_result:
+            on_result(index, item, result)
+        yield index, item, result
+
+async def run_async_pool(items: Iterable, worker: Callable[[Any], Awaitable[Any]], concurrency: int = DEFAULT_WORKERS,
+                         on_result: Optional[Callable[[int, Any, Any], None]] = None,
+                         scheduler: Optional[RetryScheduler] = None) -> AsyncIterator[Tuple[int, Any, Any]]:
+    """Phiên bản asyncio của run_pool: tối đa `concurrency` coroutine chạy cùng lúc, không tốn thêm luồng.
+
+    Item đầu vào được đọc trong một luồng riêng (xem _AsyncInput), nên event loop vẫn nhận kết quả
+    của các task đang chạy trong lúc chờ đầu vào.
+    Khi bị hủy (Ctrl+C), toàn bộ task đang chạy bị cancel và được chờ kết thúc trước khi thoát.
+    """
+    concurrency = max(1, int(concurrency))
+    state = _PoolState(items, concurrency, concurrency * 2, on_result, scheduler)
+    source = _AsyncInput(state.iterator, concurrency)
+    getter = None
+    try:
+        while True:
+            state.refill(lambda item: asyncio.ensure_future(worker(item)), block=False)
+            if getter is None and state.needs_input:
+                getter = asyncio.ensure_future(source.queue.get())
+            if state.finished:
+                break
+
+            waiting = set(state.in_flight)
+            if getter is not None:
+                waiting.add(getter)
+            if waiting:
+                finished, _ = await asyncio.wait(waiting, timeout=state.wait_timeout(),
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    if task is getter:
+                        getter = None
+                        source.take(state, task.result())
+                    else:
+                        state.complete(task, task.result())
+            elif state.retry_queue:
+                await asyncio.sleep(state.wait_timeout())
+
+            for result in state.drain():
+                yield result
+    finally:
+        source.close()
+        if getter is not None:
+            getter.cancel()
+        for task in state.in_flight:
+            task.cancel()
+        if state.in_flight:
+            await asyncio.gather(*state.in_flight, return_exceptions=True)
+
+class _AsyncInput:
+    """Đọc item đầu vào của run_async_pool trong một luồng riêng và chuyển sang event loop qua asyncio.Queue.
+
+    Lấy item từ iterator có thể phải chờ (hàng đợi của iter_prefetch trống khi đọc file chậm hơn import),
+    nên không được gọi next() trong event loop. Luồng đọc chỉ đọc trước tối đa `capacity` item.
+    """
+
+    def __init__(self, iterator: Iterator, capacity: int):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.slots = threading.Semaphore(capacity)
+        self.stop = threading.Event()
+        self.loop = asyncio.get_running_loop()
+        self.thread = threading.Thread(target=self._read, args=(iterator,), name="import-input", daemon=True)
+        self.thread.start()
+
+    def _read(self, iterator: Iterator) -> None:
+        try:
+            for entry in iterator:
+                while not self.slots.acquire(timeout=0.1):
+                    if self.stop.is_set():
+                        return
+                if not self._send(entry):
+                    return
+            self._send(_END_OF_ITEMS)
+        except BaseException as e:
+            self._send(_InputError(e))
+
+    def _send(self, entry: Any) -> bool:
+        if self.stop.is_set():
+            return False
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, entry)
+        except RuntimeError:
+            # Event loop đã đóng
+            return False
+        return True
+
+    def take(self, state: _PoolState, entry: Any) -> None:
+        """Đưa item vừa nhận (và các item khác đã có sẵn trong hàng đợi) vào state.ready"""
+        while True:
+            if entry is _END_OF_ITEMS:
+                state.exhausted = True
+                return
+            if isinstance(entry, _InputError):
+                raise entry.error
+            state.ready.append(entry)
+            self.slots.release()
+            if self.queue.empty():
+                return
+            entry = self.queue.get_nowait()
+
+    def close(self) -> None:
+        self.stop.set()
+
+class _InputError:
+    """Lỗi khi đọc đầu vào, được ném lại trong event loop"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+def iter_async_pool(items: Iterable, worker: Callable[[Any], Awaitable[Any]], concurrency: int = DEFAULT_WORKERS,
+                    on_result: Optional[Callable[[int, Any, Any], None]] = None,
+                    scheduler: Optional[RetryScheduler] = None) -> Iterator[Tuple[int, Any, Any]]:
+    """Chạy run_async_pool trên một event loop riêng và trả kết quả như một generator thông thường"""
+    loop = asyncio.new_event_loop()
+    agen = run_async_pool(items, worker, concurrency, on_result, scheduler)
+    step = None
+    try:
+        while True:
+            step = loop.create_task(agen.__anext__())
+            try:
+                yield loop.run_until_complete(step)
+            except StopAsyncIteration:
+                break
+    finally:
+        # Dọn dẹp cả khi bị KeyboardInterrupt: hủy task, kill tiến trình op còn sống
+        try:
+            if step is not None and not step.done():
+                step.cancel()
+                loop.run_until_complete(asyncio.gather(step, return_exceptions=True))
+            loop.run_until_complete(agen.aclose())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
@@ -0,0 +1,119 @@
+import glob
+import os
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+from schema import AccountSchema
+
+# Định dạng file input được hỗ trợ
+SUPPORTED_EXTENSIONS = ('.txt', '.csv', '.xlsx', '.xls')
+
+class ManifestError(Exception):
+    """Manifest không hợp lệ; `errors` chứa toàn bộ lỗi tìm được"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+def load_manifest(path: str) -> Dict:
+    """Đọc file manifest dạng YAML hoặc JSON (JSON cũng là YAML hợp lệ)"""
+    if not os.path.exists(path):
+        raise ManifestError([f"Không tìm thấy file manifest: {path}"])
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = yaml.safe_load(f)
+    except yaml.YAMLError as e:
+        raise ManifestError([f"Không đọc được file manifest: {str(e)}"])
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('jobs'), list) or not manifest['jobs']:
+        raise ManifestError(["Manifest phải có danh sách 'jobs' không rỗng"])
+    return manifest
+
+def resolve_vault(ref: str, vaults: List[Dict]) -> Tuple[Optional[str], Optional[str]]:
+    """Tìm vault theo id hoặc tên, trả về (vault id, lỗi)"""
+    ref = str(ref).strip()
+    for vault in vaults:
+        if vault.get('id') == ref:
+            return vault['id'], None
+
+    matches = [vault for vault in vaults if vault.get('name') == ref]
+    if not matches:
+        matches = [vault for vault in vaults if str(vault.get('name', '')).lower() == ref.lower()]
+    if len(matches) == 1:
+        return matches[0]['id'], None
+    if len(matches) > 1:
+        ids = ", ".join(vault['id'] for vault in matches)
+        return None, f"có nhiều vault tên '{ref}' ({ids}), hãy dùng id"
+    return None, f"không tìm thấy vault '{ref}'"
+
+def build_file_configs(manifest: Dict, account_types: Dict[str, AccountSchema], vaults: List[Dict]) -> List[Dict]:
+    """Kiểm tra toàn bộ manifest và trả về cấu hình từng file (cùng dạng với chế độ hỏi đáp)
+
+    Đường dẫn và glob được tính từ thư mục hiện tại. Mọi lỗi được gom lại và báo một lần
+    qua ManifestError, trước khi bất kỳ lệnh op item create nào được chạy.
+    """
+    defaults = manifest.get('defaults') or {}
+    if not isinstance(defaults, dict):
+        raise ManifestError(["'defaults' phải là một mapping"])
+
+    errors = []
+    file_configs = []
+    owners: Dict[str, int] = {}
+    for number, job in enumerate(manifest['jobs'], 1):
+        prefix = f"Job {number}"
+        if not isinstance(job, dict):
+            errors.append(f"{prefix}: phải là một mapping")
+            continue
+        job = {**defaults, **job}
+
+        patterns = job.get('files')
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        if not patterns or not isinstance(patterns, list):
+            errors.append(f"{prefix}: thiếu 'files' (glob hoặc danh sách glob)")
+            patterns = []
+
+        account_type = job.get('account_type')
+        if not account_type:
+            errors.append(f"{prefix}: thiếu 'account_type'")
+        elif account_type not in account_types:
+            errors.append(f"{prefix}: không có loại tài khoản '{account_type}' trong account_types.yaml "
+                          f"(có sẵn: {', '.join(account_types)})")
+
+        vault_id = None
+        if not job.get('vault'):
+            errors.append(f"{prefix}: thiếu 'vault' (tên hoặc id)")
+        else:
+            vault_id, error = resolve_vault(job['vault'], vaults)
+            if error:
+                errors.append(f"{prefix}: {error}")
+
+        notes = job.get('notes') or ""
+        if not isinstance(notes, str):
+            errors.append(f"{prefix}: 'notes' phải là chuỗi")
+
+        files = []
+        for pattern in patterns:
+            matched = sorted(glob.glob(str(pattern)))
+            if not matched:
+                errors.append(f"{prefix}: '{pattern}' không khớp file nào")
+            files.extend(path for path in matched if os.path.isfile(path))
+
+        for path in dict.fromkeys(files):
+            if not path.lower().endswith(SUPPORTED_EXTENSIONS):
+                errors.append(f"{prefix}: không hỗ trợ định dạng file {path} (hỗ trợ: {', '.join(SUPPORTED_EXTENSIONS)})")
+                continue
+            if path in owners:
+                errors.append(f"{prefix}: file {path} đã thuộc job {owners[path]}")
+                continue
+            owners[path] = number
+            file_configs.append({
+                'file': path,
+                'account_type': account_type,
+                'vault_id': vault_id,
+                'notes': notes,
+            })
+
+    if errors:
+        raise ManifestError(errors)
+    return file_configs
@@ -0,0 +1,327 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Ngưỡng (giây) của histogram độ trễ lệnh op, theo kiểu bucket của Prometheus
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Tiền tố tên metric trong file textfile của Prometheus
+PROMETHEUS_PREFIX = "op_import"
+
+class Histogram:
+    """Histogram tích lũy với các bucket cố định, không giữ lại từng giá trị"""
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # phần tử cuối là +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Cận trên của bucket chứa phân vị q (None nếu chưa có dữ liệu hoặc nằm ở +Inf)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[idx] if idx < len(self.buckets) else None
+        return None
+
+    def to_dict(self) -> Dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum_s": round(self.sum, 6),
+            "mean_s": round(self.sum / self.count, 6) if self.count else None,
+            "p50_s": self.quantile(0.50),
+            "p95_s": self.quantile(0.95),
+            "p99_s": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+class RunMetrics:
+    """Thời gian theo từng giai đoạn, bộ đếm và histogram của một lần chạy.
+
+    Dùng được từ nhiều luồng. Thời gian giai đoạn là tổng cộng dồn: các giai đoạn chạy song song
+    (đọc file, chờ op) có thể cộng lại lớn hơn thời gian thực của cả lần chạy.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.phases: Dict[str, List[float]] = {}  # tên -> [tổng số giây, số lần]
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.files: List[Dict] = []
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Đo thời gian một đoạn code và cộng vào giai đoạn `name`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_time(self, name: str, seconds: float, count: int = 1) -> None:
+        with self._lock:
+            entry = self.phases.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += count
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def timed_iter(self, name: str, iterable: Iterable) -> Iterator:
+        """Bọc một iterator, cộng thời gian lấy từng phần tử vào giai đoạn `name`"""
+        iterator = iter(iterable)
+        seconds = 0.0
+        count = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    seconds += time.perf_counter() - started
+                    return
+                seconds += time.perf_counter() - started
+                count += 1
+                yield item
+        finally:
+            self.add_time(name, seconds, count)
+
+    def add_file(self, summary: Dict) -> None:
+        """Ghi lại tóm tắt kết quả của một file"""
+        with self._lock:
+            self.files.append(summary)
+
+    def merge(self, report: Dict) -> None:
+        """Cộng báo cáo (dạng report()) của một tiến trình khác, ví dụ một shard, vào lần chạy này"""
+        with self._lock:
+            for name, value in report.get("counters", {}).items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, phase in report.get("phases", {}).items():
+                entry = self.phases.setdefault(name, [0.0, 0])
+                entry[0] += phase["seconds"]
+                entry[1] += phase["count"]
+            for name, data in report.get("histograms", {}).items():
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = Histogram()
+                previous = 0
+                for idx, cumulative in enumerate(data["buckets"].values()):
+                    histogram.counts[idx] += cumulative - previous
+                    previous = cumulative
+                histogram.sum += data["sum_s"]
+                histogram.count += data["count"]
+            self.files.extend(report.get("files", []))
+
+    def report(self) -> Dict:
+        """Báo cáo dạng dict, dùng để ghi ra JSON"""
+        with self._lock:
+            elapsed = self.elapsed
+            items = sum(self.counters.get(name, 0) for name in ("items_ok", "items_failed", "items_exists"))
+            return {
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started_at)),
+                "elapsed_s": round(elapsed, 3),
+                "items_per_s": round(self.counters.get("items_ok", 0) / elapsed, 2) if elapsed else None,
+                "items_processed": items,
+                "counters": dict(sorted(self.counters.items())),
+                "phases": {
+                    name: {"seconds": round(seconds, 6), "count": count}
+                    for name, (seconds, count) in sorted(self.phases.items())
+                },
+                "histograms": {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())},
+                "files": list(self.files),
+            }
+
+    def write_json(self, path: str) -> None:
+        """Ghi báo cáo JSON của lần chạy"""
+        _write_atomic(path, json.dumps(self.report(), ensure_ascii=False, indent=2) + "\n")
+
+    def write_prometheus(self, path: str) -> None:
+        """Ghi metric theo định dạng textfile của Prometheus (node_exporter textfile collector)"""
+        report = self.report()
+        lines = [
+            f"# TYPE {PROMETHEUS_PREFIX}_run_duration_seconds gauge",
+            f"{PROMETHEUS_PREFIX}_run_duration_seconds {report['elapsed_s']}",
+            f"# TYPE {PROMETHEUS_PREFIX}_last_run_timestamp_seconds gauge",
+            f"{PROMETHEUS_PREFIX}_last_run_timestamp_seconds {int(self.started_at)}",
+        ]
+        for name, value in report["counters"].items():
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name}_total counter")
+            lines.append(f"{PROMETHEUS_PREFIX}_{name}_total {value}")
+
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_phase_seconds_total counter")
+        for name, phase in report["phases"].items():
+            lines.append(f'{PROMETHEUS_PREFIX}_phase_seconds_total{{phase="{name}"}} {phase["seconds"]}')
+
+        with self._lock:
+            histograms = {name: (h.buckets, list(h.counts), h.sum, h.count) for name, h in self.histograms.items()}
+        for name, (buckets, counts, total, count) in sorted(histograms.items()):
+            metric = f"{PROMETHEUS_PREFIX}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum {round(total, 6)}")
+            lines.append(f"{metric}_count {count}")
+        _write_atomic(path, "\n".join(lines) + "\n")
+
+def _write_atomic(path: str, content: str) -> None:
+    """Ghi file qua file tạm rồi đổi tên, để bên đọc không thấy file ghi dở"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+_current = RunMetrics()
+
+def get_metrics() -> RunMetrics:
+    """Metric của lần chạy hiện tại"""
+    return _current
+
+def reset_metrics() -> RunMetrics:
+    """Bắt đầu thu thập metric cho một lần chạy mới"""
+    global _current
+    _current = RunMetrics()
+    return _current
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+class ProgressLine:
+    """Một dòng trạng thái cập nhật tại chỗ: số item đã xong, tốc độ và thời gian còn lại (ETA).
+
+    Trên terminal dòng này được vẽ lại tối đa mỗi `interval` giây; khi output được chuyển hướng
+    ra file thì chỉ in một dòng mới mỗi `log_interval` giây. Các thông báo khác trong lúc chạy
+    nên in qua echo() để không bị dòng trạng thái ghi đè.
+    Mỗi file có dòng trạng thái và bộ đếm riêng; khi nhiều file chạy song song, mọi lần ghi ra
+    stream dùng chung _OUTPUT_LOCK để các dòng không bị lẫn vào nhau.
+    """
+
+    def __init__(self, label: str, total: Optional[int] = None, done: int = 0,
+                 interval: float = 0.5, log_interval: float = 10.0, stream=None, tty: Optional[bool] = None):
+        self.label = label
+        self.total = total
+        self.stream = stream or sys.stdout
+        # tty=False buộc in theo chu kỳ, ví dụ khi nhiều file cùng hiển thị trạng thái
+        self.tty = hasattr(self.stream, "isatty") and self.stream.isatty() if tty is None else tty
+        self.interval = interval if self.tty else log_interval
+        self.done = done
+        self.counts: Dict[str, int] = {}
+        self._start_done = done
+        self._started = time.perf_counter()
+        self._last_render = 0.0
+        self._drawn = False
+        self._lock = threading.Lock()
+
+    def update(self, done: int, **counts: int) -> None:
+        with self._lock:
+            self.done = done
+            self.counts = counts
+            now = time.perf_counter()
+            if now - self._last_render >= self.interval:
+                self._last_render = now
+                self._render()
+
+    def write(self, message: str) -> None:
+        """In một thông báo phía trên dòng trạng thái"""
+        with _OUTPUT_LOCK:
+            if self._drawn:
+                self.stream.write("\r\x1b[K")
+                self._drawn = False
+            self.stream.write(message + "\n")
+            if self.tty:
+                self._render()
+
+    def close(self) -> None:
+        with _OUTPUT_LOCK:
+            self._render()
+            if self._drawn:
+                self.stream.write("\n")
+                self._drawn = False
+            self.stream.flush()
+
+    def text(self) -> str:
+        elapsed = time.perf_counter() - self._started
+        rate = (self.done - self._start_done) / elapsed if elapsed > 0 else 0.0
+        progress = f"{self.done}/{self.total}" if self.total else f"{self.done}"
+        if self.total:
+            progress += f" ({min(100.0, self.done * 100 / self.total):.0f}%)"
+        parts = [f"🚀 {self.label}: {progress}", f"{rate:.1f} item/s"]
+        parts.extend(f"{name} {count}" for name, count in self.counts.items())
+        if self.total and rate > 0 and self.done < self.total:
+            parts.append(f"ETA {_format_duration((self.total - self.done) / rate)}")
+        parts.append(f"đã chạy {_format_duration(elapsed)}")
+        return " | ".join(parts)
+
+    def _render(self) -> None:
+        with _OUTPUT_LOCK:
+            if self.tty:
+                self.stream.write("\r\x1b[K" + self.text())
+                self._drawn = True
+            else:
+                self.stream.write(self.text() + "\n")
+            self.stream.flush()
+
+    def __enter__(self) -> "ProgressLine":
+        with _OUTPUT_LOCK:
+            _active.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        with _OUTPUT_LOCK:
+            _active.remove(self)
+        self.close()
+
+# Khóa chung cho mọi lần ghi của các dòng trạng thái (luôn lấy sau khóa riêng của từng dòng, nếu có)
+_OUTPUT_LOCK = threading.RLock()
+
+# Các dòng trạng thái đang hiển thị, mỗi file đang import một dòng
+_active: List[ProgressLine] = []
+
+def echo(message: str) -> None:
+    """print() không làm vỡ dòng trạng thái đang hiển thị (nếu có)"""
+    with _OUTPUT_LOCK:
+        if _active:
+            _active[-1].write(message)
+        else:
+            print(message)
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import subprocess
+import time
+from typing import Dict, List, Optional, Tuple
+
+from metrics import echo, get_metrics
+from op_session import get_op_session
+from schema import AccountSchema, Record
+
+# Thời gian chờ tối đa cho mỗi lệnh op (giây)
+OP_TIMEOUT = 30
+
+# Thông báo lỗi khi op không trả về kết quả (timeout hoặc không chạy được lệnh)
+OP_NO_RESPONSE = "Không nhận được phản hồi từ op"
+
+# Các mẫu lỗi của op item edit/get khi item không có trong vault
+MISSING_ITEM_PATTERNS = ("isn't an item", "not found", "no item", "doesn't exist")
+
+def is_missing_item_error(error: Optional[str]) -> bool:
+    message = (error or "").lower()
+    return any(pattern in message for pattern in MISSING_ITEM_PATTERNS)
+
+async def run_op_command_async(cmd, timeout=OP_TIMEOUT, input: Optional[str] = None, reauth: bool = True):
+    """Run 1Password CLI command asynchronously with timeout, optionally feeding `input` to stdin
+    
+    Token phiên của OpSession được truyền qua biến môi trường của lệnh; nếu op báo phiên hết hạn
+    thì đăng nhập lại (khi được phép và `reauth`) và chạy lại lệnh một lần.
+    """
+    session = get_op_session()
+    token = session.token
+    result = await _run_op_once(cmd, session.environment(token), timeout, input)
+    if result is not None and result.returncode != 0 and session.is_auth_error(result.stderr):
+        session.invalidate()
+        if reauth and session.refresh(token):
+            result = await _run_op_once(cmd, session.environment(), timeout, input)
+    return result
+
+async def _run_op_once(cmd, env: Optional[Dict[str, str]], timeout, input: Optional[str]):
+    """Chạy một lệnh op với biến môi trường `env` (None: môi trường hiện tại)"""
+    metrics = get_metrics()
+    metrics.incr('op_calls')
+    started = time.perf_counter()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE if input is not None else None,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            env=env
+        )
+    except Exception as e:
+        metrics.incr('op_spawn_errors')
+        echo(f"❌ Lỗi khi thực thi lệnh: {str(e)}")
+        return None
+    spawned = time.perf_counter()
+    metrics.add_time('op_spawn', spawned - started)
+        
+    try:
+        stdin_data = input.encode('utf-8') if input is not None else None
+        stdout, stderr = await asyncio.wait_for(process.communicate(stdin_data), timeout)
+    except asyncio.TimeoutError:
+        _kill_process(process)
+        await process.wait()
+        metrics.incr('op_timeouts')
+        echo(f"❌ Lệnh bị timeout sau {timeout} giây")
+        return None
+    except asyncio.CancelledError:
+        # Ctrl+C hoặc bị hủy: không để lại tiến trình op mồ côi
+        _kill_process(process)
+        await process.wait()
+        raise
+    finally:
+        finished = time.perf_counter()
+        metrics.add_time('op_wait', finished - spawned)
+        metrics.observe('op_latency', finished - started)
+        
+    return subprocess.CompletedProcess(
+        cmd, process.returncode,
+        stdout.decode('utf-8', errors='replace'),
+        stderr.decode('utf-8', errors='replace')
+    )
+
+def _kill_process(process) -> None:
+    """Dừng tiến trình con nếu nó vẫn đang chạy"""
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+def run_op_command(cmd, timeout=OP_TIMEOUT, input: Optional[str] = None, reauth: bool = True):
+    """Run 1Password CLI command with timeout"""
+    return asyncio.run(run_op_command_async(cmd, timeout, input, reauth))
+
+def build_item_command(data: Record, account_type: AccountSchema, vault: str, notes: str = "") -> Tuple[List[str], str]:
+    """Tạo lệnh op item create và tiêu đề cho một tài khoản"""
+    # Create base command
+    cmd = [
+        "op", "item", "create",
+        "--category", account_type.category,  # Sử dụng category từ config
+        "--vault", vault,
+        "--format", "json",
+        "--title", account_type.item_title(data),
+    ]
+    
+    # Add URL if provided
+    if account_type.url:
+        cmd.append("--url")
+        cmd.append(account_type.url)
+    
+    # Add fields based on config (cách truyền từng loại trường đã tính sẵn trong schema)
+    cmd.extend(account_type.argv_assignments(data))
+    
+    # Add notes if provided
+    if notes:
+        cmd.append(f"notes[text]={notes}")
+        
+    return cmd, account_type.title_value(data)
+
+def build_edit_command(item_id: str, data: Record, account_type: AccountSchema, vault: str, notes: str = "") -> Tuple[List[str], str]:
+    """Tạo lệnh op item edit ghi đè các trường của item đã có bằng dữ liệu của dòng"""
+    cmd = [
+        "op", "item", "edit", item_id,
+        "--vault", vault,
+        "--format", "json",
+        "--title", account_type.item_title(data),
+    ]
+    if account_type.url:
+        cmd.append("--url")
+        cmd.append(account_type.url)
+    cmd.extend(account_type.argv_assignments(data))
+    if notes:
+        cmd.append(f"notes[text]={notes}")
+    return cmd, account_type.title_value(data)
+
+def parse_create_result(result, title: str, action: str = "thêm") -> tuple:
+    """Đọc kết quả của lệnh op item create/edit, trả về (thành công, item id, lỗi)"""
+    if result and result.returncode == 0:
+        try:
+            # Item thành công được tính vào dòng trạng thái thay vì in từng dòng
+            response = json.loads(result.stdout)
+            return True, response.get('id'), None
+        except json.JSONDecodeError as e:
+            echo(f"❌ Không thể parse JSON response cho {title}\nResponse: {result.stdout}")
+            return False, None, f"Không thể parse JSON response: {str(e)}"
+    else:
+        if result:
+            echo(f"❌ Không thể {action} {title}\nLỗi: {result.stderr.strip()}")
+            return False, None, result.stderr.strip() or f"op trả về mã lỗi {result.returncode}"
+        echo(f"❌ Không thể {action} {title}")
+        return False, None, OP_NO_RESPONSE
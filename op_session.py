@@ -0,0 +1,154 @@
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# Biến môi trường chứa token phiên mà op đọc, theo tên viết tắt (shorthand) của tài khoản
+SESSION_ENV_PREFIX = "OP_SESSION_"
+
+# Dòng `op signin` in ra để eval: `export OP_SESSION_<shorthand>="..."` (sh),
+# `$env:OP_SESSION_<shorthand>="..."` (PowerShell) hoặc `SET OP_SESSION_<shorthand>=...` (cmd)
+SIGNIN_EXPORT = re.compile(r'OP_SESSION_(\w+)\s*=\s*"?([^"\s]+)"?')
+
+# File cache kết quả kiểm tra op và danh sách vault, nằm trong thư mục temp
+CACHE_FILE = "op_cache.json"
+
+# Thời gian (giây) cache còn hiệu lực
+DEFAULT_CACHE_TTL = 600
+
+# Các mẫu lỗi trong stderr của op khi phiên đăng nhập không còn hợp lệ
+AUTH_ERROR_PATTERNS = (
+    "not currently signed in", "session expired", "invalid session", "authentication required",
+    "you are not signed in", "sign in again", "account is not signed in",
+)
+
+class OpSession:
+    """Phiên làm việc với 1Password CLI cho cả một lần chạy.
+
+    Token lấy một lần bằng `op signin` chỉ được truyền cho các lệnh op qua biến môi trường
+    OP_SESSION_<shorthand> của riêng tiến trình con (không nằm trên dòng lệnh, không ghi vào
+    os.environ của chương trình), để các lệnh item create không phải xác thực lại; các shard
+    nhận token từ tiến trình điều phối (xem credentials/use_token). Kết quả kiểm tra op (phiên
+    bản, đăng nhập) và danh sách vault được cache ra đĩa trong `ttl` giây, nên lần chạy sau không
+    cần gọi lại `op --version`, `op whoami` và `op vault list`. Khi op báo phiên hết hạn, cache bị
+    xóa và (nếu được phép tương tác) chương trình đăng nhập lại một lần rồi chạy lại lệnh.
+    """
+
+    def __init__(self, cache_dir: str = "temp", ttl: float = DEFAULT_CACHE_TTL, interactive: bool = True):
+        self.cache_path = os.path.join(cache_dir, CACHE_FILE)
+        self.ttl = ttl
+        self.interactive = interactive
+        self.account: Optional[str] = None
+        self.token: Optional[str] = None
+        self._signin_failed = False
+        self._lock = threading.Lock()
+
+    def use_token(self, account: str, token: str) -> None:
+        """Dùng token phiên của tài khoản `account` (shorthand) cho các lệnh op sau"""
+        self.account = account
+        self.token = token
+
+    def credentials(self) -> Optional[Tuple[str, str]]:
+        """(shorthand, token) của phiên hiện tại để chuyển cho tiến trình shard, None nếu không có"""
+        return (self.account, self.token) if self.token else None
+
+    def environment(self, token: Optional[str] = None) -> Optional[Dict[str, str]]:
+        """Biến môi trường cho một lệnh op: môi trường hiện tại kèm OP_SESSION_<shorthand>,
+        None (dùng nguyên môi trường hiện tại) nếu không có token phiên"""
+        token = token if token is not None else self.token
+        if not token or not self.account:
+            return None
+        return {**os.environ, SESSION_ENV_PREFIX + self.account: token}
+
+    @staticmethod
+    def is_auth_error(stderr: Optional[str]) -> bool:
+        message = (stderr or "").lower()
+        return any(pattern in message for pattern in AUTH_ERROR_PATTERNS)
+
+    def signin(self) -> bool:
+        """Chạy `op signin`: lời nhắc nhập mật khẩu hiện trên terminal, shorthand và token lấy từ
+        dòng export op in ra stdout.
+
+        Khi dùng tích hợp với ứng dụng 1Password, op không trả token; các lệnh sau vẫn chạy
+        bình thường thông qua ứng dụng.
+        """
+        result = subprocess.run(["op", "signin"], stdout=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            self._signin_failed = True
+            return False
+        found = SIGNIN_EXPORT.search(result.stdout or "")
+        if found:
+            self.use_token(*found.groups())
+        self._signin_failed = False
+        return True
+
+    def refresh(self, stale_token: Optional[str]) -> bool:
+        """Đăng nhập lại sau lỗi xác thực; trả về True nếu nên chạy lại lệnh.
+
+        Nhiều lệnh cùng gặp lỗi thì chỉ một lệnh đăng nhập lại, các lệnh khác dùng token mới.
+        """
+        with self._lock:
+            if self.token != stale_token:
+                return True
+            if not self.interactive or self._signin_failed:
+                return False
+            print("\n🔑 Phiên đăng nhập 1Password đã hết hạn, đang đăng nhập lại...")
+            return self.signin()
+
+    def cached(self, key: str) -> Optional[Any]:
+        """Giá trị đã cache nếu còn trong thời hạn ttl"""
+        if self.ttl <= 0:
+            return None
+        entry = self._load_cache().get(key)
+        if not entry or time.time() - entry.get("at", 0) > self.ttl:
+            return None
+        return entry.get("value")
+
+    def cache_age(self, key: str) -> Optional[float]:
+        entry = self._load_cache().get(key)
+        return time.time() - entry["at"] if entry else None
+
+    def store(self, key: str, value: Any) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            cache = self._load_cache()
+            cache[key] = {"at": time.time(), "value": value}
+            self._write_cache(cache)
+
+    def invalidate(self) -> None:
+        """Xóa cache, ví dụ khi op báo chưa đăng nhập"""
+        with self._lock:
+            if os.path.exists(self.cache_path):
+                os.remove(self.cache_path)
+
+    def _load_cache(self) -> Dict:
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            return cache if isinstance(cache, dict) else {}
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _write_cache(self, cache: Dict) -> None:
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+_current = OpSession()
+
+def get_op_session() -> OpSession:
+    """Phiên op của lần chạy hiện tại"""
+    return _current
+
+def configure_op_session(ttl: float = DEFAULT_CACHE_TTL, interactive: bool = True,
+                         cache_dir: str = "temp") -> OpSession:
+    """Thiết lập phiên op cho lần chạy (thời hạn cache, có được hỏi đăng nhập hay không)"""
+    global _current
+    _current = OpSession(cache_dir, ttl, interactive)
+    return _current
@@ -0,0 +1,233 @@
+import csv
+import itertools
+import os
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from schema import AccountSchema, Record
+from metrics import get_metrics
+
+# Số dòng được kiểm tra cùng lúc theo cột; giới hạn bộ nhớ khi file rất lớn
+PREFLIGHT_BLOCK = 50_000
+
+# Khối đầu tiên nhỏ để các lệnh op đầu tiên bắt đầu ngay, các khối sau lớn gấp đôi đến PREFLIGHT_BLOCK
+PREFLIGHT_FIRST_BLOCK = 512
+
+# Các cột của báo cáo lỗi, mỗi lỗi của một trường là một dòng
+REPORT_COLUMNS = ['row', 'title', 'field', 'value', 'error']
+
+# Ngoài khoảng trắng thông thường, bỏ cả các ký tự vô hình hay dính theo khi copy từ web/Excel
+TRIM_CHARS = " \t\n\r\x0b\x0c\u00a0\u200b\u2060\ufeff"
+
+# Loại trường có giá trị bí mật: không ghi giá trị vào báo cáo
+SECRET_FIELD_TYPES = {"password", "concealed", "credit-card-cvv", "otp"}
+
+EMAIL_PATTERN = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s.]+")
+
+# Ngày hết hạn của thẻ: MM/YY, MM/YYYY (dấu / - hoặc .), YYYY-MM hoặc MMYY
+EXPIRY_PATTERNS = (
+    (re.compile(r"(\d{1,2})\s*[/.-]\s*(\d{4}|\d{2})"), False),
+    (re.compile(r"(\d{4})\s*[/.-]\s*(\d{1,2})"), True),
+    (re.compile(r"(\d{2})(\d{2})"), False),
+)
+
+# Chữ số của 2*d sau khi cộng các chữ số (bước nhân đôi của thuật toán Luhn)
+LUHN_DOUBLED = str.maketrans("0123456789", "0246813579")
+
+def normalize_card_number(value: str) -> str:
+    return value.replace(" ", "").replace("-", "")
+
+def is_valid_card_number(value: str) -> bool:
+    """Số thẻ 12-19 chữ số, đúng checksum Luhn"""
+    if not (value.isdigit() and value.isascii() and 12 <= len(value) <= 19):
+        return False
+    checksum = sum(map(int, value[-1::-2])) + sum(map(int, value[-2::-2].translate(LUHN_DOUBLED)))
+    return checksum % 10 == 0
+
+def normalize_expiry(value: str) -> str:
+    """Chuẩn hóa ngày hết hạn về MM/YYYY; giá trị không đọc được thì giữ nguyên"""
+    for pattern, year_first in EXPIRY_PATTERNS:
+        match = pattern.fullmatch(value)
+        if match:
+            month, year = match.group(2, 1) if year_first else match.group(1, 2)
+            if 1 <= int(month) <= 12:
+                return f"{int(month):02d}/{2000 + int(year) if len(year) == 2 else year}"
+    return value
+
+def is_valid_expiry(value: str) -> bool:
+    return len(value) == 7 and value[2] == "/" and value[:2].isdigit() and value[3:].isdigit()
+
+def is_valid_email(value: str) -> bool:
+    return EMAIL_PATTERN.fullmatch(value) is not None
+
+# Theo loại trường: (chuẩn hóa, kiểm tra, thông điệp lỗi); giá trị trống không bị kiểm tra
+FIELD_CHECKS: Dict[str, Tuple[Optional[Callable[[str], str]], Callable[[str], bool], str]] = {
+    "email": (None, is_valid_email, "Email không hợp lệ"),
+    "credit-card-number": (normalize_card_number, is_valid_card_number,
+                           "Số thẻ không hợp lệ (cần 12-19 chữ số, đúng checksum Luhn)"),
+    "credit-card-expiry": (normalize_expiry, is_valid_expiry, "Ngày hết hạn không hợp lệ (cần MM/YYYY)"),
+}
+
+def mask_value(field_type: str, value: str) -> str:
+    """Giá trị ghi vào báo cáo: ẩn trường bí mật, số thẻ chỉ giữ 4 số cuối"""
+    if not value:
+        return ""
+    if field_type in SECRET_FIELD_TYPES:
+        return "***"
+    if field_type == "credit-card-number":
+        return f"****{value[-4:]}" if len(value) > 4 else "****"
+    return value
+
+class Preflight:
+    """Kiểm tra và chuẩn hóa dữ liệu của một file theo cột, trước khi gọi lệnh op cho các dòng đó.
+
+    Mỗi khối dòng được chuyển thành các cột; mỗi cột được làm sạch (bỏ khoảng trắng và ký tự vô
+    hình), chuẩn hóa và kiểm tra theo loại trường (trường bắt buộc, email, số thẻ theo Luhn, ngày
+    hết hạn) trong một lượt, rồi loại các dòng trùng khóa trong file (cùng loại tài khoản và trường
+    tiêu đề, giống khóa của --sync). Khối đầu chỉ PREFLIGHT_FIRST_BLOCK dòng để import bắt đầu
+    ngay, các khối sau lớn dần đến PREFLIGHT_BLOCK. Dòng lỗi được ghi vào báo cáo CSV, chỉ các
+    dòng sạch được đưa sang bước import.
+    """
+
+    def __init__(self, schema: AccountSchema, report_path: Optional[str] = None, dedupe: bool = True,
+                 seen: Optional[Dict[object, int]] = None):
+        self.schema = schema
+        self.report_path = report_path
+        self.dedupe = dedupe
+        self.checked = 0
+        self.rejected = 0
+        self.errors = 0
+        # Khóa đã gặp và số dòng đầu tiên có khóa đó; `seen` là khóa của các dòng nằm trước
+        # phần file đang kiểm tra (ví dụ của các shard trước, xem iter_keys)
+        self._seen: Dict[object, int] = dict(seen or {})
+        self._report = None
+        self._writer = None
+
+    def check(self, records: List[Record], rows: Optional[Sequence[int]] = None
+              ) -> Tuple[List[Record], List[Tuple[int, str, str, str, str]]]:
+        """Kiểm tra một khối dòng; rows là số thứ tự của từng dòng trong file (mặc định 1..n).
+
+        Trả về (các Record đã chuẩn hóa của dòng hợp lệ, lỗi [(dòng, tiêu đề, trường, giá trị, lỗi)]).
+        """
+        if not records:
+            return [], []
+        schema = self.schema
+        if rows is None:
+            rows = range(1, len(records) + 1)
+        columns, problems = self._validate(records)
+
+        if self.dedupe:
+            seen = self._seen
+            for pos, key in enumerate(self._keys(columns)):
+                if key is None or pos in problems:
+                    continue
+                first = seen.setdefault(key, rows[pos])
+                if first != rows[pos]:
+                    problems[pos] = [(schema.title_field if schema.title_index is not None else "",
+                                      "", f"Trùng với dòng {first}")]
+
+        values = zip(*columns)
+        if problems:
+            values = (value for pos, value in enumerate(values) if pos not in problems)
+        clean = list(map(schema.record_type, values))
+
+        errors = []
+        title_index = schema.title_index
+        for pos in sorted(problems):
+            title = columns[title_index][pos] if title_index is not None else ""
+            for field_name, value, message in problems[pos]:
+                errors.append((rows[pos], title, field_name, value, message))
+        self.checked += len(records)
+        self.rejected += len(problems)
+        self.errors += len(errors)
+        return clean, errors
+
+    def _validate(self, records: Sequence[Record]) -> Tuple[List[List[str]], Dict[int, List[Tuple[str, str, str]]]]:
+        """Làm sạch, chuẩn hóa từng cột và tìm lỗi theo loại trường; trả về (các cột, lỗi theo vị trí dòng)"""
+        columns = [[value.strip(TRIM_CHARS) for value in column] for column in zip(*records)]
+        problems: Dict[int, List[Tuple[str, str, str]]] = {}
+
+        for idx, field in enumerate(self.schema.fields):
+            column = columns[idx]
+            if field.required:
+                for pos in [pos for pos, value in enumerate(column) if not value]:
+                    problems.setdefault(pos, []).append((field.name, "", "Thiếu trường bắt buộc"))
+            field_check = FIELD_CHECKS.get(field.type)
+            if field_check is None:
+                continue
+            normalize, is_valid, message = field_check
+            if normalize is not None:
+                column = columns[idx] = [normalize(value) if value else value for value in column]
+            for pos in [pos for pos, value in enumerate(column) if value and not is_valid(value)]:
+                problems.setdefault(pos, []).append((field.name, mask_value(field.type, column[pos]), message))
+        return columns, problems
+
+    def _keys(self, columns: List[List[str]]) -> Iterator[Optional[object]]:
+        """Khóa so trùng của từng dòng (None nếu không so), giống record_key của --sync: trường tiêu
+        đề không phân biệt hoa thường"""
+        title_index = self.schema.title_index
+        if title_index is None:
+            yield from zip(*columns)
+            return
+        for key in columns[title_index]:
+            yield key.lower() if key else None
+
+    def iter_keys(self, numbered: Iterable[Tuple[int, Record]]) -> Iterator[Tuple[int, object]]:
+        """(số dòng, khóa so trùng) của các dòng hợp lệ, theo khối như iter_clean; không ghi báo cáo.
+
+        Dùng để biết các khóa đã có ở phần file phía trước (xem tham số `seen`).
+        """
+        numbered = iter(numbered)
+        while True:
+            block = list(itertools.islice(numbered, PREFLIGHT_BLOCK))
+            if not block:
+                return
+            rows, records = zip(*block)
+            columns, problems = self._validate(records)
+            for pos, key in enumerate(self._keys(columns)):
+                if key is not None and pos not in problems:
+                    yield rows[pos], key
+
+    def iter_clean(self, numbered: Iterable[Tuple[int, Record]]) -> Iterator[Tuple[int, Record]]:
+        """Kiểm tra các cặp (số dòng, Record) theo từng khối, trả về các dòng hợp lệ theo đúng thứ tự
+        kèm số dòng gốc và ghi lỗi vào báo cáo"""
+        metrics = get_metrics()
+        numbered = iter(numbered)
+        size = PREFLIGHT_FIRST_BLOCK
+        while True:
+            block = list(itertools.islice(numbered, size))
+            if not block:
+                return
+            size = min(size * 2, PREFLIGHT_BLOCK)
+            rows, records = zip(*block)
+            with metrics.phase('preflight'):
+                clean, errors = self.check(records, rows)
+                self.write_report(errors)
+            if errors:
+                rejected = {error[0] for error in errors}
+                rows = [row for row in rows if row not in rejected]
+            yield from zip(rows, clean)
+
+    def write_report(self, errors: List[Tuple]) -> None:
+        if not errors or not self.report_path:
+            return
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.report_path) or ".", exist_ok=True)
+            self._report = open(self.report_path, 'w', newline='', encoding='utf-8-sig')
+            self._writer = csv.writer(self._report)
+            self._writer.writerow(REPORT_COLUMNS)
+        self._writer.writerows(errors)
+
+    def close(self) -> None:
+        """Đóng báo cáo; xóa báo cáo cũ của file nếu lần này không còn lỗi"""
+        if self._report is not None:
+            self._report.close()
+            self._report = self._writer = None
+        elif self.report_path and os.path.exists(self.report_path):
+            os.remove(self.report_path)
+
+    def __enter__(self) -> "Preflight":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
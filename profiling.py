@@ -0,0 +1,181 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+from metrics import get_metrics
+
+# Các hàm cần tách riêng trong báo cáo: (nhãn, file, tên hàm)
+PROFILE_TARGETS = [
+    ("parse_line", "account_import.py", "parse_line"),
+    ("parse_line", "schema.py", "parse_line"),
+    ("read_data / iter_data", "file_handlers.py", "read_data"),
+    ("read_data / iter_data", "file_handlers.py", "iter_data"),
+    ("add_to_1password", "account_import.py", "add_to_1password"),
+    ("add_to_1password", "account_import.py", "add_to_1password_async"),
+    ("run_op_command", "op_cli.py", "run_op_command_async"),
+    ("Connect request", "connect_client.py", "request"),
+    ("ghi kết quả (ResultSink)", "file_handlers.py", "add"),
+    ("ghi kết quả (ResultSink)", "file_handlers.py", "flush"),
+    ("ghi kết quả (ResultSink)", "file_handlers.py", "close_results"),
+]
+
+# Số dòng hiển thị trong các bảng top
+PROFILE_TOP = 25
+
+# Từ Python 3.12 cProfile dùng sys.monitoring: chỉ một profiler được bật và nó ghi nhận mọi luồng
+_PER_THREAD = sys.version_info < (3, 12)
+
+class RunProfiler:
+    """Profile CPU (cProfile) và bộ nhớ (tracemalloc) cho cả một lần chạy.
+
+    Mỗi luồng (luồng đọc file, các worker) có một profiler riêng đo bằng thời gian CPU của
+    luồng đó, nên thời gian chờ tiến trình `op` không bị tính vào các hàm Python; thời gian
+    chờ `op` được lấy riêng từ metric op_wait. Khi dừng, các profiler được gộp lại, ghi ra
+    file .pstats (mở bằng pstats hoặc snakeviz) và một báo cáo dạng text.
+    """
+
+    def __init__(self, output_dir: str = "output", memory: bool = True, top: int = PROFILE_TOP):
+        self.output_dir = output_dir
+        self.memory = memory
+        self.top = top
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._started = 0.0
+        self._elapsed = 0.0
+        self._snapshot = None
+        self._traced_peak = 0
+
+    def start(self) -> None:
+        if self.memory:
+            tracemalloc.start()
+        self._started = time.perf_counter()
+        self._new_profile().enable()
+        if _PER_THREAD:
+            threading.setprofile(self._start_thread)
+
+    def stop(self) -> None:
+        if _PER_THREAD:
+            threading.setprofile(None)
+        with self._lock:
+            profiles = list(self._profiles)
+        # Profiler của các luồng khác vẫn đang bật nếu luồng chưa kết thúc; create_stats sẽ dừng chúng
+        profiles[0].disable()
+        self._elapsed = time.perf_counter() - self._started
+        if self.memory:
+            self._snapshot = tracemalloc.take_snapshot()
+            self._traced_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def _new_profile(self) -> cProfile.Profile:
+        profile = cProfile.Profile(time.thread_time) if _PER_THREAD else cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        return profile
+
+    def _start_thread(self, frame, event, arg) -> None:
+        """Được gọi ở sự kiện đầu tiên của mỗi luồng mới: bật profiler riêng cho luồng đó"""
+        sys.setprofile(None)
+        self._new_profile().enable()
+
+    def stats(self) -> pstats.Stats:
+        """Gộp kết quả của mọi luồng"""
+        stats = None
+        for profile in self._profiles:
+            profile.create_stats()
+            if not profile.stats:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        return stats
+
+    def write(self) -> Tuple[str, str]:
+        """Ghi file .pstats và báo cáo text, trả về hai đường dẫn"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"profile_{time.strftime('%Y%m%d_%H%M%S')}")
+        stats = self.stats()
+        stats.dump_stats(base + ".pstats")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(self.report(stats))
+        return base + ".pstats", base + ".txt"
+
+    def report(self, stats: pstats.Stats) -> str:
+        lines = []
+        timer = "thời gian CPU của từng luồng" if _PER_THREAD else "thời gian thực (gồm cả thời gian chờ)"
+        cpu_total = stats.total_tt
+        phases = get_metrics().phases
+        op_wait = phases.get("op_wait", [0.0, 0])
+        op_spawn = phases.get("op_spawn", [0.0, 0])
+
+        lines.append("=== Tổng quan ===")
+        lines.append(f"{'Thời gian chạy':<34} {self._elapsed:10.3f} s")
+        lines.append(f"{'Python (cProfile)':<34} {cpu_total:10.3f} s  ({timer})")
+        lines.append(f"{'Chờ op, cộng dồn (' + str(op_wait[1]) + ' lệnh)':<34} {op_wait[0]:10.3f} s")
+        lines.append(f"{'Khởi tạo tiến trình op':<34} {op_spawn[0]:10.3f} s")
+        connect_wait = phases.get("connect_wait")
+        if connect_wait:
+            lines.append(f"{'Chờ Connect, cộng dồn (' + str(connect_wait[1]) + ' request)':<34} {connect_wait[0]:10.3f} s")
+        lines.append("")
+
+        lines.append("=== Theo giai đoạn ===")
+        lines.append(f"{'Hàm':<28} {'Số lần gọi':>12} {'Riêng (s)':>12} {'Cộng dồn (s)':>14}")
+        for label, (calls, own, cumulative) in self._breakdown(stats).items():
+            lines.append(f"{label:<28} {calls:>12} {own:>12.3f} {cumulative:>14.3f}")
+        lines.append("(Cộng dồn của các hàm gọi op không gồm thời gian chờ op khi đo theo thời gian CPU;")
+        lines.append(" với generator và coroutine, mỗi lần chạy tiếp được tính là một lần gọi)")
+        lines.append("")
+
+        lines.append(f"=== Top {self.top} hàm theo thời gian riêng ===")
+        buffer = io.StringIO()
+        stream, stats.stream = stats.stream, buffer
+        stats.sort_stats("tottime").print_stats(self.top)
+        stats.stream = stream
+        lines.append(buffer.getvalue().strip())
+        lines.append("")
+
+        if self._snapshot is not None:
+            lines.append(f"=== Bộ nhớ (tracemalloc), đỉnh: {self._traced_peak / 1024 / 1024:.1f} MB ===")
+            lines.append(f"Top {self.top} vị trí cấp phát còn giữ khi kết thúc:")
+            for stat in self._snapshot.statistics("lineno")[:self.top]:
+                lines.append(f"  {stat}")
+            lines.append("")
+        return "\n".join(lines) + "\n"
+
+    def _breakdown(self, stats: pstats.Stats) -> Dict[str, Tuple[int, float, float]]:
+        """Gộp số liệu của các hàm trong PROFILE_TARGETS theo nhãn"""
+        totals: Dict[str, List] = {}
+        for label, filename, function in PROFILE_TARGETS:
+            totals.setdefault(label, [0, 0.0, 0.0])
+        for (path, _, function), (_, calls, own, cumulative, _) in stats.stats.items():
+            for label, filename, target in PROFILE_TARGETS:
+                if function == target and os.path.basename(path) == filename:
+                    entry = totals[label]
+                    entry[0] += calls
+                    entry[1] += own
+                    entry[2] += cumulative
+        return {label: tuple(values) for label, values in totals.items()}
+
+def start_profiler(output_dir: str = "output") -> RunProfiler:
+    """Bật profiler cho cả lần chạy"""
+    profiler = RunProfiler(output_dir)
+    profiler.start()
+    print("🔬 Đang bật chế độ profile (cProfile + tracemalloc), chương trình sẽ chạy chậm hơn")
+    return profiler
+
+def finish_profiler(profiler: RunProfiler) -> None:
+    """Dừng profiler và ghi kết quả"""
+    profiler.stop()
+    try:
+        stats_file, report_file = profiler.write()
+    except OSError as e:
+        print(f"⚠️ Không ghi được kết quả profile: {str(e)}")
+        return
+    print(f"\n🔬 Đã ghi profile: {stats_file}")
+    print(f"🔬 Báo cáo theo hàm: {report_file}")
@@ -0,0 +1,264 @@
+import json
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Trường dùng làm tiêu đề item theo category, mặc định là username
+TITLE_FIELDS = {
+    "credit-card": "cardholder_name",
+    "bank-account": "account_name",
+    "identity": "full_name",
+}
+
+# Các loại trường đặc biệt khi truyền qua tham số dòng lệnh của op item create
+ARGV_BUILTIN_FIELDS = {
+    "otp": "totp",
+    "credit-card-number": "cardNumber",
+    "credit-card-type": "cardType",
+    "credit-card-expiry": "expiry",
+    "credit-card-cvv": "cvv",
+}
+
+# Ánh xạ category và loại trường sang định dạng JSON template của 1Password
+TEMPLATE_CATEGORIES = {
+    "login": "LOGIN",
+    "password": "PASSWORD",
+    "credit-card": "CREDIT_CARD",
+    "bank-account": "BANK_ACCOUNT",
+    "identity": "IDENTITY",
+    "secure-note": "SECURE_NOTE",
+    "software-license": "SOFTWARE_LICENSE",
+    "ssh-key": "SSH_KEY",
+    "database": "DATABASE",
+    "api-credential": "API_CREDENTIAL",
+    "wifi": "WIRELESS_ROUTER",
+}
+TEMPLATE_FIELD_TYPES = {
+    "password": "CONCEALED",
+    "concealed": "CONCEALED",
+    "otp": "OTP",
+    "url": "URL",
+    "email": "EMAIL",
+    "phone": "PHONE",
+    "date": "DATE",
+    "menu": "MENU",
+}
+# Các trường có sẵn của 1Password: (id, purpose, type)
+TEMPLATE_BUILTIN_FIELDS = {
+    "credit-card-number": ("ccnum", None, "CREDIT_CARD_NUMBER"),
+    "credit-card-type": ("type", None, "CREDIT_CARD_TYPE"),
+    "credit-card-expiry": ("expiry", None, "MONTH_YEAR"),
+    "credit-card-cvv": ("cvv", None, "CONCEALED"),
+}
+TEMPLATE_LOGIN_FIELDS = {
+    "username": ("username", "USERNAME", "STRING"),
+    "password": ("password", "PASSWORD", "CONCEALED"),
+}
+
+def custom_field_config(field_name: str) -> Dict:
+    """Cấu hình custom field cho cột có trong file nhưng chưa khai báo trong account_types.yaml"""
+    return {
+        "name": field_name,
+        "type": "text",  # Mặc định là text
+        "required": False,
+        "custom": True  # Đánh dấu là custom field
+    }
+
+def _escape_argv(value: str) -> str:
+    return value.replace('"', '\\"').replace('$', '\\$').replace('`', '\\`')
+
+class Record(tuple):
+    """Một dòng dữ liệu: tuple các giá trị theo thứ tự trường của schema.
+
+    Mỗi AccountSchema có một lớp con riêng gắn sẵn `schema`, nên mỗi dòng chỉ tốn một tuple
+    thay vì một dict. Vẫn đọc theo tên được như dict: record["username"], record.get("otp").
+    """
+
+    __slots__ = ()
+    schema: "AccountSchema"
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self.schema.field_index[key])
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, name) -> bool:
+        return name in self.schema.field_index
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        idx = self.schema.field_index.get(name)
+        return default if idx is None else tuple.__getitem__(self, idx)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.schema.field_names
+
+    def as_dict(self) -> Dict[str, str]:
+        return dict(zip(self.schema.field_names, self))
+
+    def __repr__(self) -> str:
+        return repr(self.as_dict())
+
+class FieldSpec:
+    """Một trường đã biên dịch: cấu hình gốc cùng tiền tố assignment và khung JSON của op"""
+
+    __slots__ = ("name", "type", "required", "custom", "argv_prefix", "template_spec")
+
+    def __init__(self, config: Dict, category: str):
+        self.name = config["name"]
+        self.type = config.get("type", "text")
+        self.required = bool(config.get("required", False))
+        self.custom = bool(config.get("custom", False))
+
+        builtin = ARGV_BUILTIN_FIELDS.get(self.type)
+        self.argv_prefix = f"{builtin}=" if builtin else f"{self.name}[{self.type}]="
+
+        field_id, purpose, field_type = TEMPLATE_BUILTIN_FIELDS.get(
+            self.type, (self.name, None, TEMPLATE_FIELD_TYPES.get(self.type, "STRING"))
+        )
+        if category == "login" and self.name in TEMPLATE_LOGIN_FIELDS:
+            field_id, purpose, field_type = TEMPLATE_LOGIN_FIELDS[self.name]
+        self.template_spec = {"id": field_id, "type": field_type, "label": self.name}
+        if purpose:
+            self.template_spec["purpose"] = purpose
+
+class AccountSchema:
+    """Một loại tài khoản trong account_types.yaml, được biên dịch một lần khi nạp cấu hình.
+
+    Giữ sẵn vị trí của từng trường, danh sách trường bắt buộc, trường tiêu đề, ánh xạ cột
+    của `format` và cách chuyển từng trường sang tham số op, để mỗi dòng dữ liệu chỉ còn
+    là một tuple (Record) và không phải duyệt lại cấu hình.
+    """
+
+    __slots__ = ("name", "config", "category", "title_prefix", "url", "delimiter", "format_fields",
+                 "fields", "field_names", "field_index", "required", "title_field", "title_index",
+                 "format_map", "record_type", "_template")
+
+    def __init__(self, name: str, config: Dict, extra_fields: Sequence[Dict] = ()):
+        if not isinstance(config, dict) or not config.get("fields"):
+            raise ValueError(f"Loại tài khoản {name}: thiếu danh sách fields")
+        if "title_prefix" not in config:
+            raise ValueError(f"Loại tài khoản {name}: thiếu title_prefix")
+
+        self.name = name
+        self.config = config
+        self.category = config.get("category", "login")
+        self.title_prefix = config["title_prefix"]
+        self.url = config.get("url")
+        self.delimiter = config.get("delimiter", "|")
+        self.format_fields = tuple(config["format"].split(self.delimiter)) if config.get("format") else ()
+
+        self.fields = tuple(FieldSpec(field, self.category) for field in list(config["fields"]) + list(extra_fields))
+        self.field_names = tuple(field.name for field in self.fields)
+        self.field_index: Dict[str, int] = {}
+        for idx, field_name in enumerate(self.field_names):
+            self.field_index.setdefault(field_name, idx)
+        self.required = tuple(idx for idx, field in enumerate(self.fields) if field.required)
+        self.title_field = TITLE_FIELDS.get(self.category, "username")
+        self.title_index = self.field_index.get(self.title_field)
+
+        # (vị trí trong dòng text, vị trí trong Record) của các cột format đã khai báo trong fields
+        self.format_map = tuple(
+            (pos, self.field_index[field_name])
+            for pos, field_name in enumerate(self.format_fields)
+            if field_name in self.field_index
+        )
+        self.record_type = type(f"{name}Record", (Record,), {"__slots__": (), "schema": self})
+        self._template = None
+
+    def __repr__(self) -> str:
+        return f"AccountSchema({self.name!r})"
+
+    def with_columns(self, columns: Iterable[str]) -> "AccountSchema":
+        """Schema cho một file cụ thể: thêm custom field cho các cột chưa được khai báo"""
+        extra_fields = []
+        seen = set(self.field_index)
+        for column in columns:
+            column = str(column)
+            if column not in seen:
+                seen.add(column)
+                extra_fields.append(custom_field_config(column))
+        if not extra_fields:
+            return self
+        return AccountSchema(self.name, self.config,
+                             [{"name": f.name, "type": f.type, "required": f.required, "custom": True}
+                              for f in self.fields if f.custom] + extra_fields)
+
+    def make_record(self, values: Iterable[str]) -> Record:
+        """Tạo Record từ các giá trị theo đúng thứ tự fields"""
+        return self.record_type(values)
+
+    def missing_required(self, values: Sequence[str]) -> List[str]:
+        """Tên các trường bắt buộc đang trống"""
+        return [self.field_names[idx] for idx in self.required if not values[idx]]
+
+    def parse_line(self, line: str) -> Tuple[Optional[Record], Optional[str]]:
+        """Parse một dòng text theo `format`, trả về (Record, lỗi)"""
+        if not self.format_fields:
+            return None, "Không tìm thấy định dạng trong cấu hình"
+
+        parts = line.strip().split(self.delimiter)
+        if len(parts) < len(self.format_fields):
+            return None, f"Thiếu dữ liệu. Cần {len(self.format_fields)} trường, chỉ có {len(parts)} trường"
+
+        values = [""] * len(self.fields)
+        for pos, idx in self.format_map:
+            values[idx] = parts[pos].strip()
+
+        missing_fields = self.missing_required(values)
+        if missing_fields:
+            return None, f"Thiếu các trường: {', '.join(missing_fields)}"
+        return self.record_type(values), None
+
+    def title_value(self, record: Record) -> str:
+        """Giá trị của trường tiêu đề"""
+        if self.title_index is None:
+            return "Unknown"
+        return tuple.__getitem__(record, self.title_index)
+
+    def item_title(self, record: Record) -> str:
+        """Tiêu đề đầy đủ của item trong 1Password (title_prefix + trường tiêu đề)"""
+        return f"{self.title_prefix} {self.title_value(record)}"
+
+    def argv_assignments(self, record: Record) -> List[str]:
+        """Các tham số assignment (`field[type]=value`) của op item create cho một dòng"""
+        return [
+            field.argv_prefix + _escape_argv(value)
+            for field, value in zip(self.fields, record)
+            if value  # Only add if field has value
+        ]
+
+    @property
+    def template(self) -> Dict:
+        """Khung JSON template, dựng một lần và dùng chung cho mọi dòng"""
+        if self._template is None:
+            self._template = {
+                "category": TEMPLATE_CATEGORIES.get(self.category, self.category.upper().replace("-", "_")),
+                "urls": [{"href": self.url, "primary": True}] if self.url else [],
+            }
+        return self._template
+
+    def render_template(self, record: Record, notes: str = "") -> str:
+        """Điền dữ liệu một dòng vào khung template, trả về JSON cho op item create"""
+        return json.dumps(self.item_payload(record, notes), ensure_ascii=False)
+
+    def item_payload(self, record: Record, notes: str = "") -> Dict:
+        """Item của một dòng theo định dạng JSON của 1Password (dùng cho op template và Connect API)"""
+        template = self.template
+        fields = [
+            dict(field.template_spec, value=value)
+            for field, value in zip(self.fields, record)
+            if value  # Only add if field has value
+        ]
+        if notes:
+            fields.append({"id": "notesPlain", "type": "STRING", "purpose": "NOTES", "label": "notesPlain", "value": notes})
+
+        item = {
+            "title": self.item_title(record),
+            "category": template["category"],
+            "fields": fields,
+        }
+        if template["urls"]:
+            item["urls"] = template["urls"]
+        return item
+
+def compile_account_types(account_types: Dict) -> Dict[str, AccountSchema]:
+    """Biên dịch toàn bộ cấu hình account_types.yaml thành các AccountSchema"""
+    return {name: AccountSchema(name, config) for name, config in account_types.items()}
@@ -0,0 +1,228 @@
+import bisect
+import csv
+import itertools
+import json
+import os
+import shutil
+import signal
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backends import configure_backend
+from checkpoint import CheckpointJournal
+from file_handlers import RESULT_COLUMNS, FileReadError, count_lines, get_file_handler
+from metrics import reset_metrics
+from op_session import configure_op_session
+from preflight import Preflight
+from schema import AccountSchema
+from vault_index import VaultIndex
+
+# Thư mục chứa kế hoạch chia shard, checkpoint và kết quả tạm của từng shard
+SHARD_DIR = os.path.join("temp", "shards")
+
+# Mỗi shard nhận ít nhất chừng này byte; file nhỏ hơn được chia thành ít shard hơn
+MIN_SHARD_BYTES = 64 * 1024
+
+# Định dạng file chia được theo khoảng byte
+SHARDABLE_EXTENSIONS = ('.txt', '.csv')
+
+# Kích thước mỗi lần đọc khi đếm dấu nháy để tìm ranh giới shard trong file CSV
+SCAN_CHUNK_SIZE = 1024 * 1024
+
+def shard_dir(filename: str) -> str:
+    """Thư mục tạm của các shard thuộc một file input"""
+    return os.path.join(SHARD_DIR, os.path.splitext(os.path.basename(filename))[0])
+
+def is_shardable(filename: str) -> bool:
+    return filename.lower().endswith(SHARDABLE_EXTENSIONS)
+
+def has_shard_plan(filename: str) -> bool:
+    """File đã được chia shard ở lần chạy trước và chưa gộp xong"""
+    return os.path.exists(os.path.join(shard_dir(filename), "plan.json"))
+
+def plan_byte_ranges(filename: str, shards: int, skip_header: bool = False,
+                     quoted: bool = False) -> List[Tuple[int, int]]:
+    """Chia file thành tối đa `shards` khoảng byte [start, end), mỗi khoảng bắt đầu ở đầu một dòng.
+
+    Với CSV (`quoted`), ranh giới chỉ đặt ở dòng mới nằm ngoài dấu nháy, để ô có xuống dòng
+    không bị cắt đôi; số dấu nháy được đếm theo khối nên không cần parse cả file.
+    Nếu `skip_header`, dòng tiêu đề không thuộc shard nào.
+    """
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as f:
+        start = _next_record_start(f, 0, 0, quoted)[0] if skip_header else 0
+        shards = max(1, min(int(shards), (size - start) // MIN_SHARD_BYTES or 1))
+        step = (size - start) / shards
+
+        boundaries = [start]
+        position, quotes = start, 0
+        for k in range(1, shards):
+            target = int(start + step * k)
+            if target <= boundaries[-1]:
+                continue
+            if quoted:
+                # Đếm số dấu nháy từ ranh giới trước đến vị trí dự kiến
+                f.seek(position)
+                remaining = target - position
+                while remaining > 0:
+                    chunk = f.read(min(SCAN_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    quotes += chunk.count(b'"')
+                    remaining -= len(chunk)
+                position = target
+            boundary, quotes = _next_record_start(f, target, quotes, quoted)
+            position = boundary
+            if boundary >= size:
+                break
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+                quotes = 0
+    boundaries.append(size)
+    return [(boundaries[idx], boundaries[idx + 1]) for idx in range(len(boundaries) - 1)
+            if boundaries[idx] < boundaries[idx + 1]]
+
+def _next_record_start(f, position: int, quotes: int, quoted: bool) -> Tuple[int, int]:
+    """Vị trí đầu dòng kế tiếp tính từ `position` (nằm ngoài dấu nháy nếu `quoted`)"""
+    f.seek(position)
+    while True:
+        line = f.readline()
+        if not line:
+            return f.tell(), quotes
+        if quoted:
+            quotes += line.count(b'"')
+            if quotes % 2:
+                continue
+        return f.tell(), quotes
+
+def load_shard_plan(filename: str, shards: int) -> List[Tuple[int, int]]:
+    """Đọc kế hoạch chia shard đã lưu (để tiếp tục đúng các shard cũ) hoặc tạo mới.
+
+    Kế hoạch cũ chỉ được dùng lại nếu file input không đổi kích thước và thời gian sửa.
+    """
+    directory = shard_dir(filename)
+    plan_path = os.path.join(directory, "plan.json")
+    stat = os.stat(filename)
+    if os.path.exists(plan_path):
+        with open(plan_path, 'r', encoding='utf-8') as f:
+            plan = json.load(f)
+        if plan.get("size") == stat.st_size and plan.get("mtime") == stat.st_mtime:
+            if len(plan["ranges"]) != shards:
+                print(f"ℹ️ Tiếp tục theo kế hoạch cũ với {len(plan['ranges'])} shard")
+            return [tuple(byte_range) for byte_range in plan["ranges"]]
+        print("⚠️ File input đã thay đổi từ lần chạy trước, chia shard lại từ đầu")
+        shutil.rmtree(directory, ignore_errors=True)
+
+    is_csv = filename.lower().endswith('.csv')
+    ranges = plan_byte_ranges(filename, shards, skip_header=is_csv, quoted=is_csv)
+    os.makedirs(directory, exist_ok=True)
+    with open(plan_path, 'w', encoding='utf-8') as f:
+        json.dump({"file": filename, "size": stat.st_size, "mtime": stat.st_mtime, "ranges": ranges}, f)
+    return ranges
+
+def shard_line_offsets(filename: str, ranges: List[Tuple[int, int]]) -> List[int]:
+    """Số dòng của file nằm trước mỗi khoảng byte (kể cả dòng tiêu đề CSV), để shard đánh số dòng theo cả file"""
+    offsets = [count_lines(filename, (0, ranges[0][0]))]
+    for byte_range in ranges[:-1]:
+        offsets.append(offsets[-1] + count_lines(filename, byte_range))
+    return offsets
+
+def shard_seen_keys(filename: str, account_type: AccountSchema, line_offsets: List[int],
+                    options: Dict) -> List[Dict[object, int]]:
+    """Khóa so trùng mà mỗi shard coi như đã gặp: khóa có ở một shard trước, kèm số dòng đầu tiên.
+
+    Mỗi shard chỉ thấy các dòng của mình, nên tiến trình điều phối đọc lướt cả file một lần trước
+    khi chia để dòng trùng với một dòng ở shard trước cũng bị loại, giống khi chạy một tiến trình.
+    """
+    seen: List[Dict[object, int]] = [{} for _ in line_offsets]
+    handler = get_file_handler(filename, account_type, {**options, 'quiet': True})
+    entries = handler.iter_numbered() if handler else iter(())
+    first_entry = next(entries, None)
+    if first_entry is None:
+        return seen
+    owners: Dict[object, Tuple[int, int]] = {}
+    for row, key in Preflight(handler.account_type).iter_keys(itertools.chain([first_entry], entries)):
+        shard = bisect.bisect_left(line_offsets, row) - 1
+        owner, first = owners.setdefault(key, (shard, row))
+        if owner != shard:
+            seen[shard].setdefault(key, first)
+    return seen
+
+def shard_paths(filename: str, index: int) -> Dict[str, str]:
+    """Các file riêng của một shard: checkpoint, kết quả và tóm tắt"""
+    directory = shard_dir(filename)
+    return {
+        "journal": os.path.join(directory, f"journal.{index}.jsonl"),
+        "result": os.path.join(directory, f"result.{index}.csv"),
+        "summary": os.path.join(directory, f"summary.{index}.json"),
+    }
+
+def run_shard(job: Dict) -> None:
+    """Điểm vào của tiến trình shard: import một khoảng byte của file với checkpoint riêng.
+
+    Kết quả được ghi ra file tóm tắt của shard (số dòng, báo cáo metric) để tiến trình
+    điều phối gộp lại; Ctrl+C dừng shard sau khi lưu checkpoint và kết quả đã có.
+    """
+    # Import trong hàm để tiến trình con (kể cả khi khởi động bằng spawn) không import vòng
+    import account_import
+
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    metrics = reset_metrics()
+    # Dùng token phiên (nếu có) của tiến trình điều phối; shard không tự hỏi đăng nhập
+    session = configure_op_session(job["options"].get('op_cache_ttl', 0), interactive=False)
+    if job.get("op_session"):
+        session.use_token(*job["op_session"])
+    configure_backend(job["options"])
+    paths = shard_paths(job["file"], job["index"])
+    account_types = account_import.load_account_types()
+
+    journal = CheckpointJournal(paths["journal"])
+    journal.load()
+    options = dict(job["options"])
+    options.update({
+        'journal': journal,
+        'byte_range': job["byte_range"],
+        'line_offset': job.get("line_offset", 0),
+        'preflight_seen': job.get("seen_keys"),
+        'shard': {'index': job["index"], 'count': job["count"], 'result': paths["result"]},
+    })
+    if job.get("vault_index"):
+        options['vault_indexes'] = {job["vault_id"]: VaultIndex.load(job["vault_index"])}
+
+    interrupted = False
+    error = None
+    try:
+        account_import.process_file(job["file"], account_types[job["account_type"]], job["vault_id"],
+                                    job["notes"], options)
+    except KeyboardInterrupt:
+        interrupted = True
+    except FileReadError as e:
+        error = str(e)
+    finally:
+        journal.close()
+
+    summary = {"index": job["index"], "interrupted": interrupted, "error": error, "report": metrics.report()}
+    with open(paths["summary"], 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False)
+
+def merge_shard_results(result_files: List[Optional[str]], output_file: str,
+                        on_row: Optional[Callable[[List[str]], None]] = None) -> int:
+    """Gộp file kết quả của các shard theo thứ tự (số dòng trong đó đã là số dòng của cả file)
+
+    on_row được gọi với từng dòng kết quả (theo RESULT_COLUMNS).
+    """
+    written = 0
+    with open(output_file, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.writer(out)
+        writer.writerow(RESULT_COLUMNS)
+        for result_file in result_files:
+            if not result_file or not os.path.exists(result_file):
+                continue
+            with open(result_file, 'r', newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                for row in reader:
+                    writer.writerow(row)
+                    if on_row:
+                        on_row(row)
+                    written += 1
+    return written
@@ -0,0 +1,356 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from checkpoint import DoneRows
+
+# File SQLite lưu trạng thái các lần chạy, nằm trong thư mục temp
+STATE_DB = "import_state.db"
+
+# Số lần chạy đã xong được giữ lại để tra cứu; các lần cũ hơn bị xóa khi một lần chạy kết thúc
+KEEP_RUNS = 30
+
+# Mức an toàn khi ghi (PRAGMA synchronous): full fsync mỗi commit, nên mỗi kết quả đã ghi không mất
+# kể cả khi mất điện; normal chỉ fsync khi checkpoint WAL, nhanh hơn nhưng có thể mất vài kết quả
+# cuối cùng khi hệ điều hành dừng đột ngột (chương trình bị kill vẫn an toàn)
+SYNCHRONOUS_MODES = ("full", "normal")
+DEFAULT_SYNCHRONOUS = "full"
+
+# Trạng thái dòng được coi là đã import xong (không import lại khi tiếp tục)
+DONE_STATUSES = ('success', 'duplicate', 'updated')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL DEFAULT 'running',
+    mode TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    account_type TEXT,
+    vault_id TEXT,
+    notes TEXT,
+    processed INTEGER NOT NULL DEFAULT 0,
+    last_row INTEGER,
+    watermark INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (run_id, path)
+);
+CREATE TABLE IF NOT EXISTS rows (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    row INTEGER NOT NULL,
+    row_key TEXT,
+    status TEXT NOT NULL,
+    item_id TEXT,
+    PRIMARY KEY (file_id, row)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rows_key ON rows (row_key);
+CREATE TABLE IF NOT EXISTS outcomes (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    row INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    item_id TEXT,
+    error TEXT,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outcomes_run_status ON outcomes (run_id, status);
+CREATE INDEX IF NOT EXISTS outcomes_file_row ON outcomes (file_id, row);
+"""
+
+class StateStore(DoneRows):
+    """Trạng thái import lưu trong SQLite (chế độ WAL), thay cho temp_import_state.json và nhật ký JSONL.
+
+    - runs: mỗi lần chạy (running / completed)
+    - files: cấu hình từng file của lần chạy (loại tài khoản, vault, ghi chú) và đã xử lý xong chưa
+    - rows: trạng thái mới nhất của từng dòng, dùng để tiếp tục chính xác khi chạy lại
+    - outcomes: mọi kết quả (kể cả lỗi), dùng để tra cứu, ví dụ các dòng lỗi của lần chạy trước
+
+    Dùng được như nhật ký checkpoint (record, is_done, watermark, done_count) cho lần chạy hiện tại.
+    Mỗi kết quả được commit ngay, mặc định với synchronous=FULL nên mỗi commit được fsync (xem
+    SYNCHRONOUS_MODES). Ghi nhiều dòng cùng lúc (record_many, batch) dùng một transaction.
+    Watermark của từng file được lưu cùng transaction, nên khi tiếp tục chỉ cần đọc các dòng lẻ phía sau.
+    """
+
+    def __init__(self, path: str, synchronous: str = DEFAULT_SYNCHRONOUS):
+        super().__init__()
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self.set_synchronous(synchronous)
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        columns = {name for _, name, *_ in self._conn.execute("PRAGMA table_info(files)")}
+        if "watermark" not in columns:
+            # Kho trạng thái tạo từ phiên bản trước: watermark 0 nghĩa là đọc lại mọi dòng đã xong
+            self._conn.execute("ALTER TABLE files ADD COLUMN watermark INTEGER NOT NULL DEFAULT 0")
+        if "done" not in columns:
+            # Watermark cũ được dời qua từng dòng liên tiếp nên số dòng đã xong đến đó bằng chính nó
+            self._conn.execute("ALTER TABLE files ADD COLUMN done INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE files SET done = watermark")
+        self._lock = threading.RLock()
+        self._in_batch = False
+        self.run_id: Optional[int] = None
+        self._file_ids: Dict[str, int] = {}
+        self._moved: Set[str] = set()  # file có watermark đổi trong transaction hiện tại
+
+    def set_synchronous(self, synchronous: str) -> None:
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"synchronous không hợp lệ: {synchronous}")
+        self._conn.execute(f"PRAGMA synchronous={synchronous.upper()}")
+
+    # Lần chạy
+
+    def open_run(self, mode: str = "interactive") -> Tuple[int, bool]:
+        """Tiếp tục lần chạy chưa xong gần nhất (nếu có) hoặc bắt đầu lần chạy mới.
+
+        Trả về (id lần chạy, có phải tiếp tục không).
+        """
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT id FROM runs WHERE status = 'running' ORDER BY id DESC LIMIT 1").fetchone()
+            if found:
+                self.run_id = found[0]
+                self._load_run()
+                return self.run_id, True
+            cursor = self._conn.execute("INSERT INTO runs (started_at, mode) VALUES (?, ?)", (time.time(), mode))
+            self.run_id = cursor.lastrowid
+            self._file_ids = {}
+            return self.run_id, False
+
+    def finish_run(self, status: str = "completed") -> None:
+        """Đánh dấu lần chạy hiện tại đã xong và xóa các lần chạy cũ vượt quá KEEP_RUNS"""
+        with self._lock:
+            if self.run_id is None:
+                return
+            with self._transaction():
+                self._conn.execute("UPDATE runs SET status = ?, finished_at = ? WHERE id = ?",
+                                   (status, time.time(), self.run_id))
+                self._conn.execute(
+                    "DELETE FROM runs WHERE status != 'running' AND id NOT IN "
+                    "(SELECT id FROM runs WHERE status != 'running' ORDER BY id DESC LIMIT ?)", (KEEP_RUNS,))
+            self.run_id = None
+            self._file_ids = {}
+            self._clear()
+
+    def _load_run(self) -> None:
+        """Đọc id, watermark của các file và các dòng lẻ đã xong phía sau watermark của lần chạy hiện tại"""
+        self._clear()
+        self._file_ids = {}
+        placeholders = ",".join("?" * len(DONE_STATUSES))
+        for path, file_id, watermark, done in self._conn.execute(
+                "SELECT path, id, watermark, done FROM files WHERE run_id = ?", (self.run_id,)).fetchall():
+            self._file_ids[path] = file_id
+            self._set_watermark(path, watermark, done)
+            for row, item_id in self._conn.execute(
+                    f"SELECT row, item_id FROM rows WHERE file_id = ? AND row > ? AND status IN ({placeholders}) "
+                    f"ORDER BY row", (file_id, watermark, *DONE_STATUSES)):
+                self._mark_done(path, row, item_id)
+
+    # Cấu hình file
+
+    def save_file_configs(self, file_configs: List[Dict]) -> None:
+        """Lưu (hoặc cập nhật) cấu hình các file của lần chạy hiện tại"""
+        with self._lock, self._transaction():
+            for position, config in enumerate(file_configs):
+                self._conn.execute(
+                    "INSERT INTO files (run_id, path, position, account_type, vault_id, notes) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (run_id, path) DO UPDATE SET position = excluded.position, "
+                    "account_type = excluded.account_type, vault_id = excluded.vault_id, notes = excluded.notes",
+                    (self.run_id, config['file'], position, config['account_type'], config['vault_id'],
+                     config.get('notes', "")))
+            self._file_ids = dict(self._conn.execute(
+                "SELECT path, id FROM files WHERE run_id = ?", (self.run_id,)).fetchall())
+
+    def file_configs(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {'file': path, 'account_type': account_type, 'vault_id': vault_id, 'notes': notes or ""}
+                for path, account_type, vault_id, notes in self._conn.execute(
+                    "SELECT path, account_type, vault_id, notes FROM files WHERE run_id = ? ORDER BY position",
+                    (self.run_id,))
+            ]
+
+    def processed_files(self) -> Dict[str, int]:
+        """Các file đã xử lý xong -> số dòng đã xử lý"""
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT path, last_row FROM files WHERE run_id = ? AND processed = 1 ORDER BY position",
+                (self.run_id,)).fetchall())
+
+    def mark_file_processed(self, filename: str, last_row: int) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE files SET processed = 1, last_row = ? WHERE id = ?",
+                               (last_row, self._file_id(filename)))
+
+    # Nhật ký từng dòng
+
+    def record(self, filename: str, row: int, success: bool, item_id: Optional[str] = None,
+               status: Optional[str] = None, error: Optional[str] = None, key: Optional[str] = None) -> None:
+        """Ghi kết quả của một dòng (giống CheckpointJournal.record)"""
+        self.record_many(filename, [(row, success, item_id, status, error, key)])
+
+    def record_many(self, filename: str,
+                    entries: Iterable[Tuple[int, bool, Optional[str], Optional[str], Optional[str], Optional[str]]]) -> None:
+        """Ghi nhiều kết quả (row, success, item_id, status, error, key) trong một transaction"""
+        with self._lock:
+            file_id = self._file_id(filename)
+            now = time.time()
+            with self._transaction():
+                for row, success, item_id, status, error, key in entries:
+                    status = status or ('success' if success else 'failed')
+                    self._conn.execute(
+                        "INSERT INTO rows (file_id, row, row_key, status, item_id) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT (file_id, row) DO UPDATE SET row_key = excluded.row_key, "
+                        "status = excluded.status, item_id = excluded.item_id",
+                        (file_id, row, key, status, item_id))
+                    self._conn.execute(
+                        "INSERT INTO outcomes (run_id, file_id, row, status, item_id, error, at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (self.run_id, file_id, row, status, item_id, error, now))
+                    if success:
+                        self._mark_done(filename, row, item_id)
+                        self._moved.add(filename)
+
+    def advance_to(self, filename: str, row: int) -> None:
+        """Dời watermark (xem DoneRows.advance_to), lưu vào file ở transaction ghi kế tiếp"""
+        with self._lock:
+            super().advance_to(filename, row)
+            self._moved.add(filename)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Gộp các lần ghi bên trong vào một transaction"""
+        with self._lock, self._transaction():
+            yield
+
+    def close(self) -> None:
+        """Giữ tương thích với CheckpointJournal; kết nối vẫn mở cho đến khi gọi shutdown()"""
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # Tra cứu
+
+    def runs(self, limit: int = 10) -> List[Dict]:
+        """Các lần chạy gần nhất kèm số dòng theo trạng thái"""
+        with self._lock:
+            runs = [
+                {'id': run_id, 'started_at': started_at, 'finished_at': finished_at, 'status': status,
+                 'mode': mode, 'files': files, 'outcomes': {}}
+                for run_id, started_at, finished_at, status, mode, files in self._conn.execute(
+                    "SELECT r.id, r.started_at, r.finished_at, r.status, r.mode, "
+                    "(SELECT COUNT(*) FROM files f WHERE f.run_id = r.id) "
+                    "FROM runs r ORDER BY r.id DESC LIMIT ?", (limit,))
+            ]
+            for run in runs:
+                run['outcomes'] = dict(self._conn.execute(
+                    "SELECT status, COUNT(*) FROM outcomes WHERE run_id = ? GROUP BY status", (run['id'],)))
+            return runs
+
+    def recorded_item_ids(self, item_ids: List[str]) -> Set[str]:
+        """Các id trong `item_ids` đã được ghi vào nhật ký của lần chạy hiện tại"""
+        found: Set[str] = set()
+        with self._lock:
+            for start in range(0, len(item_ids), 500):
+                chunk = item_ids[start:start + 500]
+                found.update(item_id for item_id, in self._conn.execute(
+                    f"SELECT r.item_id FROM rows r JOIN files f ON f.id = r.file_id "
+                    f"WHERE f.run_id = ? AND r.item_id IN ({','.join('?' * len(chunk))})", (self.run_id, *chunk)))
+        return found
+
+    def last_run_id(self) -> Optional[int]:
+        with self._lock:
+            found = self._conn.execute("SELECT MAX(id) FROM runs").fetchone()
+            return found[0] if found else None
+
+    def failures(self, run_id: int) -> Iterator[Tuple[str, int, Optional[str], Optional[str], float]]:
+        """Các dòng lỗi của một lần chạy (file, dòng, tiêu đề, lỗi, thời điểm), chỉ lấy lần thử cuối của mỗi dòng"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT f.path, o.row, r.row_key, o.error, o.at FROM outcomes o "
+                "JOIN files f ON f.id = o.file_id "
+                "LEFT JOIN rows r ON r.file_id = o.file_id AND r.row = o.row "
+                "WHERE o.run_id = ? AND o.status = 'failed' AND r.status = 'failed' "
+                "AND o.id = (SELECT MAX(id) FROM outcomes WHERE file_id = o.file_id AND row = o.row) "
+                "ORDER BY f.position, o.row", (run_id,))
+            rows = cursor.fetchall()
+        return iter(rows)
+
+    def _file_id(self, filename: str) -> int:
+        file_id = self._file_ids.get(filename)
+        if file_id is None:
+            # File chưa có trong cấu hình (ví dụ gọi process_file trực tiếp): thêm vào cuối,
+            # mở lần chạy nếu chưa có
+            if self.run_id is None:
+                self.open_run("direct")
+            position = len(self._file_ids)
+            self._conn.execute(
+                "INSERT OR IGNORE INTO files (run_id, path, position) VALUES (?, ?, ?)",
+                (self.run_id, filename, position))
+            file_id = self._conn.execute(
+                "SELECT id FROM files WHERE run_id = ? AND path = ?", (self.run_id, filename)).fetchone()[0]
+            self._file_ids[filename] = file_id
+        return file_id
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        if self._in_batch:
+            yield
+            return
+        self._in_batch = True
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            # Lưu watermark một lần cho cả transaction, không phải sau từng dòng
+            for filename in self._moved:
+                self._conn.execute("UPDATE files SET watermark = ?, done = ? WHERE id = ?",
+                                   (self.watermark(filename), self._counts.get(filename, 0),
+                                    self._file_ids[filename]))
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        else:
+            self._conn.execute("COMMIT")
+        finally:
+            self._moved.clear()
+            self._in_batch = False
+
+_current: Optional[StateStore] = None
+_current_lock = threading.Lock()
+_synchronous = DEFAULT_SYNCHRONOUS
+
+def get_state_store(path: str = os.path.join("temp", STATE_DB)) -> StateStore:
+    """Kho trạng thái của lần chạy hiện tại (mở khi dùng lần đầu)"""
+    global _current
+    with _current_lock:
+        if _current is None:
+            _current = StateStore(path, _synchronous)
+        return _current
+
+def configure_state_store(synchronous: str = DEFAULT_SYNCHRONOUS) -> None:
+    """Đặt mức an toàn khi ghi (SYNCHRONOUS_MODES) cho kho trạng thái hiện tại và các lần mở sau"""
+    global _synchronous
+    with _current_lock:
+        _synchronous = synchronous
+        if _current is not None:
+            _current.set_synchronous(synchronous)
+
+def reset_state_store() -> None:
+    """Đóng kho trạng thái, lần gọi get_state_store() sau sẽ mở lại"""
+    global _current
+    with _current_lock:
+        if _current is not None:
+            _current.shutdown()
+        _current = None
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from schema import AccountSchema, Record
+
+# Thư mục lưu bản ghi đồng bộ, giữ lại giữa các lần chạy (không nằm trong temp)
+SYNC_DIR = "sync"
+
+def sync_store_path(vault_id: str) -> str:
+    """Mỗi vault có một file bản ghi đồng bộ riêng"""
+    return os.path.join(SYNC_DIR, f"{vault_id}.jsonl")
+
+def record_key(schema: AccountSchema, record: Record) -> str:
+    """Khóa ổn định của một dòng: loại tài khoản + trường tiêu đề (thường là username)"""
+    return f"{schema.name}:{schema.title_value(record).strip().lower()}"
+
+def content_hash(schema: AccountSchema, record: Record, notes: str = "") -> str:
+    """Hash nội dung sẽ được ghi vào item: tên trường, giá trị, ghi chú, category và URL"""
+    payload = json.dumps([schema.category, schema.url, schema.field_names, list(record), notes],
+                         ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class SyncStore:
+    """Bản ghi đồng bộ của một vault: khóa của mỗi dòng -> (hash nội dung, item id).
+
+    Mỗi thay đổi được ghi nối thêm một dòng JSON và flush ngay (bản ghi sau đè bản ghi trước),
+    nên các item đã tạo không bị mất khỏi bản ghi khi chương trình dừng giữa chừng; compact()
+    viết lại file chỉ với bản ghi mới nhất của từng khóa.
+
+    Dòng bản ghi:  {"key": "hotmail:a@b.com", "hash": "...", "item_id": "..."}
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[str, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+        self._handle = None
+        self._appended = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self) -> "SyncStore":
+        if not os.path.exists(self.path):
+            return self
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dòng cuối có thể bị ghi dở nếu chương trình dừng đột ngột
+                    continue
+                self._entries[entry["key"]] = (entry["hash"], entry["item_id"])
+        return self
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """(hash nội dung, item id) của lần đồng bộ trước, hoặc None nếu dòng mới"""
+        return self._entries.get(key)
+
+    def record(self, key: str, hash_value: str, item_id: str) -> None:
+        """Ghi nhận nội dung hiện tại của một item sau khi tạo hoặc cập nhật thành công"""
+        line = json.dumps({"key": key, "hash": hash_value, "item_id": item_id}, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._handle is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._handle = open(self.path, 'a', encoding='utf-8')
+            self._handle.write(line)
+            self._handle.flush()
+            self._entries[key] = (hash_value, item_id)
+            self._appended += 1
+
+    def compact(self) -> None:
+        """Viết lại file chỉ gồm bản ghi mới nhất của từng khóa"""
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+            if not self._appended:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for key, (hash_value, item_id) in self._entries.items():
+                    f.write(json.dumps({"key": key, "hash": hash_value, "item_id": item_id}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._appended = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
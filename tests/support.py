@@ -0,0 +1,34 @@
+"""Tiện ích chung của các bài kiểm thử: đường dẫn repo và Connect server giả (benchmarks/fake_connect.py)"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+FAKE_CONNECT = os.path.join(ROOT, "benchmarks", "fake_connect.py")
+TOKEN = "test-token"
+VAULT_ID = "benchvault0000000000000000"
+
+def start_server(*args: str) -> subprocess.Popen:
+    """Chạy Connect server giả trên một cổng trống; địa chỉ nằm ở dòng đầu tiên của stdout"""
+    server = subprocess.Popen(
+        [sys.executable, FAKE_CONNECT, "--port", "0", "--token", TOKEN, "--latency", "0", *args],
+        stdout=subprocess.PIPE, text=True,
+    )
+    server.url = server.stdout.readline().strip()
+    return server
+
+def stop_server(server: subprocess.Popen) -> None:
+    server.terminate()
+    server.wait()
+    server.stdout.close()
+
+def load_account_type(name: str):
+    """Loại tài khoản khai báo trong account_types.yaml của repo"""
+    import yaml
+    from schema import compile_account_types
+
+    with open(os.path.join(ROOT, "account_types.yaml"), encoding="utf-8") as f:
+        return compile_account_types(yaml.safe_load(f))[name]
@@ -0,0 +1,90 @@
+"""Kiểm thử watermark của nhật ký checkpoint và kho trạng thái khi số dòng không liên tục."""
+import os
+import shutil
+import tempfile
+import unittest
+
+import support  # noqa: F401 (thêm thư mục gốc vào sys.path)
+
+from checkpoint import CheckpointJournal
+from state_store import StateStore
+
+FILE = "input/accounts.txt"
+
+# Dòng dữ liệu của file (các số còn thiếu là dòng trống hoặc dòng bị loại)
+ROWS = [2, 3, 5, 6, 9, 10, 14]
+
+class WatermarkGapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def import_rows(self, journal, rows):
+        """Ghi các dòng thành công rồi dời watermark như process_file (kết quả theo thứ tự trong file)"""
+        for row in rows:
+            journal.record(FILE, row, True, f"item{row}")
+            journal.advance_to(FILE, row)
+
+    def check(self, journal, watermark, done):
+        self.assertEqual(journal.watermark(FILE), watermark)
+        self.assertEqual(journal.done_count(FILE), done)
+
+    def test_advance_skips_gaps(self):
+        journal = CheckpointJournal(os.path.join(self.workdir, "journal.jsonl"))
+        # Dòng 14 xong trước (chạy song song), dòng 9 lỗi: watermark dừng trước dòng 9
+        journal.record(FILE, 14, True, "item14")
+        self.import_rows(journal, ROWS[:4])
+        journal.record(FILE, 9, False)
+        self.check(journal, 6, 5)
+        self.assertTrue(journal.is_done(FILE, 14))
+        self.assertFalse(journal.is_done(FILE, 9))
+
+        # Lần chạy sau chỉ còn dòng 9 và 10
+        self.import_rows(journal, [9, 10])
+        journal.advance_to(FILE, 14)
+        self.check(journal, 14, len(ROWS))
+        journal.close()
+
+    def test_journal_keeps_count_after_compaction(self):
+        path = os.path.join(self.workdir, "journal.jsonl")
+        journal = CheckpointJournal(path)
+        self.import_rows(journal, ROWS[:5])
+        journal.record(FILE, 14, True, "item14")
+        journal.close()
+
+        # Chưa nén: watermark chỉ dời qua các dòng liên tiếp, số dòng đã xong vẫn đúng
+        reloaded = CheckpointJournal(path)
+        reloaded.load()
+        self.check(reloaded, 0, 6)
+        reloaded.advance_to(FILE, 9)
+        reloaded.compact()
+        reloaded.close()
+
+        reloaded = CheckpointJournal(path)
+        reloaded.load()
+        self.check(reloaded, 9, 6)
+        self.assertTrue(reloaded.is_done(FILE, 14))
+        self.assertFalse(reloaded.is_done(FILE, 10))
+        reloaded.close()
+
+    def test_state_store_keeps_count(self):
+        path = os.path.join(self.workdir, "state.db")
+        store = StateStore(path)
+        store.open_run("test")
+        self.import_rows(store, ROWS[:5])
+        store.record(FILE, 14, True, "item14")
+        store.shutdown()
+
+        reloaded = StateStore(path)
+        _, resumed = reloaded.open_run("test")
+        self.assertTrue(resumed)
+        self.check(reloaded, 9, 6)
+        self.assertTrue(reloaded.is_done(FILE, 14))
+        self.assertFalse(reloaded.is_done(FILE, 10))
+        reloaded.shutdown()
+
+if __name__ == "__main__":
+    unittest.main()
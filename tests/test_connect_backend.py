@@ -0,0 +1,179 @@
+"""Kiểm thử ConnectClient và ConnectBackend với Connect server giả (benchmarks/fake_connect.py).
+
+Chạy:
+    python -m pytest tests
+"""
+import asyncio
+import http.client
+import unittest
+
+from support import TOKEN, VAULT_ID, start_server, stop_server
+
+from account_import import classify_op_error
+from backends import ConnectBackend
+from connect_client import ConnectClient, ConnectError
+from import_engine import FATAL, RETRYABLE
+from schema import AccountSchema
+
+ACCOUNT_TYPE = AccountSchema("hotmail", {
+    "category": "login",
+    "title_prefix": "Hotmail:",
+    "url": "https://outlook.live.com",
+    "format": "username|password|refresh_token",
+    "delimiter": "|",
+    "fields": [
+        {"name": "username", "type": "email", "required": True},
+        {"name": "password", "type": "password", "required": True},
+        {"name": "refresh_token", "type": "text", "required": False},
+    ],
+})
+
+class ConnectBackendTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = start_server()
+
+    @classmethod
+    def tearDownClass(cls):
+        stop_server(cls.server)
+
+    def setUp(self):
+        self.client = ConnectClient(self.server.url, TOKEN, pool_size=4)
+        self.backend = ConnectBackend(self.client)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_create_item(self):
+        record = ACCOUNT_TYPE.make_record(["create@example.com", "secret", ""])
+        success, item_id, error = asyncio.run(self.backend.create_item(record, ACCOUNT_TYPE, VAULT_ID))
+        self.assertTrue(success, error)
+        self.assertIsNone(error)
+
+        item = asyncio.run(self.client.get_item_async(VAULT_ID, item_id))
+        self.assertEqual(item["title"], "Hotmail: create@example.com")
+        self.assertEqual(item["category"], "LOGIN")
+        self.assertEqual(item["urls"], [{"href": "https://outlook.live.com", "primary": True}])
+        fields = {field["id"]: field["value"] for field in item["fields"]}
+        self.assertEqual(fields, {"username": "create@example.com", "password": "secret"})
+
+        found_id, error = asyncio.run(self.backend.find_item("Hotmail: create@example.com", VAULT_ID))
+        self.assertEqual((found_id, error), (item_id, None))
+        self.assertEqual(asyncio.run(self.backend.find_item("Hotmail: missing@example.com", VAULT_ID)), (None, None))
+
+    def test_update_keeps_fields_not_in_row(self):
+        created = asyncio.run(self.client.create_item_async(VAULT_ID, {
+            "title": "Hotmail: update@example.com",
+            "category": "LOGIN",
+            "fields": [
+                {"id": "username", "type": "STRING", "purpose": "USERNAME", "label": "username", "value": "update@example.com"},
+                {"id": "password", "type": "CONCEALED", "purpose": "PASSWORD", "label": "password", "value": "old"},
+                {"id": "recovery_code", "type": "CONCEALED", "label": "recovery_code", "value": "R-123"},
+            ],
+            "tags": ["manual"],
+        }))
+
+        record = ACCOUNT_TYPE.make_record(["update@example.com", "new", "token-1"])
+        success, item_id, error = asyncio.run(
+            self.backend.update_item(created["id"], record, ACCOUNT_TYPE, VAULT_ID, notes="ghi chú"))
+        self.assertTrue(success, error)
+        self.assertEqual(item_id, created["id"])
+
+        item = asyncio.run(self.client.get_item_async(VAULT_ID, created["id"]))
+        fields = {field["id"]: field["value"] for field in item["fields"]}
+        self.assertEqual(fields, {
+            "username": "update@example.com",
+            "password": "new",
+            "recovery_code": "R-123",
+            "refresh_token": "token-1",
+            "notesPlain": "ghi chú",
+        })
+        self.assertEqual(item["tags"], ["manual"])
+
+    def test_client_error_is_mapped_like_op_error(self):
+        client = ConnectClient(self.server.url, "wrong-token")
+        try:
+            with self.assertRaises(ConnectError) as raised:
+                client.list_vaults()
+            self.assertEqual(raised.exception.status, 401)
+            self.assertEqual(str(raised.exception), "(401) Invalid bearer token")
+
+            record = ACCOUNT_TYPE.make_record(["denied@example.com", "secret", ""])
+            result = asyncio.run(ConnectBackend(client).create_item(record, ACCOUNT_TYPE, VAULT_ID))
+            self.assertEqual(result, (False, None, "(401) Invalid bearer token"))
+            self.assertEqual(classify_op_error(result[2]), FATAL)
+        finally:
+            client.close()
+
+    def test_missing_item_update_reports_404(self):
+        record = ACCOUNT_TYPE.make_record(["gone@example.com", "secret", ""])
+        success, _, error = asyncio.run(self.backend.update_item("doesnotexist", record, ACCOUNT_TYPE, VAULT_ID))
+        self.assertFalse(success)
+        self.assertEqual(error, "(404) Item not found")
+
+    def test_pool_reuses_connections(self):
+        for _ in range(20):
+            self.client.list_vaults()
+        self.assertEqual(self.client.opened, 1)
+
+        records = [ACCOUNT_TYPE.make_record([f"pool{i}@example.com", "secret", ""]) for i in range(40)]
+
+        async def create_all():
+            return await asyncio.gather(*(self.backend.create_item(record, ACCOUNT_TYPE, VAULT_ID) for record in records))
+
+        results = asyncio.run(create_all())
+        self.assertTrue(all(success for success, _, _ in results))
+        self.assertLessEqual(self.client.opened, self.client.pool_size)
+
+class ConnectServerErrorTest(unittest.TestCase):
+
+    def test_server_error_is_retryable(self):
+        server = start_server("--error-rate", "1")
+        client = ConnectClient(server.url, TOKEN)
+        try:
+            record = ACCOUNT_TYPE.make_record(["retry@example.com", "secret", ""])
+            success, item_id, error = asyncio.run(ConnectBackend(client).create_item(record, ACCOUNT_TYPE, VAULT_ID))
+            self.assertFalse(success)
+            self.assertEqual(error, "(503) Service Unavailable")
+            self.assertEqual(classify_op_error(error), RETRYABLE)
+        finally:
+            client.close()
+            stop_server(server)
+
+class StaleConnection:
+    """Kết nối keep-alive mà server đã đóng: request gửi đi được nhưng không có response"""
+
+    def __init__(self, calls):
+        self.sock = object()
+        self.calls = calls
+
+    def request(self, method, path, body=None, headers=None):
+        self.calls.append(method)
+
+    def getresponse(self):
+        raise http.client.RemoteDisconnected("Remote end closed connection without response")
+
+    def close(self):
+        pass
+
+class ResendTest(unittest.TestCase):
+    """Mất kết nối sau khi đã gửi request: chỉ request không gây tác dụng phụ mới được gửi lại"""
+
+    def request_calls(self, method):
+        client = ConnectClient("http://127.0.0.1:1", TOKEN)
+        calls = []
+        checkouts = iter([True, False])
+        client._checkout = lambda timeout: (StaleConnection(calls), next(checkouts))
+        with self.assertRaises(ConnectError):
+            client.request(method, "/v1/vaults/x/items", {"title": "t"} if method != "GET" else None)
+        return calls
+
+    def test_post_is_not_resent(self):
+        self.assertEqual(self.request_calls("POST"), ["POST"])
+
+    def test_get_is_resent(self):
+        self.assertEqual(self.request_calls("GET"), ["GET", "GET"])
+
+if __name__ == "__main__":
+    unittest.main()
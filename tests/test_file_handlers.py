@@ -0,0 +1,229 @@
+"""Kiểm thử đọc file input dạng stream: số dòng trong file của từng dòng, lỗi đọc giữa file không
+được coi là đã đọc hết file."""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from support import TOKEN, VAULT_ID, load_account_type, start_server, stop_server
+
+import account_import
+from backends import configure_backend
+import file_handlers
+import sharding
+from file_handlers import CSVFileHandler, FileReadError, TextFileHandler
+from schema import AccountSchema
+from state_store import reset_state_store
+
+HOTMAIL = load_account_type("hotmail")
+
+# Đủ dài để byte lỗi nằm sau vài khối decode (8 KB) của file text
+ROWS = 1000
+BAD_ROW = 600
+
+def hotmail_line(i: int) -> bytes:
+    return f"user{i}@example.com|pass{i}|token{i}|client{i}\n".encode()
+
+def write_with_bad_byte(path: str, header: bytes = b"", line=hotmail_line) -> None:
+    """File UTF-8 hợp lệ trừ một byte không decode được ở dòng BAD_ROW"""
+    with open(path, "wb") as f:
+        f.write(header)
+        for i in range(1, ROWS + 1):
+            f.write(line(i).replace(b"pass", b"p\xffss") if i == BAD_ROW else line(i))
+
+class HandlerReadErrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def test_text_read_error_is_recorded(self):
+        path = os.path.join(self.workdir, "accounts.txt")
+        write_with_bad_byte(path)
+        handler = TextFileHandler(path, HOTMAIL)
+        rows = list(handler.iter_data())
+        self.assertIsInstance(handler.read_error, UnicodeDecodeError)
+        self.assertLess(len(rows), BAD_ROW)
+
+    def test_csv_read_error_is_recorded(self):
+        path = os.path.join(self.workdir, "accounts.csv")
+        write_with_bad_byte(path, b"username,password,refresh_token,client_id\n",
+                            lambda i: hotmail_line(i).replace(b"|", b","))
+        handler = CSVFileHandler(path, HOTMAIL)
+        rows = list(handler.iter_data())
+        self.assertIsInstance(handler.read_error, UnicodeDecodeError)
+        self.assertLess(len(rows), BAD_ROW)
+
+    def test_complete_file_has_no_read_error(self):
+        path = os.path.join(self.workdir, "accounts.txt")
+        with open(path, "wb") as f:
+            f.writelines(hotmail_line(i) for i in range(1, ROWS + 1))
+        handler = TextFileHandler(path, HOTMAIL)
+        self.assertEqual(len(list(handler.iter_data())), ROWS)
+        self.assertIsNone(handler.read_error)
+
+def write_with_gaps(path: str, header: str = "", delimiter: str = "|") -> list:
+    """File có dòng trống và dòng thiếu trường; trả về số dòng trong file của các dòng hợp lệ"""
+    expected = []
+    line_num = 1 if header else 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(header)
+        for i in range(1, ROWS + 1):
+            line_num += 1
+            if i % 7 == 0:
+                f.write("\n")
+            elif i % 11 == 0:
+                f.write(f"user{i}@example.com\n")
+            else:
+                f.write(hotmail_line(i).decode().replace("|", delimiter))
+                expected.append(line_num)
+    return expected
+
+class LineNumberTest(unittest.TestCase):
+    """Handler đánh số mỗi dòng theo số dòng trong file, bỏ qua dòng trống và dòng lỗi mà không dồn số"""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def numbers(self, handler) -> list:
+        return [line_num for line_num, _ in handler.iter_numbered()]
+
+    def test_text_line_numbers(self):
+        path = os.path.join(self.workdir, "accounts.txt")
+        expected = write_with_gaps(path)
+        self.assertEqual(self.numbers(TextFileHandler(path, HOTMAIL)), expected)
+
+    def test_text_parallel_line_numbers_match_sequential(self):
+        path = os.path.join(self.workdir, "accounts.txt")
+        expected = write_with_gaps(path)
+        with mock.patch.object(file_handlers, "MIN_PARALLEL_BYTES", 0):
+            handler = TextFileHandler(path, HOTMAIL, {"parse_workers": 2})
+            self.assertTrue(handler._parse_in_parallel())
+            self.assertEqual(self.numbers(handler), expected)
+
+    def test_csv_line_numbers(self):
+        path = os.path.join(self.workdir, "accounts.csv")
+        expected = write_with_gaps(path, "username,password,refresh_token,client_id\n", ",")
+        self.assertEqual(self.numbers(CSVFileHandler(path, HOTMAIL)), expected)
+
+    def test_shards_number_lines_like_whole_file(self):
+        for name, header, delimiter, handler_class in (
+                ("accounts.txt", "", "|", TextFileHandler),
+                ("accounts.csv", "username,password,refresh_token,client_id\n", ",", CSVFileHandler)):
+            path = os.path.join(self.workdir, name)
+            expected = write_with_gaps(path, header, delimiter)
+            with mock.patch.object(sharding, "MIN_SHARD_BYTES", 1024):
+                ranges = sharding.plan_byte_ranges(path, 4, skip_header=bool(header), quoted=bool(header))
+            self.assertEqual(len(ranges), 4)
+            numbers = []
+            for byte_range, line_offset in zip(ranges, sharding.shard_line_offsets(path, ranges)):
+                handler = handler_class(path, HOTMAIL, {"byte_range": byte_range, "line_offset": line_offset})
+                numbers.extend(self.numbers(handler))
+            self.assertEqual(numbers, expected, name)
+
+# Một trường không bắt buộc: dòng hợp lệ có thể có giá trị rỗng
+NOTE = AccountSchema("note", {
+    "category": "login",
+    "title_prefix": "Note:",
+    "format": "username|code",
+    "delimiter": "|",
+    "fields": [{"name": "username", "type": "text", "required": False}],
+})
+
+class TextParallelParityTest(unittest.TestCase):
+    """Parse song song (--parse-workers) cho cùng dòng, số dòng và dòng bị bỏ qua như đọc tuần tự"""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def read(self, path: str, schema: AccountSchema, options: dict):
+        skipped = []
+        handler = TextFileHandler(path, schema, options)
+        with mock.patch.object(handler, "_skip_row", lambda row, error: skipped.append((row, error))):
+            rows = [(line_num, tuple(record)) for line_num, record in handler.iter_numbered()]
+        return rows, skipped
+
+    def assert_same(self, content: str, schema: AccountSchema = NOTE):
+        path = os.path.join(self.workdir, "accounts.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        sequential = self.read(path, schema, {})
+        with mock.patch.object(file_handlers, "MIN_PARALLEL_BYTES", 0):
+            parallel = self.read(path, schema, {"parse_workers": 2})
+        self.assertEqual(parallel, sequential)
+        return sequential
+
+    def test_single_empty_value(self):
+        rows, skipped = self.assert_same("\n   \n  |x\nonlyone\n")
+        self.assertEqual(rows, [(3, ("",))])
+        self.assertEqual([row for row, _ in skipped], [4])
+
+    def test_empty_values_among_rows(self):
+        rows, _ = self.assert_same("a|1\n|2\n\n b |3\n|4\n")
+        self.assertEqual(rows, [(1, ("a",)), (2, ("",)), (4, ("b",)), (5, ("",))])
+
+    def test_no_valid_rows(self):
+        rows, skipped = self.assert_same("\n  \nonlyone\n")
+        self.assertEqual(rows, [])
+        self.assertEqual([row for row, _ in skipped], [3])
+
+class ProcessFileReadErrorTest(unittest.TestCase):
+    """process_file không đánh dấu file đã xử lý khi đọc lỗi giữa chừng, lần chạy sau tiếp tục phần còn lại"""
+
+    def setUp(self):
+        self.server = start_server()
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        os.chdir(self.workdir)
+        account_import.ensure_directories()
+        os.environ["OP_CONNECT_TOKEN"] = TOKEN
+        self.options = {"backend": "connect", "connect_host": self.server.url, "duplicates": "off",
+                        "preflight": False}
+        configure_backend(self.options)
+        reset_state_store()
+
+    def tearDown(self):
+        reset_state_store()
+        configure_backend({"backend": "op"})
+        os.environ.pop("OP_CONNECT_TOKEN", None)
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir)
+        stop_server(self.server)
+
+    def run_file(self, path: str) -> None:
+        store = account_import.open_state_store()
+        account_import.process_file(path, HOTMAIL, VAULT_ID, "", {**self.options, "journal": store})
+
+    def test_file_is_not_marked_processed_after_read_error(self):
+        path = os.path.join("input", "accounts.txt")
+        write_with_bad_byte(path)
+        store = account_import.open_state_store()
+        store.open_run("test")
+
+        with self.assertRaises(FileReadError):
+            self.run_file(path)
+        imported = store.done_count(path)
+        self.assertGreater(imported, 0)
+        self.assertLess(imported, BAD_ROW)
+        self.assertEqual(store.processed_files(), {})
+
+        # Sửa byte lỗi rồi chạy lại: chỉ các dòng chưa import được đọc và import tiếp
+        with open(path, "rb") as f:
+            data = f.read()
+        with open(path, "wb") as f:
+            f.write(data.replace(b"p\xffss", b"pass"))
+        self.run_file(path)
+        self.assertEqual(store.done_count(path), ROWS)
+        self.assertEqual(store.processed_files(), {path: ROWS})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""Kiểm thử pool import: run_async_pool không chặn event loop khi chờ đầu vào."""
+import asyncio
+import threading
+import unittest
+
+import support  # noqa: F401 (thêm thư mục gốc vào sys.path)
+
+from import_engine import iter_async_pool, iter_prefetch
+
+class AsyncPoolInputTest(unittest.TestCase):
+
+    def test_results_arrive_while_input_waits(self):
+        """Đầu vào chỉ có dòng tiếp theo sau khi dòng trước đã có kết quả (on_result)"""
+        delivered = threading.Event()
+        waited = []
+
+        def items():
+            yield 1
+            waited.append(delivered.wait(5))
+            yield 2
+
+        def on_result(index, item, result):
+            delivered.set()
+
+        async def worker(item):
+            await asyncio.sleep(0)
+            return item * 10
+
+        results = list(iter_async_pool(iter_prefetch(items(), 4), worker, 4, on_result))
+        self.assertEqual(waited, [True])
+        self.assertEqual(results, [(1, 1, 10), (2, 2, 20)])
+
+    def test_input_error_is_raised(self):
+        def items():
+            yield 1
+            raise ValueError("hỏng")
+
+        async def worker(item):
+            return item
+
+        with self.assertRaises(ValueError):
+            list(iter_async_pool(items(), worker, 2))
+
+    def test_many_items_keep_order(self):
+        async def worker(item):
+            await asyncio.sleep(0.001 * (item % 3))
+            return item
+
+        results = list(iter_async_pool(iter_prefetch(range(500), 16), worker, 8))
+        self.assertEqual([result for _, _, result in results], list(range(500)))
+
+if __name__ == "__main__":
+    unittest.main()
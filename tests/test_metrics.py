@@ -0,0 +1,50 @@
+"""Kiểm thử dòng trạng thái khi nhiều file import song song, mỗi file một ProgressLine."""
+import io
+import threading
+import unittest
+
+import support  # noqa: F401 (thêm thư mục gốc vào sys.path)
+
+from metrics import ProgressLine, echo
+
+class ProgressLineTest(unittest.TestCase):
+
+    def test_each_file_keeps_its_own_line(self):
+        first_stream, second_stream = io.StringIO(), io.StringIO()
+        first = ProgressLine("a.txt", 100, stream=first_stream, tty=False, log_interval=0)
+        second = ProgressLine("b.txt", 50, stream=second_stream, tty=False, log_interval=0)
+        with first:
+            with second:
+                first.update(10, ok=10)
+                second.update(5, ok=5)
+            # File b xong trước: thông báo của file a vẫn đi qua dòng trạng thái còn lại
+            echo("❌ Dòng 3: lỗi")
+            first.update(20, ok=20)
+        self.assertIn("🚀 a.txt: 20/100", first_stream.getvalue())
+        self.assertIn("❌ Dòng 3: lỗi", first_stream.getvalue())
+        self.assertNotIn("a.txt", second_stream.getvalue())
+        self.assertIn("🚀 b.txt: 5/50", second_stream.getvalue())
+
+    def test_parallel_updates_do_not_interleave(self):
+        stream = io.StringIO()
+        lines = [ProgressLine(f"file{i}.txt", 1000, stream=stream, tty=False, log_interval=0) for i in range(4)]
+
+        def run(line):
+            with line:
+                for done in range(1, 201):
+                    line.update(done, ok=done)
+                    if done % 50 == 0:
+                        echo(f"thông báo {line.label} {done}")
+
+        threads = [threading.Thread(target=run, args=(line,)) for line in lines]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for text in stream.getvalue().splitlines():
+            self.assertTrue(text.startswith("🚀 file") or text.startswith("thông báo file"), text)
+        for line in lines:
+            self.assertIn(f"🚀 {line.label}: 200/1000", stream.getvalue())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Kiểm thử token phiên của OpSession với `op` giả (benchmarks/fake_op.py): token chỉ được truyền
+qua biến môi trường của lệnh op, không nằm trên dòng lệnh và không ghi vào os.environ."""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from support import ROOT
+
+from op_cli import run_op_command
+from op_session import configure_op_session
+
+TOKEN = "session-token-123"
+
+@unittest.skipIf(os.name == "nt", "op giả được gọi qua shell script")
+class OpSessionTokenTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        op_path = os.path.join(self.workdir, "op")
+        with open(op_path, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" -S "{os.path.join(ROOT, "benchmarks", "fake_op.py")}" "$@"\n')
+        os.chmod(op_path, 0o755)
+        self.log_path = os.path.join(self.workdir, "calls.jsonl")
+        self.saved_env = dict(os.environ)
+        os.environ.update(PATH=self.workdir + os.pathsep + os.environ.get("PATH", ""),
+                          FAKE_OP_SESSION=TOKEN, FAKE_OP_ACCOUNT="team", FAKE_OP_LOG=self.log_path)
+        self.session = configure_op_session(0, interactive=True, cache_dir=self.workdir)
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.saved_env)
+        configure_op_session()
+        shutil.rmtree(self.workdir)
+
+    def test_token_only_in_command_environment(self):
+        # Chưa đăng nhập: op báo lỗi, chương trình đăng nhập lại rồi chạy lại lệnh
+        result = run_op_command(["op", "whoami"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(self.session.credentials(), ("team", TOKEN))
+        self.assertEqual(run_op_command(["op", "vault", "list"]).returncode, 0)
+
+        with open(self.log_path, encoding="utf-8") as f:
+            calls = [json.loads(line) for line in f]
+        self.assertEqual([call[0] for call in calls], ["whoami", "signin", "whoami", "vault"])
+        self.assertFalse(any(TOKEN in arg for call in calls for arg in call))
+        self.assertFalse([key for key in os.environ if key.startswith("OP_SESSION_")])
+
+    def test_shard_uses_coordinator_token(self):
+        shard = configure_op_session(0, interactive=False, cache_dir=self.workdir)
+        shard.use_token("team", TOKEN)
+        self.assertEqual(run_op_command(["op", "whoami"]).returncode, 0)
+        self.assertFalse([key for key in os.environ if key.startswith("OP_SESSION_")])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+"""Kiểm thử Preflight.iter_clean: dòng sạch đầu tiên có ngay sau khối nhỏ đầu tiên."""
+import unittest
+
+from support import load_account_type
+
+import preflight
+from preflight import Preflight
+
+HOTMAIL = load_account_type("hotmail")
+
+class IterCleanTest(unittest.TestCase):
+
+    def numbered(self, count: int):
+        for i in range(1, count + 1):
+            self.read = i
+            yield i, HOTMAIL.make_record([f"user{i}@example.com", f"pass{i}", "", ""])
+
+    def test_first_row_after_small_block(self):
+        self.read = 0
+        rows = Preflight(HOTMAIL).iter_clean(self.numbered(200_000))
+        self.assertEqual(next(rows)[0], 1)
+        self.assertEqual(self.read, preflight.PREFLIGHT_FIRST_BLOCK)
+
+    def test_blocks_grow_and_keep_rows(self):
+        checker = Preflight(HOTMAIL)
+        entries = list(self.numbered(5000))
+        # Dòng trùng nằm ở khối sau vẫn bị loại
+        entries.append((5001, entries[10][1]))
+        rows = [row for row, _ in checker.iter_clean(entries)]
+        self.assertEqual(rows, list(range(1, 5001)))
+        self.assertEqual(checker.rejected, 1)
+
+if __name__ == "__main__":
+    unittest.main()
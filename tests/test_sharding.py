@@ -0,0 +1,78 @@
+"""Kiểm thử --shards với Connect server giả: dòng trùng nằm ở hai shard khác nhau chỉ được tạo một lần."""
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from support import ROOT, TOKEN, VAULT_ID, load_account_type, start_server, stop_server
+
+import account_import
+import sharding
+from backends import configure_backend
+from connect_client import ConnectClient
+from state_store import reset_state_store
+
+HOTMAIL = load_account_type("hotmail")
+
+ROWS = 3000
+DUPLICATE_ROW = 2900  # trùng tài khoản với dòng 5, nằm ở shard cuối
+
+def account_line(i: int) -> str:
+    user = 5 if i == DUPLICATE_ROW else i
+    return f"user{user}@example.com|pass{i}|token{i}|client{i}\n"
+
+@unittest.skipIf(os.name == "nt", "shard dùng fork để dùng chung MIN_SHARD_BYTES đã đổi")
+class CrossShardDuplicateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = start_server()
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        os.chdir(self.workdir)
+        account_import.ensure_directories()
+        # Các shard đọc lại cấu hình loại tài khoản từ thư mục làm việc
+        shutil.copy(os.path.join(ROOT, "account_types.yaml"), self.workdir)
+        os.environ["OP_CONNECT_TOKEN"] = TOKEN
+        self.options = {"backend": "connect", "connect_host": self.server.url, "duplicates": "skip",
+                        "vault_index_cache": False, "shards": 3}
+        configure_backend(self.options)
+        reset_state_store()
+
+    def tearDown(self):
+        reset_state_store()
+        configure_backend({"backend": "op"})
+        os.environ.pop("OP_CONNECT_TOKEN", None)
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir)
+        stop_server(self.server)
+
+    def test_duplicate_in_later_shard_is_rejected(self):
+        path = os.path.join("input", "accounts.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(account_line(i) for i in range(1, ROWS + 1))
+        store = account_import.open_state_store()
+        store.open_run("test")
+
+        with mock.patch.object(sharding, "MIN_SHARD_BYTES", 16 * 1024):
+            account_import.process_file_sharded(path, HOTMAIL, VAULT_ID, "", {**self.options, "journal": store})
+
+        client = ConnectClient(self.server.url, TOKEN)
+        try:
+            titles = [item["title"] for item in client.list_items(VAULT_ID)]
+        finally:
+            client.close()
+        self.assertEqual(titles.count("Hotmail: user5@example.com"), 1)
+        self.assertEqual(len(titles), ROWS - 1)
+
+        with open(os.path.join("output", "accounts_result.csv"), newline="", encoding="utf-8") as f:
+            rows = [int(row[0]) for row in list(csv.reader(f))[1:]]
+        self.assertEqual(rows, [i for i in range(1, ROWS + 1) if i != DUPLICATE_ROW])
+
+        with open(os.path.join("output", "accounts_shard3_preflight.csv"), newline="", encoding="utf-8-sig") as f:
+            report = list(csv.reader(f))[1:]
+        self.assertEqual([(row[0], row[4]) for row in report], [(str(DUPLICATE_ROW), "Trùng với dòng 5")])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import collections
+import itertools
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+from schema import AccountSchema
+
+# Kích thước mỗi khối (byte) giao cho một tiến trình parse
+CHUNK_BYTES = 4 * 1024 * 1024
+
+# File (hoặc khoảng byte) nhỏ hơn chừng này được parse trong một luồng như bình thường
+MIN_PARALLEL_BYTES = 2 * CHUNK_BYTES
+
+# Ký tự nối các giá trị khi trả kết quả về tiến trình chính: một chuỗi dài được pickle và tách
+# nhanh hơn nhiều so với một list hàng triệu chuỗi nhỏ
+VALUE_SEPARATOR = "\x00"
+
+# Số khối được giao trước cho mỗi tiến trình; giới hạn bộ nhớ khi bước import chậm hơn bước parse
+CHUNKS_AHEAD = 2
+
+# Cấu hình parse của một schema, truyền được sang tiến trình con:
+# (delimiter, số trường của format, format_map, số trường, vị trí trường bắt buộc, tên các trường)
+ParseSpec = Tuple[str, int, Tuple[Tuple[int, int], ...], int, Tuple[int, ...], Tuple[str, ...]]
+
+def parse_spec(schema: AccountSchema) -> ParseSpec:
+    """Những gì parse_chunk cần từ schema (lớp Record của schema được tạo động nên không pickle được)"""
+    return (schema.delimiter, len(schema.format_fields), schema.format_map, len(schema.fields),
+            schema.required, schema.field_names)
+
+def plan_chunks(filename: str, byte_range: Optional[Tuple[int, int]] = None,
+                chunk_bytes: int = CHUNK_BYTES) -> List[Tuple[int, int]]:
+    """Chia file (hoặc khoảng byte [start, end)) thành các khối khoảng `chunk_bytes`,
+    mỗi khối kết thúc ngay sau một ký tự xuống dòng
+    """
+    with open(filename, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        start, end = byte_range or (0, size)
+        if end <= start:
+            return []
+        chunks = []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            position = start
+            while position < end:
+                newline = mm.find(b"\n", position + chunk_bytes, end) if position + chunk_bytes < end else -1
+                boundary = end if newline < 0 else newline + 1
+                chunks.append((position, boundary))
+                position = boundary
+    return chunks
+
+def parse_chunk(filename: str, start: int, end: int,
+                spec: ParseSpec) -> Tuple[Union[str, List[str]], Optional[List[int]], List[Tuple[int, str]], int]:
+    """Parse các dòng trong khoảng byte [start, end), chạy trong tiến trình con.
+
+    Trả về (giá trị của các dòng hợp lệ nối liền nhau, mỗi dòng đúng `số trường` giá trị, nối
+    bằng VALUE_SEPARATOR nếu dữ liệu không chứa ký tự này; số dòng (tính từ đầu khối) của từng
+    dòng hợp lệ, None nếu mọi dòng của khối đều hợp lệ; lỗi [(số dòng tính từ đầu khối, thông
+    điệp)]; số dòng của khối). Dòng được tách và kiểm tra giống hệt TextFileHandler.iter_numbered.
+    """
+    delimiter, field_count, format_map, width, required, field_names = spec
+    with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode('utf-8')
+    if "\r" in text:
+        # Giống khi mở file ở chế độ text: \r\n và \r đều là xuống dòng
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = text.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+
+    values: List[str] = []
+    rows: List[int] = []
+    errors: List[Tuple[int, str]] = []
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        parts = line.split(delimiter)
+        if len(parts) < field_count:
+            errors.append((line_num, f"Thiếu dữ liệu - cần {field_count} trường nhưng chỉ có {len(parts)} trường"))
+            continue
+        row = [""] * width
+        for pos, idx in format_map:
+            row[idx] = parts[pos].strip()
+        missing_fields = [field_names[idx] for idx in required if not row[idx]]
+        if missing_fields:
+            errors.append((line_num, f"Thiếu các trường: {', '.join(missing_fields)}"))
+            continue
+        values.extend(row)
+        rows.append(line_num)
+    if len(rows) == len(lines):
+        rows = None
+    if VALUE_SEPARATOR not in text:
+        return VALUE_SEPARATOR.join(values), rows, errors, len(lines)
+    return values, rows, errors, len(lines)
+
+def iter_parsed_chunks(filename: str, spec: ParseSpec, workers: int, byte_range: Optional[Tuple[int, int]] = None,
+                       chunk_bytes: int = CHUNK_BYTES
+                       ) -> Iterator[Tuple[List[str], Sequence[int], List[Tuple[int, str]], int]]:
+    """Parse file bằng `workers` tiến trình, trả kết quả của từng khối (như parse_chunk, giá trị
+    luôn là list, số dòng của các dòng hợp lệ luôn có) theo đúng thứ tự trong file.
+
+    Chỉ `workers * CHUNKS_AHEAD` khối được giao trước, nên bộ nhớ không tăng theo kích thước file
+    khi bên dùng kết quả chậm hơn.
+    """
+    chunks = iter(plan_chunks(filename, byte_range, chunk_bytes))
+    executor = ProcessPoolExecutor(max_workers=workers)
+    pending = collections.deque()
+    try:
+        for start, end in itertools.islice(chunks, workers * CHUNKS_AHEAD):
+            pending.append(executor.submit(parse_chunk, filename, start, end, spec))
+        while pending:
+            values, rows, errors, line_count = pending.popleft().result()
+            for start, end in itertools.islice(chunks, 1):
+                pending.append(executor.submit(parse_chunk, filename, start, end, spec))
+            if rows is None:
+                rows = range(1, line_count + 1)
+            if isinstance(values, str):
+                # Chuỗi rỗng là không có dòng nào, hoặc một dòng một trường có giá trị rỗng
+                values = values.split(VALUE_SEPARATOR) if len(rows) else []
+            yield values, rows, errors, line_count
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
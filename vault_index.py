@@ -0,0 +1,88 @@
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+# File cache chỉ mục vault, đặt trong thư mục temp
+INDEX_FILE_TEMPLATE = "vault_index_{vault_id}.json"
+
+def _normalize_title(title: str) -> str:
+    return " ".join((title or "").split()).lower()
+
+def _normalize_url(url: str) -> str:
+    return (url or "").strip().lower().rstrip("/")
+
+class VaultIndex:
+    """Chỉ mục các item đã có trong một vault, tra cứu O(1) theo tiêu đề và URL.
+
+    Được xây một lần từ `op item list --vault <id> --format json` trước khi import,
+    thay vì gọi `op item get` cho từng dòng. built_at là thời điểm lấy danh sách item;
+    các item thêm sau đó (add) không làm mới thời điểm này.
+    """
+
+    def __init__(self, vault_id: str, built_at: Optional[float] = None):
+        self.vault_id = vault_id
+        self.built_at = time.time() if built_at is None else built_at
+        self._by_key: Dict[Tuple[str, str], str] = {}
+        self._by_title: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def age(self) -> float:
+        """Số giây kể từ lần lấy danh sách item"""
+        return time.time() - self.built_at
+
+    @classmethod
+    def from_items(cls, vault_id: str, items: List[Dict]) -> "VaultIndex":
+        """Tạo chỉ mục từ kết quả JSON của op item list"""
+        index = cls(vault_id)
+        for item in items:
+            urls = [url.get("href", "") for url in item.get("urls") or []] or [""]
+            for url in urls:
+                index.add(item.get("title", ""), url, item.get("id"))
+        return index
+
+    def add(self, title: str, url: Optional[str], item_id: Optional[str]) -> None:
+        """Thêm một item (ví dụ item vừa được tạo) vào chỉ mục"""
+        title_key = _normalize_title(title)
+        self._by_key.setdefault((title_key, _normalize_url(url)), item_id)
+        self._by_title.setdefault(title_key, item_id)
+
+    def find(self, title: str, url: Optional[str] = None) -> Optional[str]:
+        """Trả về id của item trùng tiêu đề (và URL nếu có), hoặc None"""
+        title_key = _normalize_title(title)
+        if url:
+            return self._by_key.get((title_key, _normalize_url(url)))
+        return self._by_title.get(title_key)
+
+    def save(self, path: str) -> None:
+        """Lưu chỉ mục để dùng lại ở lần chạy sau"""
+        data = {
+            "vault_id": self.vault_id,
+            "built_at": self.built_at,
+            "items": [[title, url, item_id] for (title, url), item_id in self._by_key.items()],
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["VaultIndex"]:
+        """Đọc chỉ mục đã lưu, trả về None nếu không có hoặc file hỏng.
+
+        File từ phiên bản trước không có built_at được coi là đã quá hạn.
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        index = cls(data.get("vault_id", ""), data.get("built_at", 0.0))
+        for title, url, item_id in data.get("items", []):
+            index.add(title, url, item_id)
+        return index